@@ -0,0 +1,131 @@
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+from dotenv import load_dotenv
+
+from structured_utils import header_field
+from deadline_utils import parse_deadline
+from mirror_utils import mirror_entries
+from sheets_utils import get_client, get_headers, iter_sheet_rows, SPREADSHEET_ID, WORKSHEET_NAME, SHEET_DRY_RUN
+
+load_dotenv()
+
+# Archivage : les aides expirées ou anciennes quittent l'onglet principal pour garder ses lectures rapides
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "0") == "1"  # Archivage en fin de run (sinon : python archive_utils.py)
+ARCHIVE_TARGET = os.getenv("ARCHIVE_TARGET", "tabs").lower()  # tabs (onglets « Archive AAAA ») | mirror
+ARCHIVE_GRACE_DAYS = int(os.getenv("ARCHIVE_GRACE_DAYS", "30"))  # Délai après la date limite
+ARCHIVE_MAX_AGE_DAYS = int(os.getenv("ARCHIVE_MAX_AGE_DAYS", "365"))  # Âge (Date Ajout) sans date limite à venir
+ARCHIVE_TAB_PREFIX = "Archive"
+
+
+def _added_date(value):
+    """Date d'ajout d'une ligne (colonne Date Ajout, format AAAA-MM-JJ HH:MM) ou None"""
+    try:
+        return datetime.strptime(str(value).strip()[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def archive_reason(entry, headers, today=None):
+    """Raison d'archiver une ligne et année de son onglet d'archive : (raison, année) ou None"""
+    today = today or date.today()
+    deadline_header = next((h for h in headers if header_field(h) == "deadline"), None)
+    deadline = parse_deadline(str(entry.get(deadline_header, "")), today) if deadline_header else None
+    if deadline:
+        # Date limite connue : archivée seulement une fois le délai de grâce écoulé, jamais sur l'âge
+        if deadline < today - timedelta(days=ARCHIVE_GRACE_DAYS):
+            return "expirée", deadline.year
+        return None
+    added = _added_date(entry.get("Date Ajout", ""))
+    if added and added < today - timedelta(days=ARCHIVE_MAX_AGE_DAYS):
+        return "ancienne", added.year
+    return None
+
+
+def plan_archive(rows, headers, today=None):
+    """Lignes à archiver parmi (n° de ligne, valeurs), lues au fil de l'eau : seules les lignes retenues
+    sont gardées en mémoire. Retourne (liste de (n° de ligne, valeurs, onglet d'archive, raison), lignes lues)"""
+    plan = []
+    scanned = 0
+    for row_number, row in rows:
+        scanned += 1
+        reason = archive_reason(dict(zip(headers, row)), headers, today)
+        if reason:
+            plan.append((row_number, list(row), f"{ARCHIVE_TAB_PREFIX} {reason[1]}", reason[0]))
+    return plan, scanned
+
+
+def row_runs(row_numbers):
+    """Plages de lignes consécutives (début, fin incluse), de la dernière à la première pour que
+    chaque suppression laisse intacts les numéros des plages restantes"""
+    runs = []
+    for row_number in sorted(row_numbers):
+        if runs and runs[-1][1] + 1 == row_number:
+            runs[-1][1] = row_number
+        else:
+            runs.append([row_number, row_number])
+    return [tuple(run) for run in reversed(runs)]
+
+
+def archive_rows(target=ARCHIVE_TARGET, dry_run=None, today=None):
+    """Déplace les lignes expirées ou anciennes vers les onglets « Archive AAAA » (ou vers le miroir local
+    seulement) : une copie groupée par onglet, puis une seule requête de suppression. En simulation
+    (SHEET_DRY_RUN=1 ou --dry-run), rien n'est écrit. Retourne le nombre de lignes archivées"""
+    dry_run = SHEET_DRY_RUN if dry_run is None else dry_run
+    try:
+        spreadsheet = get_client().open_by_key(SPREADSHEET_ID)
+        sheet = spreadsheet.worksheet(WORKSHEET_NAME)
+        headers = get_headers(sheet)
+        plan, scanned = plan_archive(iter_sheet_rows(sheet, headers), headers, today)
+    except Exception as e:
+        print(f"❌ ERREUR de lecture : {e}")
+        return 0
+    if not plan:
+        print(f"🗄️ Archivage : aucune ligne à archiver ({scanned} ligne(s) dans '{WORKSHEET_NAME}')")
+        return 0
+    by_tab = {}
+    for row_number, row, tab, reason in plan:
+        by_tab.setdefault(tab if target == "tabs" else "", []).append(row)
+        if dry_run:
+            print(f"  🗄️ Ligne {row_number} ({reason}) → {tab if target == 'tabs' else 'miroir local'} : {row[0]}")
+    if dry_run:
+        print(f"🧪 Simulation : {len(plan)} ligne(s) à archiver, rien n'est écrit")
+        return 0
+
+    # Copie d'abord : en cas d'échec, aucune ligne n'est supprimée
+    try:
+        if target == "tabs":
+            tabs = {worksheet.title: worksheet for worksheet in spreadsheet.worksheets()}
+            for tab, rows in by_tab.items():
+                if tab in tabs:
+                    tabs[tab].append_rows(rows, value_input_option="RAW")
+                else:
+                    worksheet = spreadsheet.add_worksheet(title=tab, rows=len(rows) + 1, cols=len(headers))
+                    worksheet.append_rows([headers] + rows, value_input_option="RAW")
+                    print(f"📝 Onglet '{tab}' créé")
+    except Exception as e:
+        print(f"❌ ERREUR lors de la copie vers l'archive : {e}")
+        return 0
+    for tab, rows in by_tab.items():
+        mirror_entries([dict(zip(headers, row)) for row in rows], archive_tab=tab)
+
+    runs = row_runs(row_number for row_number, _, _, _ in plan)
+    try:
+        spreadsheet.batch_update({"requests": [
+            {"deleteDimension": {"range": {"sheetId": sheet.id, "dimension": "ROWS",
+                                           "startIndex": start - 1, "endIndex": end}}}
+            for start, end in runs
+        ]})
+    except Exception as e:
+        print(f"❌ ERREUR lors de la suppression des lignes archivées : {e}")
+        return 0
+    destinations = ", ".join(f"{tab} : {len(rows)}" for tab, rows in by_tab.items() if tab) or "miroir local"
+    print(f"🗄️ Archivage : {len(plan)} ligne(s) retirée(s) de '{WORKSHEET_NAME}' en {len(runs)} plage(s) "
+          f"({destinations}), {scanned - len(plan)} ligne(s) restantes")
+    return len(plan)
+
+
+if __name__ == "__main__":
+    # Usage : python archive_utils.py [--dry-run] [--mirror]
+    archive_rows(target="mirror" if "--mirror" in sys.argv else ARCHIVE_TARGET, dry_run=True if "--dry-run" in sys.argv else None)
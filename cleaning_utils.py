@@ -0,0 +1,213 @@
+import re
+import sys
+import time
+import unicodedata
+from datetime import date
+
+from sheets_utils import clean_text_for_spreadsheet, validate_email, validate_url
+from structured_utils import header_field
+from funding_entry import FundingEntry, schema_for
+
+# Nettoyage déterministe des entrées (remplace l'agent de nettoyage LLM)
+MONTHS = {
+    "janvier": 1, "janv": 1, "jan": 1, "january": 1,
+    "fevrier": 2, "fevr": 2, "fev": 2, "february": 2, "feb": 2,
+    "mars": 3, "march": 3, "mar": 3,
+    "avril": 4, "avr": 4, "april": 4, "apr": 4,
+    "mai": 5, "may": 5,
+    "juin": 6, "june": 6, "jun": 6,
+    "juillet": 7, "juil": 7, "july": 7, "jul": 7,
+    "aout": 8, "august": 8, "aug": 8,
+    "septembre": 9, "sept": 9, "sep": 9, "september": 9,
+    "octobre": 10, "oct": 10, "october": 10,
+    "novembre": 11, "nov": 11, "november": 11,
+    "decembre": 12, "dec": 12, "december": 12,
+}
+MONTH_RE = "|".join(sorted(MONTHS, key=len, reverse=True))
+DAY_RE = r"(\d{1,2})(?:er|e|st|nd|rd|th)?"
+WEEKDAY_RE = r"(?:(?:lundi|mardi|mercredi|jeudi|vendredi|samedi|dimanche)\s+)?"
+
+# Formats reconnus (sur le texte normalisé : minuscules sans accents)
+ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})(?:t[\d:.+z-]*)?\b")
+# JJ/MM/AAAA, JJ.MM.AA... : même séparateur, sans chiffre ni séparateur autour (« 01.02.03.04.05 » est un numéro)
+NUMERIC_DATE_RE = re.compile(r"(?<![\d./-])\b(\d{1,2})([/.-])(\d{1,2})\2(\d{4}|\d{2})\b(?![./-]?\d)")
+TEXT_DATE_RE = re.compile(WEEKDAY_RE + DAY_RE + r"\s+(" + MONTH_RE + r")\.?\s+(\d{4})\b")
+ENGLISH_DATE_RE = re.compile(r"\b(" + MONTH_RE + r")\.?\s+" + DAY_RE + r",?\s+(\d{4})\b")
+# Plages « du 1er au 15 mars 2026 », « 1-15 mars 2026 », « du 15 février au 15 mars 2026 »
+DAY_RANGE_RE = re.compile(r"(?:du\s+)?" + DAY_RE + r"\s*(?:au|-|–|a)\s*" + DAY_RE + r"\s+(" + MONTH_RE + r")\.?\s+(\d{4})\b")
+MONTH_RANGE_RE = re.compile(r"(?:du\s+)?" + DAY_RE + r"\s+(" + MONTH_RE + r")\.?\s*(?:au|-|–|a)\s*" + DAY_RE
+                            + r"\s+(" + MONTH_RE + r")\.?\s+(\d{4})\b")
+DEADLINE_PREFIX_RE = re.compile(
+    r"^(?:date limite(?: de (?:depot|candidature|cloture))?|cloture(?: des (?:candidatures|depots|inscriptions))?"
+    r"|deadline|avant le|au plus tard le|jusqu'au|le|d'ici le|until|before|by)\s*:?\s*"
+)
+# Mots de liaison admis entre les dates d'une cellule de date (« 15/03/2026 et 15/09/2026 »)
+DATE_FILLER_RE = re.compile(r"\b(?:et|ou|puis|du|au|le|la|jusqu'au|avant)\b|[\s,;:/()–.-]")
+MIN_YEAR, MAX_YEAR = 1900, 2100
+UNKNOWN_VALUES = {"non specifie", "non precise", "n/a", "na", "inconnu", "-", "nc", "non communique"}
+
+_cleaning_stats = {"entries": 0, "dates": 0, "seconds": 0.0}
+
+
+def _normalize(text):
+    """Minuscules sans accents (les positions restent alignées sur le texte d'origine)"""
+    text = unicodedata.normalize("NFC", text)
+    return "".join(
+        "".join(c for c in unicodedata.normalize("NFKD", ch) if not unicodedata.combining(c))[:1] or ch
+        for ch in text.lower()
+    )
+
+
+def _make_date(year, month, day):
+    """Date valide et plausible ou None (années sur deux chiffres ramenées à 20xx)"""
+    year = int(year)
+    if year < 100:
+        year += 2000
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        return None
+    try:
+        return date(year, int(month), int(day))
+    except ValueError:
+        return None
+
+
+def find_dates(text):
+    """Dates reconnues dans un texte : liste de (début, fin, date_début, date_fin) triée par position"""
+    if not text:
+        return []
+    norm = _normalize(text)
+    found = []
+
+    def add(match, start_date, end_date=None):
+        if start_date and not any(s < match.end() and match.start() < e for s, e, _, _ in found):
+            found.append((match.start(), match.end(), start_date, end_date or start_date))
+
+    # Les plages d'abord, pour ne pas les découper en dates isolées
+    for m in MONTH_RANGE_RE.finditer(norm):
+        year = m.group(5)
+        add(m, _make_date(year, MONTHS[m.group(2)], m.group(1)), _make_date(year, MONTHS[m.group(4)], m.group(3)))
+    for m in DAY_RANGE_RE.finditer(norm):
+        month = MONTHS[m.group(3)]
+        add(m, _make_date(m.group(4), month, m.group(1)), _make_date(m.group(4), month, m.group(2)))
+    for m in TEXT_DATE_RE.finditer(norm):
+        add(m, _make_date(m.group(3), MONTHS[m.group(2)], m.group(1)))
+    for m in ENGLISH_DATE_RE.finditer(norm):
+        add(m, _make_date(m.group(3), MONTHS[m.group(1)], m.group(2)))
+    for m in ISO_DATE_RE.finditer(norm):
+        add(m, _make_date(m.group(1), m.group(2), m.group(3)))
+    for m in NUMERIC_DATE_RE.finditer(norm):
+        add(m, _make_date(m.group(4), m.group(3), m.group(1)))
+    found.sort()
+    return found
+
+
+def parse_date(text):
+    """Première date (ou fin de la première plage) reconnue dans un texte, sinon None"""
+    dates = find_dates(text)
+    return dates[0][3] if dates else None
+
+
+def format_date(value):
+    """Date au format du sheet (DD/MM/YYYY)"""
+    return value.strftime("%d/%m/%Y")
+
+
+def normalize_dates(text):
+    """Remplace chaque date ou plage du texte par sa forme DD/MM/YYYY"""
+    parts = []
+    last = 0
+    for start, end, start_date, end_date in find_dates(text):
+        parts.append(text[last:start])
+        if start_date == end_date:
+            parts.append(format_date(end_date))
+        else:
+            parts.append(f"{format_date(start_date)} - {format_date(end_date)}")
+        last = end
+    parts.append(text[last:])
+    return "".join(parts)
+
+
+def _is_date_expression(text, dates):
+    """Vrai si la cellule ne contient que ses dates, un préfixe (« date limite », « avant le »...) et des
+    mots de liaison : un texte libre contenant une date n'est pas réécrit"""
+    norm = _normalize(text)
+    rest = []
+    last = 0
+    for start, end, _, _ in dates:
+        rest.append(norm[last:start])
+        last = end
+    rest.append(norm[last:])
+    rest = DEADLINE_PREFIX_RE.sub("", " ".join(part.strip() for part in rest).strip())
+    return not DATE_FILLER_RE.sub("", rest).strip()
+
+
+def normalize_deadline(value):
+    """Normalise une cellule de date (Deadline, colonnes « date ») : une date seule (préfixe « avant le »,
+    « date limite » retiré) ou des dates et leurs liaisons, au format DD/MM/YYYY. Une cellule qui n'est pas
+    une expression de date est seulement nettoyée"""
+    text = clean_text_for_spreadsheet(value)
+    if not text:
+        return ""
+    dates = find_dates(text)
+    if not dates or not _is_date_expression(text, dates):
+        return text
+    _cleaning_stats["dates"] += 1
+    if len(dates) == 1:
+        _, _, start_date, end_date = dates[0]
+        if start_date == end_date:
+            return format_date(end_date)
+        return f"{format_date(start_date)} - {format_date(end_date)}"
+    return normalize_dates(text)
+
+
+def clean_value(header, value):
+    """Nettoie une valeur selon le type de sa colonne (email, lien, date ou texte)"""
+    if value is None:
+        return ""
+    value = str(value)
+    if _normalize(value).strip(" .") in UNKNOWN_VALUES:
+        return "Non spécifié"
+    field = header_field(header)
+    if field == "email":
+        # Plusieurs adresses possibles : on garde la première valide
+        emails = re.findall(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}", value)
+        return validate_email(emails[0]) if emails else validate_email(value.replace(" ", ""))
+    if field == "url":
+        urls = re.findall(r"(?:https?://|www\.)[^\s)\]]+", value)
+        return validate_url(urls[0].rstrip(".,;") if urls else value.replace(" ", ""))
+    if field == "deadline" or "date" in _normalize(header):
+        return normalize_deadline(value)
+    return clean_text_for_spreadsheet(value)
+
+
+def clean_entry(entry, headers):
+    """Entrée nettoyée contenant exactement les colonnes attendues"""
+    cleaned = FundingEntry(schema_for(headers))
+    for position, header in enumerate(cleaned.schema.headers):
+        value = entry.get(header)
+        if value is None:
+            value = next((v for k, v in entry.items() if k.lower() == header.lower()), None)
+        cleaned.cells[position] = clean_value(header, value) if value else ""
+    return cleaned
+
+
+def clean_entries(entries, headers):
+    """Nettoie toutes les entrées et mesure le temps passé"""
+    start = time.perf_counter()
+    cleaned = [clean_entry(entry, headers) for entry in entries]
+    _cleaning_stats["entries"] += len(cleaned)
+    _cleaning_stats["seconds"] += time.perf_counter() - start
+    return cleaned
+
+
+def print_cleaning_summary():
+    """Affiche le nombre d'entrées nettoyées localement et la durée"""
+    if _cleaning_stats["entries"]:
+        print(f"🧽 Nettoyage local : {_cleaning_stats['entries']} entrée(s), {_cleaning_stats['dates']} date(s) "
+              f"normalisée(s) en {_cleaning_stats['seconds'] * 1000:.1f} ms (sans appel LLM)")
+
+
+if __name__ == "__main__":
+    # Usage : python cleaning_utils.py "avant le 1er mars 2026" "du 1 au 15 avril 2026" ...
+    for arg in sys.argv[1:]:
+        print(f"{arg!r} -> {normalize_deadline(arg)!r}")
@@ -0,0 +1,221 @@
+import os
+import re
+import sys
+import time
+import threading
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from fetch_utils import fetch_html, finish_local_page, get_http_session, canonical_url, FETCH_TIMEOUT
+
+load_dotenv()
+
+# Exploration bornée des sites de financeurs à partir de leurs pages génériques (accueil, rubriques)
+CRAWL_ENABLED = os.getenv("CRAWL_ENABLED", "1") == "1"
+CRAWL_MAX_DEPTH = min(2, int(os.getenv("CRAWL_MAX_DEPTH", "2")))
+CRAWL_DOMAIN_BUDGET = int(os.getenv("CRAWL_DOMAIN_BUDGET", "8"))  # Pages téléchargées par domaine
+CRAWL_LINKS_PER_PAGE = int(os.getenv("CRAWL_LINKS_PER_PAGE", "10"))
+CRAWL_WORKERS = int(os.getenv("CRAWL_WORKERS", "8"))
+CRAWL_HOST_DELAY = float(os.getenv("CRAWL_HOST_DELAY", "1.0"))  # Secondes entre deux requêtes sur un même hôte
+CRAWL_RESPECT_ROBOTS = os.getenv("CRAWL_RESPECT_ROBOTS", "1") == "1"
+
+FUNDING_LINK_RE = re.compile(
+    r"appels?[ _-]+(?:a|à)[ _-]+(?:projets?|candidatures?)|\b(?:appels?|aides?|fonds|subventions?|bourses?|soutiens?"
+    r"|financements?|candidatures?|calls?|grants?|funds?|funding)\b", re.I
+)
+SKIP_LINK_RE = re.compile(
+    r"\.(?:pdf|docx?|xlsx?|zip|jpe?g|png|gif|mp4)$|/(?:wp-login|login|connexion|panier|search|recherche)\b", re.I
+)
+
+_host_locks = {}
+_host_last_request = {}
+_host_guard = threading.Lock()
+_robots = {}
+_crawl_stats = {"seeds": 0, "pages": 0, "reused": 0, "handed_over": 0, "links": 0, "followed": 0,
+                "duplicates": 0, "over_budget": 0, "robots": 0, "discovered": 0, "seconds": 0.0}
+_stats_lock = threading.Lock()
+
+
+def _count(key, amount=1):
+    """Incrémente un compteur de l'exploration"""
+    with _stats_lock:
+        _crawl_stats[key] += amount
+
+
+def _site(url):
+    """Domaine d'une URL sans « www. » (périmètre de l'exploration et du budget)"""
+    host = urlsplit(url).netloc.lower().split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+def _host_lock(host):
+    """Verrou propre à un hôte (une requête à la fois par hôte)"""
+    with _host_guard:
+        return _host_locks.setdefault(host, threading.Lock())
+
+
+def _allowed_by_robots(url):
+    """Vrai si robots.txt autorise l'exploration de l'URL (cache par hôte)"""
+    if not CRAWL_RESPECT_ROBOTS:
+        return True
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    with _host_guard:
+        parser = _robots.get(origin)
+    if parser is None:
+        parser = RobotFileParser()
+        try:
+            response = get_http_session().get(origin + "/robots.txt", timeout=FETCH_TIMEOUT)
+            parser.parse(response.text.splitlines() if response.status_code == 200 else [])
+        except Exception:
+            parser.parse([])
+        with _host_guard:
+            _robots[origin] = parser
+    return parser.can_fetch(get_http_session().headers.get("User-Agent", "*"), url)
+
+
+def _polite_fetch(url):
+    """Télécharge une page en respectant le délai minimal entre deux requêtes sur le même hôte ;
+    texte et données structurées sont extraits et mis en cache pour ne pas la re-télécharger ensuite"""
+    host = urlsplit(url).netloc.lower()
+    with _host_lock(host):
+        wait = _host_last_request.get(host, 0) + CRAWL_HOST_DELAY - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            page = fetch_html(url)
+            return finish_local_page(page) if page and page.get("root") is not None else None
+        except Exception as e:
+            print(f"  ⚠️ Exploration impossible : {url} ({e})")
+            return None
+        finally:
+            _host_last_request[host] = time.monotonic()
+
+
+def is_crawl_seed(url):
+    """Vrai si l'URL est une page générique d'un site (accueil ou rubrique de financements) à explorer"""
+    segments = [segment for segment in urlsplit(url).path.split("/") if segment]
+    if not segments or segments[0].lower() in ("fr", "en", "accueil", "home", "index.html", "index.php"):
+        return len(segments) <= 1
+    return len(segments) == 1 and bool(FUNDING_LINK_RE.search(segments[0].replace("-", " ")))
+
+
+def funding_links(page_links, base_url):
+    """Liens internes d'une page (liste de (url absolue, ancre), voir fetch_utils.page_links) dont l'ancre
+    ou l'URL évoque un financement, les plus prometteurs d'abord (liste de (url, ancre))"""
+    site = _site(base_url)
+    links = {}
+    for href, text in page_links:
+        if not href.startswith(("http://", "https://")) or _site(href) != site or SKIP_LINK_RE.search(href):
+            continue
+        _count("links")
+        score = len(FUNDING_LINK_RE.findall(text)) * 2 + len(FUNDING_LINK_RE.findall(urlsplit(href).path))
+        if score:
+            key = canonical_url(href)
+            if key not in links or score > links[key][0]:
+                links[key] = (score, href, text[:120])
+    ranked = sorted(links.values(), key=lambda link: link[0], reverse=True)
+    return [(href, text) for _, href, text in ranked[:CRAWL_LINKS_PER_PAGE]]
+
+
+def crawl_for_calls(seed_urls, frontier=None, pages=None):
+    """Explore les sites à partir de pages génériques (profondeur ≤ CRAWL_MAX_DEPTH, budget par domaine)
+    et retourne les pages d'appels découvertes (liste de dicts link, title, seed, et page quand l'exploration
+    l'a déjà téléchargée). `frontier` : URLs canoniques déjà connues du run, jamais re-proposées.
+    `pages` : URL canonique -> page déjà téléchargée par le run (avec ses liens), lue sans nouvelle requête"""
+    start = time.perf_counter()
+    seen = set(frontier or ())
+    pages = pages or {}
+    budgets = {}
+    discovered = []
+    by_key = {}  # URL canonique -> page d'appel découverte
+    level = []
+    # Les pages de départ peuvent déjà figurer dans la frontière (elles ont été téléchargées) : seul leur
+    # doublon entre elles est écarté
+    seed_keys = set()
+    for url in seed_urls:
+        key = canonical_url(url)
+        if key not in seed_keys:
+            seed_keys.add(key)
+            level.append((url, url))
+    seen |= seed_keys
+    _count("seeds", len(level))
+
+    with ThreadPoolExecutor(max_workers=CRAWL_WORKERS) as executor:
+        for depth in range(1, CRAWL_MAX_DEPTH + 1):
+            # Budget par domaine : on ne télécharge pas plus de CRAWL_DOMAIN_BUDGET pages par site
+            to_fetch = []
+            fetched = []
+            for url, seed in level:
+                known = pages.get(canonical_url(url))
+                if known and known.get("links") is not None:
+                    _count("reused")
+                    fetched.append(((url, seed), known))
+                    continue
+                site = _site(url)
+                if budgets.get(site, 0) >= CRAWL_DOMAIN_BUDGET:
+                    _count("over_budget")
+                    continue
+                if not _allowed_by_robots(url):
+                    _count("robots")
+                    continue
+                budgets[site] = budgets.get(site, 0) + 1
+                to_fetch.append((url, seed))
+            fetched.extend(executor.map(lambda item: (item, _polite_fetch(item[0])), to_fetch))
+
+            next_level = []
+            for (url, seed), page in fetched:
+                if not page or page.get("links") is None:
+                    continue
+                _count("pages")
+                links = funding_links(page["links"], page["final_url"])
+                # Page d'appel déjà téléchargée : transmise au run avec son texte, sans l'arbre HTML ni ses liens
+                result = by_key.get(canonical_url(url))
+                if result is not None and page.get("text"):
+                    result["page"] = dict(page, root=None, links=None)
+                    _count("handed_over")
+                for href, text in links:
+                    key = canonical_url(href)
+                    if key in seen:
+                        _count("duplicates")
+                        continue
+                    seen.add(key)
+                    if not _allowed_by_robots(href):
+                        _count("robots")
+                        continue
+                    _count("followed")
+                    discovered.append({"link": href, "title": text, "snippet": "", "seed": seed})
+                    by_key[key] = discovered[-1]
+                    if depth < CRAWL_MAX_DEPTH:
+                        next_level.append((href, seed))
+            level = next_level
+            if not level:
+                break
+
+    _count("discovered", len(discovered))
+    _count("seconds", time.perf_counter() - start)
+    return discovered
+
+
+def print_crawl_summary():
+    """Affiche les statistiques de l'exploration"""
+    stats = _crawl_stats
+    if not stats["seeds"]:
+        return
+    print(f"\n🕸️ Exploration : {stats['seeds']} page(s) de départ, {stats['pages']} page(s) lue(s) "
+          f"en {stats['seconds']:.1f} s, {stats['discovered']} page(s) d'appel découverte(s)")
+    print(f"  - Sans nouvelle requête : {stats['reused']} page(s) de départ déjà téléchargée(s), "
+          f"{stats['handed_over']} page(s) d'appel transmise(s) avec leur contenu")
+    print(f"  - Liens internes : {stats['links']}, suivis : {stats['followed']}, "
+          f"déjà dans la frontière : {stats['duplicates']}")
+    print(f"  - Ignorées : {stats['over_budget']} (budget par domaine), {stats['robots']} (robots.txt)")
+
+
+if __name__ == "__main__":
+    # Usage : python crawl_utils.py <url> [<url> ...]
+    for result in crawl_for_calls(sys.argv[1:]):
+        print(f"  - {result['link']} ({result['title']})")
+    print_crawl_summary()
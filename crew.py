@@ -2,23 +2,98 @@ from crewai import Agent, Task, Crew
 from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 import os
-import requests
 import re
+import time
 from sheets_utils import (
     send_to_google_sheet, 
-    get_existing_entries, 
-    get_keywords_from_sheet, 
+    get_sheet_rows, 
     generate_crew_prompt, 
     parse_crew_output,
-    test_google_sheets_connection
+    update_sheet_rows,
+    load_startup_context
+)
+from fetch_utils import (
+    get_page,
+    canonical_url,
+    record_corpus_urls,
+    get_last_hedge_id,
+    print_hedge_summary,
+    print_fetch_summary,
+    CONTENT_BACKEND
+)
+from search_utils import google_search_results, plan_search_budget
+from triage_utils import (
+    triage_search_results,
+    train_triage_model,
+    attribute_source_pages,
+    print_triage_summary,
+    SOURCE_PAGE_KEY
+)
+from passage_utils import PassageIndex, PAGE_CONTEXT_CHARS
+from sources_utils import (
+    discover_source_pages,
+    record_source_page,
+    get_source_domains,
+    print_sources_summary,
+    SOURCES_EXCLUDE_FROM_SEARCH
+)
+from incremental_utils import (
+    compare_page_sections,
+    fingerprint_text,
+    index_existing_entries,
+    record_page_change,
+    build_update_context,
+    run_update_task,
+    save_page_sections,
+    commit_page_changes,
+    print_incremental_summary,
+    INCREMENTAL_ENABLED
+)
+from refresh_worker import refresh_existing_rows, print_refresh_summary
+from crawl_utils import crawl_for_calls, is_crawl_seed, print_crawl_summary, CRAWL_ENABLED
+from site_extractors import is_site_entry_complete
+from cleaning_utils import clean_entries, print_cleaning_summary
+from deadline_utils import annotate_deadlines, filter_expired, print_deadline_summary, EXPIRED_POLICY
+from mirror_utils import mirror_entries, mirror_links
+from archive_utils import archive_rows, ARCHIVE_ENABLED
+from funding_entry import FundingEntry
+from pipeline_utils import (
+    prefetch,
+    build_exclusions,
+    exclusion_text_for,
+    cites_known_entry,
+    record_chunk,
+    record_analysis,
+    record_batch,
+    print_pipeline_summary,
+    PIPELINE_CHUNK_CHARS,
+    PIPELINE_BATCH_ROWS,
+    PIPELINE_ANALYSIS_ENTRIES,
+    PIPELINE_ANALYSIS_SECONDS
+)
+from link_utils import verify_entry_links, source_link, print_link_summary
+from structured_utils import (
+    map_structured_fields,
+    is_structured_entry_complete,
+    format_known_fields,
+    merge_structured_fields,
+    record_structured_page,
+    print_structured_summary
+)
+from keyword_utils import (
+    record_keyword_results,
+    record_keyword_entries,
+    select_keywords,
+    collapse_redundant_keywords
 )
 
 # Charger les variables d'environnement (.env)
 load_dotenv()
 
-# Test de connexion Google Sheets au démarrage
+# Lecture groupée du Google Sheet au démarrage (en-têtes, aides existantes, mots-clés) : une seule requête
 print("🔧 Vérification de la connexion Google Sheets...")
-if not test_google_sheets_connection():
+sheet_context = load_startup_context()
+if sheet_context is None:
     print("❌ Impossible de se connecter à Google Sheets. Vérifiez votre fichier credentials.json")
     exit(1)
 
@@ -26,11 +101,11 @@ if not test_google_sheets_connection():
 llm = ChatOpenAI(model="gpt-4-turbo")
 
 # Générer dynamiquement le prompt basé sur les colonnes du Google Sheet
-prompt_text, expected_headers = generate_crew_prompt()
+prompt_text, expected_headers = generate_crew_prompt(sheet_context["headers"])
 print(f"\n📋 Colonnes à rechercher : {expected_headers}\n")
 
-# Récupérer les aides déjà trouvées
-existing_aides = get_existing_entries()
+# Récupérer les aides déjà trouvées (colonnes clés seulement : nom, lien, date limite, statut)
+existing_aides = sheet_context["existing"]
 
 # Agent 1 : Recherche
 research_agent = Agent(
@@ -41,46 +116,20 @@ research_agent = Agent(
     llm=llm
 )
 
-# Agent 2 : Nettoyeur
-data_cleaning_agent = Agent(
-    role="Nettoyeur de données",
-    goal="Nettoyer et uniformiser les informations collectées pour créer une base exploitable, en respectant exactement les colonnes demandées.",
-    backstory="Spécialiste de la normalisation de données pour des bases structurées.",
-    verbose=True,
-    llm=llm
-)
-
-# Agent 3 : Vérificateur & Analyste
+# Agent 2 : Vérificateur & Analyste
 analysis_agent = Agent(
     role="Vérificateur et analyste stratégique",
-    goal="Vérifier la pertinence des liens, s'assurer qu'ils pointent vers des aides spécifiques, et enrichir avec des commentaires stratégiques.",
+    goal="S'assurer que chaque aide correspond au projet et l'enrichir avec des commentaires stratégiques.",
     backstory="Consultant expert en montage de dossiers de financement pour films internationaux.",
     verbose=True,
     llm=llm
 )
 
-# Génération de la consigne en excluant les aides déjà connues
-exclusion_text = ""
-if existing_aides:
-    # Extraire les noms des aides existantes
-    existing_names = []
-    for aide in existing_aides:
-        # Chercher le champ nom dans différentes variations possibles
-        nom = aide.get('Nom') or aide.get('nom') or aide.get('NAME') or ""
-        if nom:
-            existing_names.append(nom)
-    
-    if existing_names:
-        exclusion_text = "\nIgnore les aides déjà listées avec les noms suivants :\n" + "\n".join(
-            f"- {nom}" for nom in existing_names
-        )
-
-# API Google Search params
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-GOOGLE_CX = os.getenv("GOOGLE_CSE_ID")  # Correction du nom de la variable
+# Aides déjà connues, préparées une fois : chaque lot de pages ne reçoit que celles qui le concernent
+exclusions = build_exclusions(existing_aides)
 
 # Charger dynamiquement les mots-clés depuis Google Sheets (onglet "MotsClés")
-keywords_to_test = get_keywords_from_sheet()
+keywords_to_test = sheet_context["keywords"]
 
 # Si pas de mots-clés dans le sheet, utiliser des mots-clés par défaut
 if not keywords_to_test:
@@ -91,88 +140,292 @@ if not keywords_to_test:
         "subvention documentaire culturel 2024"
     ]
 
+# Un seul représentant par groupe de mots-clés redondants, puis choix selon le rendement passé
+keywords_to_test = collapse_redundant_keywords(keywords_to_test)
+keywords_to_test = select_keywords(keywords_to_test)
+
 print(f"\n🔍 Mots-clés à rechercher : {keywords_to_test}\n")
 
-# API perso pour extraire le contenu des pages
-CONTENT_API_KEY = os.getenv("VERIFYBOT_CONTENT_API_KEY")
-
-def google_search_urls(query):
-    """Effectue une recherche Google et retourne les URLs"""
-    url = "https://www.googleapis.com/customsearch/v1"
-    params = {
-        "key": GOOGLE_API_KEY,
-        "cx": GOOGLE_CX,
-        "q": query
-    }
+# Pipeline en flux : découverte → pages → lots de contexte → entrées → lots de lignes.
+# La découverte et le téléchargement tournent dans un thread producteur borné par PIPELINE_QUEUE_SIZE ;
+# chaque lot de pages part au LLM dès qu'il est plein et ses aides sont écrites aussitôt.
+# Les données d'une page (texte, champs, sections modifiées) voyagent avec elle dans le pipeline
+total_urls = 0
+passage_index = PassageIndex()
+fetched_urls = []
+fetched_results = []  # Résultats dont la page a été extraite : exemples du modèle de tri en fin de run
+url_keywords = {}  # URL canonique -> mots-clés qui l'ont renvoyée
+FETCH_CORPUS_FILE = os.getenv("FETCH_CORPUS_FILE")
+print(f"🧩 Backend d'extraction : {CONTENT_BACKEND}")
+hedge_log_start = get_last_hedge_id() if CONTENT_BACKEND == "hedged" else 0
+
+existing_index = index_existing_entries(existing_aides)  # Lien canonique -> (ligne, entrée du sheet)
+known_links = set(existing_index) | mirror_links()  # Aides déjà connues (sheet et miroir, archives comprises)
+crawl_seeds = {}  # Page générique -> mots-clés qui l'ont renvoyée (point de départ de l'exploration)
+context_stats = {"pages": 0, "context_chars": 0, "raw_chars": 0}
+
+
+def collect_page(result):
+    """Télécharge une page retenue et indexe ses passages. Retourne ses données pour le pipeline (url, text,
+    fields : colonnes résolues sans LLM, change : sections modifiées, site : résolue par un extracteur dédié,
+    links et final_url pour l'exploration) ou None si aucun contenu n'a été extrait"""
+    global total_urls
+    url = result["link"]
+    fetched_urls.append(url)
+    # Page déjà lue par l'exploration : son contenu est transmis avec le résultat, sans nouvelle requête
+    crawled_page = result.pop("page", None)
     try:
-        res = requests.get(url, params=params)
-        results = res.json()
-        links = [item["link"] for item in results.get("items", [])][:5]  # Limiter à 5 résultats
-        print(f"\n🔍 Recherche : {query}")
-        for link in links:
-            print(f"  - {link}")
-        return links
+        page = crawled_page or get_page(url)
+        if page:
+            content = page["text"]
+            passage_index.add_page(url, content)
+            change = None
+            if INCREMENTAL_ENABLED:
+                # Empreintes sur le texte de l'extracteur local : une aide du sheet lue par l'API distante
+                # est relue localement, les autres pages distantes ne sont pas comparées
+                local_text = fingerprint_text(page, fetch_local=canonical_url(url) in existing_index)
+                if local_text:
+                    change = compare_page_sections(url, local_text)
+            structured = page.get("structured") or {}
+            # Page d'une aide déjà connue : exemple positif du tri même si elle ne produit pas de nouvelle entrée
+            result["known"] = canonical_url(url) in known_links or cites_known_entry(exclusions, content)
+            fetched_results.append(result)
+            total_urls += 1
+            return {
+                "url": url,
+                "text": content,
+                "fields": map_structured_fields(structured, content, url, expected_headers),
+                "change": change,
+                "site": is_site_entry_complete(structured.get("site", {})),
+                "links": page.get("links"),
+                "final_url": page.get("final_url", url)
+            }
+        print(f"⚠️ Aucun contenu extrait pour : {url}")
     except Exception as e:
-        print(f"❌ Erreur recherche Google : {e}")
-        return []
-
-def get_page_content(target_url):
-    """Extrait le contenu d'une page web"""
-    api_url = f"https://cockpit.verifybot.app/api-get-content.php"
-    params = {
-        "url": target_url,
-        "key": CONTENT_API_KEY
-    }
+        print(f"Erreur sur {url}: {e}")
+    return None
+
+
+def discover_pages():
+    """Sources connues, recherche par mots-clés puis exploration : produit les données de chaque page
+    (voir collect_page) dès qu'elle est extraite"""
+    seed_pages = {}  # Page générique déjà téléchargée (URL canonique -> liens) : l'exploration ne la relit pas
+
+    def collected(result):
+        """Page extraite ; les liens d'une page générique sont gardés pour l'exploration"""
+        page = collect_page(result)
+        if page:
+            links, final_url = page.pop("links"), page.pop("final_url")
+            if links is not None and is_crawl_seed(page["url"]):
+                seed_pages[canonical_url(page["url"])] = {"final_url": final_url, "links": links}
+        return page
+
+    # Financeurs connus : pages nouvelles ou modifiées d'après leurs sitemaps et flux (sans quota CSE)
+    # Version d'une page enregistrée seulement une fois traitée : un échec d'extraction la repropose au run suivant
+    for result in discover_source_pages():
+        url_key = canonical_url(result["link"])
+        if url_key in url_keywords:
+            record_source_page(result)  # Déjà revalidée par le rafraîchissement
+            continue
+        url_keywords[url_key] = []
+        page = collected(result)
+        if page:
+            record_source_page(result)
+            yield page
+    search_exclusions = get_source_domains() if SOURCES_EXCLUDE_FROM_SEARCH else []
+
+    # Répartition du quota CSE entre les mots-clés selon leur rendement historique
+    search_plan = plan_search_budget(keywords_to_test)
+
+    for keyword in keywords_to_test:
+        if not search_plan.get(keyword):
+            continue
+        results = google_search_results(keyword, search_plan[keyword], search_exclusions)
+        new_urls = record_keyword_results(keyword, search_plan[keyword], [r["link"] for r in results])
+        print(f"  🆕 {new_urls} URL(s) jamais vue(s)")
+        # Tri sur le titre et l'extrait avant de télécharger
+        results, skipped = triage_search_results(results)
+        for result in results:
+            url_key = canonical_url(result["link"])
+            already_fetched = url_key in url_keywords
+            url_keywords.setdefault(url_key, []).append(keyword)
+            page = None if already_fetched else collected(result)
+            if page:
+                yield page
+        # Pages génériques (accueil, rubrique) : point de départ de l'exploration des sites
+        for result in results + skipped:
+            if result.get("triage_score", 0) > -5 and is_crawl_seed(result["link"]):
+                crawl_seeds.setdefault(result["link"], []).append(keyword)
+
+    # Exploration bornée depuis les pages génériques vers les pages d'appels
+    if CRAWL_ENABLED and crawl_seeds:
+        discovered = crawl_for_calls(list(crawl_seeds), frontier=url_keywords.keys(), pages=seed_pages)
+        seed_pages.clear()
+        discovered, _ = triage_search_results(discovered)
+        for result in discovered:
+            url_key = canonical_url(result["link"])
+            if url_key in url_keywords:
+                continue
+            url_keywords[url_key] = list(crawl_seeds[result["seed"]])
+            page = collected(result)
+            if page:
+                yield page
+        print_crawl_summary()
+
+    print_sources_summary()
+    print(f"\n📚 Total : {total_urls} pages extraites\n")
+
+
+def page_items(pages):
+    """Pages → éléments du pipeline, en libérant les passages de chaque page une fois transmise :
+    ("update", url, (ligne, entrée), sections modifiées) pour une aide déjà enregistrée dont la page a changé,
+    ("entry", url, entrée, texte) pour une page entièrement résolue par un extracteur dédié ou le balisage
+    structuré, ("document", url, contexte, texte, champs) pour les autres (introduction et passages utiles)"""
+    for page in pages:
+        url, text, fields, change = page["url"], page["text"], page["fields"], page["change"]
+        existing = existing_index.get(canonical_url(url))
+        if existing and change and change["status"] != "new":
+            record_page_change(change, text)
+            passage_index.release_page(url)
+            if change["status"] == "changed":
+                yield "update", url, existing, change
+            continue
+        if change and change["status"] == "changed":
+            save_page_sections([change])  # Page sans ligne dans le sheet : réanalysée en entier
+        context = passage_index.build_page_context(url)
+        passage_index.release_page(url)
+        complete = page["site"] or is_structured_entry_complete(fields, expected_headers)
+        record_structured_page(fields, expected_headers, len(context), complete)
+        if complete:
+            entry = FundingEntry(expected_headers, {h: fields.get(h, "") for h in expected_headers})
+            entry[SOURCE_PAGE_KEY] = url
+            yield "entry", url, entry, text
+            continue
+        context_stats["pages"] += 1
+        context_stats["raw_chars"] += min(len(text), 5000)
+        part = f"\n\n---\nContenu extrait de : {url}\n{format_known_fields(fields)}{context}\n"
+        context_stats["context_chars"] += len(part)
+        yield "document", url, part, text, fields
+
+
+def fallback_entries(result_text):
+    """Parsing alternatif : entrées basiques construites autour des URLs du résultat brut"""
+    entries = []
+    # Méthode alternative : chercher des blocs de texte structurés
+    # Chercher toutes les URLs dans le texte
+    urls = re.findall(r'https?://[^\s]+', result_text)
+    print(f"URLs trouvées dans le résultat : {len(urls)}")
     
-    # Log de l'URL pour debug
-    print(f"  📡 Appel API : {api_url}?url={target_url}&key={'*' * 10 if CONTENT_API_KEY else 'NO_KEY'}")
-    
-    try:
-        response = requests.get(api_url, params=params, timeout=10)
-        data = response.json()
+    # Créer des entrées basiques avec ce qu'on trouve
+    for i, url in enumerate(urls[:10]):  # Limiter à 10
+        # Chercher du contexte autour de l'URL
+        url_context = ""
+        url_pos = result_text.find(url)
+        if url_pos > 0:
+            # Prendre 200 caractères avant et après l'URL
+            start = max(0, url_pos - 200)
+            end = min(len(result_text), url_pos + len(url) + 200)
+            url_context = result_text[start:end]
         
-        if response.status_code != 200:
-            print(f"  ❌ Erreur HTTP {response.status_code}")
-            return None
-            
-        content = data.get("content", "")
-        if content:
-            print(f"  ✅ Contenu extrait : {len(content)} caractères")
-        else:
-            print(f"  ⚠️ Réponse vide ou erreur : {data.get('error', 'Aucun contenu')}")
-            
-        return content if content else None
-    except Exception as e:
-        print(f"  ❌ Exception : {e}")
-        return None
-
-# Collecter le contenu des pages
-documents_text = ""
-total_urls = 0
-
-for keyword in keywords_to_test:
-    urls = google_search_urls(keyword)
-    for url in urls:
-        try:
-            content = get_page_content(url)
-            if content:
-                documents_text += f"\n\n---\nContenu extrait de : {url}\n{content[:5000]}\n"  # Limiter la taille
-                total_urls += 1
+        # Essayer d'extraire un nom
+        nom_patterns = [
+            r'(?:Nom|Aide|Programme|Fonds)\s*:\s*([^\n]+)',
+            r'(?:^|\n)([A-Z][^:\n]{10,50})(?=\n)',
+            r'(?:aide|subvention|financement)\s+([^\n]+)'
+        ]
+        
+        nom = f"Aide {i+1}"  # Nom par défaut
+        for pattern in nom_patterns:
+            match = re.search(pattern, url_context, re.IGNORECASE)
+            if match:
+                nom = match.group(1).strip()
+                break
+        
+        # Créer une entrée basique
+        entry = FundingEntry(expected_headers)
+        
+        # Remplir avec les colonnes attendues
+        for header in expected_headers:
+            if 'nom' in header.lower():
+                entry[header] = nom
+            elif 'lien' in header.lower() or 'url' in header.lower():
+                entry[header] = url.strip()
+            elif 'résumé' in header.lower() or 'resume' in header.lower():
+                entry[header] = url_context.replace('\n', ' ').strip()[:200]
+            elif 'statut' in header.lower():
+                entry[header] = "À vérifier"
+            elif 'organisme' in header.lower():
+                if 'cnc' in url.lower():
+                    entry[header] = "CNC"
+                elif 'scam' in url.lower():
+                    entry[header] = "SCAM"
+                elif 'iledefrance' in url.lower():
+                    entry[header] = "Région Île-de-France"
+                else:
+                    entry[header] = ""
+            elif 'pays' in header.lower():
+                if any(keyword in url.lower() for keyword in ['cnc', 'scam', 'iledefrance', 'france']):
+                    entry[header] = "France"
+                else:
+                    entry[header] = ""
             else:
-                print(f"⚠️ Aucun contenu extrait pour : {url}")
-        except Exception as e:
-            print(f"Erreur sur {url}: {e}")
-
-print(f"\n📚 Total : {total_urls} pages extraites\n")
+                entry[header] = ""
+        
+        entries.append(entry)
+    
+    print(f"\n📊 {len(entries)} aide(s) créée(s) par parsing alternatif")
+    return entries
 
-# Si aucun contenu trouvé, arrêter
-if not documents_text:
-    print("❌ Aucun contenu trouvé. Vérifiez vos clés API.")
-    exit(1)
 
-# Tâche de recherche avec prompt dynamique
-funding_task = Task(
-    description=f"""{prompt_text}
+def analyse_entries(entries):
+    """Analyse des aides encore ouvertes issues des agents (commentaires stratégiques, champs manquants)"""
+    entries_text = "\n\n".join(
+        "\n".join(f"{header} : {entry.get(header, '')}" for header in expected_headers) for entry in entries
+    )
+    analysis_task = Task(
+        description=f"""Enrichis chaque aide (les liens sont vérifiés automatiquement, ne les modifie pas) :
+    - Ajoute des commentaires stratégiques sur l'adéquation avec le projet
+    - Complète les informations manquantes si possible
+    - Structure finale avec TOUS ces champs : {', '.join(expected_headers)}
+
+    Aides à analyser :
+    {entries_text}""",
+        expected_output=f"Version finale enrichie avec tous les champs : {', '.join(expected_headers)}",
+        agent=analysis_agent
+    )
+    analysis_crew = Crew(agents=[analysis_agent], tasks=[analysis_task], verbose=True)
+    print(f"\n🧐 Analyse de {len(entries)} aide(s) ouverte(s)...\n")
+    return parse_crew_output(str(analysis_crew.kickoff()), expected_headers)
+
+
+def finalize_entries(entries, texts, fields):
+    """Champs structurés, nettoyage local, dates limites et filtrage des appels expirés d'un lot d'entrées.
+    Retourne (entrées ouvertes, entrées expirées)"""
+    # Les champs extraits du balisage structuré priment
+    entries = merge_structured_fields(entries, fields, canonical_url)
+    # Page d'origine de chaque entrée (exemple positif du tri même si le lien pointe vers une sous-page)
+    entries = attribute_source_pages(entries, texts)
+    # Nettoyage local (markdown, espaces, dates en DD/MM/YYYY, liens https://, 500 caractères max)
+    entries = clean_entries(entries, expected_headers)
+    # Dates limites en ISO (champ Deadline, sinon texte de la page) et filtrage des appels expirés
+    entries = annotate_deadlines(entries, expected_headers, texts, canonical_url)
+    return filter_expired(entries, expected_headers)
+
+
+def research_chunk(chunk):
+    """Lot de pages (≤ PIPELINE_CHUNK_CHARS) → entrées : recherche LLM, parsing, nettoyage et filtrage.
+    Retourne (entrées ouvertes, entrées expirées, textes des pages, champs structurés) ; l'analyse des
+    aides ouvertes est regroupée sur plusieurs lots par entry_batches"""
+    documents_text = "".join(part for _, part, _, _ in chunk)
+    texts = {url: text for url, _, text, _ in chunk}
+    fields = {url: page_fields for url, _, _, page_fields in chunk}
+    record_chunk(len(documents_text))
+    # Seules les aides déjà connues du même site ou citées dans le lot sont rappelées
+    exclusion_text = exclusion_text_for(exclusions, texts, documents_text)
+
+    # Tâche de recherche avec prompt dynamique
+    funding_task = Task(
+        description=f"""{prompt_text}
     
     IMPORTANT : Pour chaque aide trouvée, extrais TOUTES les informations demandées.
     Si une information n'est pas disponible, indique "Non spécifié" mais inclus quand même le champ.
@@ -180,148 +433,222 @@ funding_task = Task(
     {exclusion_text}
     
     Contenu à analyser :
-    {documents_text[:50000]}""",  # Limiter la taille pour GPT
-    expected_output=f"Une liste structurée d'aides avec EXACTEMENT ces champs : {', '.join(expected_headers)}",
-    agent=research_agent
-)
-
-# Tâche de nettoyage
-data_cleaning_task = Task(
-    description=f"""Prends les résultats et nettoie-les pour un tableur :
-    - Supprime TOUS les caractères de formatage : *, **, _, __, #, ##, ###, etc.
-    - Supprime les retours à la ligne multiples et remplace par des espaces
-    - Supprime les tabulations et caractères spéciaux
-    - Convertis tout en texte brut, sans formatage markdown ou HTML
-    - Assure-toi que chaque aide a TOUS les champs suivants : {', '.join(expected_headers)}
-    - Standardise les formats (dates en DD/MM/YYYY, emails sans espaces, liens complets avec https://)
-    - Garde un format cohérent pour chaque entrée
-    - Maximum 500 caractères par champ pour éviter les débordements
-    - Remplace les caractères problématiques comme les guillemets par des apostrophes simples""",
-    expected_output=f"Liste propre en texte brut avec ces champs exacts : {', '.join(expected_headers)}",
-    agent=data_cleaning_agent
-)
-
-# Tâche d'analyse
-analysis_task = Task(
-    description=f"""Vérifie et enrichis chaque aide :
-    - Vérifie que les liens sont pertinents (pas de pages d'accueil génériques)
-    - Ajoute des commentaires stratégiques sur l'adéquation avec le projet
-    - Complète les informations manquantes si possible
-    - Structure finale avec TOUS ces champs : {', '.join(expected_headers)}""",
-    expected_output=f"Version finale enrichie avec tous les champs : {', '.join(expected_headers)}",
-    agent=analysis_agent
-)
-
-# Création de la crew
-crew = Crew(
-    agents=[research_agent, data_cleaning_agent, analysis_agent],
-    tasks=[funding_task, data_cleaning_task, analysis_task],
-    verbose=True
-)
-
-print("\n🚀 Lancement de la recherche d'aides...\n")
-
-# Exécution
-try:
-    result = crew.kickoff()
-    result_text = str(result)
+    {documents_text}""",
+        expected_output=f"Une liste structurée d'aides avec EXACTEMENT ces champs : {', '.join(expected_headers)}",
+        agent=research_agent
+    )
+    # Crew de recherche (l'analyse est lancée séparément, après le filtrage des appels expirés)
+    research_crew = Crew(agents=[research_agent], tasks=[funding_task], verbose=True)
+    print(f"\n🚀 Recherche d'aides sur {len(chunk)} page(s) ({len(documents_text)} caractères)...\n")
+    result_text = str(research_crew.kickoff())
     
     print("\n📄 Résultat brut (aperçu) :")
     print(result_text[:1000] + "..." if len(result_text) > 1000 else result_text)
     
     # Parser le résultat avec la nouvelle fonction dynamique
     entries = parse_crew_output(result_text, expected_headers)
-    
     print(f"\n📊 {len(entries)} aide(s) extraite(s)")
     
     # Si pas d'entrées, essayer un parsing alternatif
-    if not entries:
+    if not entries and result_text:
         print("\n⚠️ Parsing standard échoué. Tentative de parsing alternatif...")
-        
-        # Méthode alternative : chercher des blocs de texte structurés
-        # Chercher toutes les URLs dans le texte
-        urls = re.findall(r'https?://[^\s]+', result_text)
-        print(f"URLs trouvées dans le résultat : {len(urls)}")
-        
-        # Créer des entrées basiques avec ce qu'on trouve
-        for i, url in enumerate(urls[:10]):  # Limiter à 10
-            # Chercher du contexte autour de l'URL
-            url_context = ""
-            url_pos = result_text.find(url)
-            if url_pos > 0:
-                # Prendre 200 caractères avant et après l'URL
-                start = max(0, url_pos - 200)
-                end = min(len(result_text), url_pos + len(url) + 200)
-                url_context = result_text[start:end]
-            
-            # Essayer d'extraire un nom
-            nom_patterns = [
-                r'(?:Nom|Aide|Programme|Fonds)\s*:\s*([^\n]+)',
-                r'(?:^|\n)([A-Z][^:\n]{10,50})(?=\n)',
-                r'(?:aide|subvention|financement)\s+([^\n]+)'
-            ]
-            
-            nom = f"Aide {i+1}"  # Nom par défaut
-            for pattern in nom_patterns:
-                match = re.search(pattern, url_context, re.IGNORECASE)
-                if match:
-                    nom = match.group(1).strip()
-                    break
-            
-            # Créer une entrée basique
-            entry = {}
-            
-            # Remplir avec les colonnes attendues
-            for header in expected_headers:
-                if 'nom' in header.lower():
-                    entry[header] = nom
-                elif 'lien' in header.lower() or 'url' in header.lower():
-                    entry[header] = url.strip()
-                elif 'résumé' in header.lower() or 'resume' in header.lower():
-                    entry[header] = url_context.replace('\n', ' ').strip()[:200]
-                elif 'statut' in header.lower():
-                    entry[header] = "À vérifier"
-                elif 'organisme' in header.lower():
-                    if 'cnc' in url.lower():
-                        entry[header] = "CNC"
-                    elif 'scam' in url.lower():
-                        entry[header] = "SCAM"
-                    elif 'iledefrance' in url.lower():
-                        entry[header] = "Région Île-de-France"
-                    else:
-                        entry[header] = ""
-                elif 'pays' in header.lower():
-                    if any(keyword in url.lower() for keyword in ['cnc', 'scam', 'iledefrance', 'france']):
-                        entry[header] = "France"
-                    else:
-                        entry[header] = ""
-                else:
-                    entry[header] = ""
-            
-            entries.append(entry)
-        
-        print(f"\n📊 {len(entries)} aide(s) créée(s) par parsing alternatif")
-    
-    if entries:
-        print("\n🔍 Aperçu des entrées extraites :")
-        for i, entry in enumerate(entries[:3]):
-            print(f"\n--- Entrée {i+1} ---")
-            for key, value in entry.items():
-                print(f"  {key}: {value[:100] if value and len(str(value)) > 100 else value}")
-        
-        # Envoi vers Google Sheets
-        print("\n📤 Envoi vers Google Sheets...")
-        send_to_google_sheet(entries)
-    else:
+        entries = fallback_entries(result_text)
+    if not entries:
         print("\n❌ Aucune aide trouvée même avec le parsing alternatif")
         print("\nDébut du résultat brut pour analyse :")
         print(result_text[:1000])
+        return [], [], texts, fields
+
+    entries, expired = finalize_entries(entries, texts, fields)
+    return entries, expired, texts, fields
+
+
+def analyse_pending(entries, texts, fields):
+    """Analyse en un seul appel des aides ouvertes issues de plusieurs lots de recherche"""
+    record_analysis()
+    analysed = analyse_entries(entries)
+    if not analysed:
+        print("⚠️ Résultat de l'analyse illisible, conservation des entrées de recherche")
+        return entries
+    analysed = attribute_source_pages(merge_structured_fields(analysed, fields, canonical_url), texts)
+    return annotate_deadlines(clean_entries(analysed, expected_headers), expected_headers, texts, canonical_url)
+
+
+def entry_batches(items, run):
+    """Éléments du pipeline → lots d'entrées prêtes à écrire : les pages structurées par PIPELINE_BATCH_ROWS,
+    les pages à analyser par lots de contexte d'au plus PIPELINE_CHUNK_CHARS, recherchés dès qu'ils sont
+    pleins (un appel de recherche par lot), les aides ouvertes analysées dès que PIPELINE_ANALYSIS_ENTRIES
+    attendent ou que la plus ancienne attend depuis PIPELINE_ANALYSIS_SECONDS (un appel d'analyse).
+    Les pages modifiées d'aides déjà enregistrées sont mises de côté dans run["changed_pages"]"""
+    chunk = []
+    chunk_chars = 0
+    structured = []
+    structured_texts = {}
+    # Aides ouvertes en attente d'analyse, avec les textes et champs de leurs pages
+    pending = {"entries": [], "texts": {}, "fields": {}, "since": None}
+
+    def research(chunk):
+        """Recherche sur un lot ; les aides expirées conservées partent tout de suite, les ouvertes attendent"""
+        entries, expired, texts, fields = research_chunk(chunk)
+        if entries and not pending["entries"]:
+            pending["since"] = time.monotonic()
+        pending["entries"].extend(entries)
+        pending["texts"].update(texts)
+        pending["fields"].update(fields)
+        # Appels expirés : supprimés, ou conservés avec le statut « Expirée » (EXPIRED_POLICY=tag)
+        return expired if EXPIRED_POLICY == "tag" else []
+
+    def analysis_due():
+        """Vrai si les aides en attente doivent partir à l'analyse (nombre ou délai atteint)"""
+        return bool(pending["entries"]) and (
+            len(pending["entries"]) >= PIPELINE_ANALYSIS_ENTRIES
+            or time.monotonic() - pending["since"] >= PIPELINE_ANALYSIS_SECONDS
+        )
+
+    def analysed():
+        """Aides en attente, analysées puis retirées de l'attente"""
+        entries = analyse_pending(pending["entries"], pending["texts"], pending["fields"])
+        pending.update(entries=[], texts={}, fields={}, since=None)
+        return entries
+
+    for kind, url, *payload in items:
+        if kind == "update":
+            run["changed_pages"].append((url, *payload))
+        elif kind == "entry":
+            entry, text = payload
+            structured.append(entry)
+            structured_texts[url] = text
+        else:
+            part, text, fields = payload
+            if chunk and chunk_chars + len(part) > PIPELINE_CHUNK_CHARS:
+                yield research(chunk)
+                chunk, chunk_chars = [], 0
+            chunk.append((url, part, text, fields))
+            chunk_chars += len(part)
+            # Lot plein (plus la place pour le contexte d'une page) : recherché sans attendre la page suivante
+            if PIPELINE_CHUNK_CHARS - chunk_chars < PAGE_CONTEXT_CHARS:
+                yield research(chunk)
+                chunk, chunk_chars = [], 0
+        if analysis_due():
+            yield analysed()
+        if len(structured) >= PIPELINE_BATCH_ROWS:
+            entries, expired = finalize_entries(structured, structured_texts, {})
+            yield entries + expired if EXPIRED_POLICY == "tag" else entries
+            structured, structured_texts = [], {}
+    if chunk:
+        yield research(chunk)
+    if pending["entries"]:
+        yield analysed()
+    if structured:
+        entries, expired = finalize_entries(structured, structured_texts, {})
+        yield entries + expired if EXPIRED_POLICY == "tag" else entries
+
+
+def write_batch(entries, run):
+    """Écrit un lot d'entrées dans le sheet dès qu'il est prêt (liens vérifiés, mots-clés, miroir) et
+    note leurs liens et pages d'origine dans l'état du run"""
+    if not entries:
+        return
+    # Vérification locale des liens (redirections, liens cassés, pages d'accueil génériques)
+    entries = verify_entry_links(entries, expected_headers)
+    if not run["sent_links"]:
+        print("\n🔍 Aperçu des entrées extraites :")
+        for i, entry in enumerate(entries[:3]):
+            print(f"\n--- Entrée {i+1} ---")
+            for header in expected_headers:
+                value = entry.get(header, "")
+                print(f"  {header}: {value[:100] if value and len(str(value)) > 100 else value}")
+    run["sent_links"].extend(source_link(entry) for entry in entries)
+    run["produced_pages"].extend(entry.get(SOURCE_PAGE_KEY, "") for entry in entries)
+    
+    # Envoi vers Google Sheets
+    print(f"\n📤 Envoi de {len(entries)} aide(s) vers Google Sheets...")
+    added_entries = send_to_google_sheet(entries)
+    record_keyword_entries(added_entries, url_keywords)
+    mirror_entries(added_entries)
+    record_batch(len(added_entries))
+
+
+# Rafraîchissement des lignes existantes (priorité aux dates limites proches), dans la limite de
+# REFRESH_CAPACITY : les liens revalidés ne sont pas re-téléchargés par la découverte
+refresh = refresh_existing_rows(existing_aides, expected_headers, load_rows=get_sheet_rows)
+for url_key in refresh["urls"]:
+    url_keywords[url_key] = []
+
+update_parts = list(refresh["update_parts"])  # Aides déjà enregistrées : seules les sections modifiées repartent au LLM
+# État du run côté écriture, créé avant le démarrage du thread producteur : pages modifiées d'aides déjà
+# enregistrées (url, (ligne, entrée), sections modifiées), liens des aides transmises au sheet et pages
+# dont elles sont issues
+run = {"changed_pages": [], "sent_links": [], "produced_pages": []}
+
+print("\n🚀 Lancement de la recherche d'aides...\n")
+
+# Exécution
+run_succeeded = False
+try:
+    pages = prefetch(page_items(discover_pages()))
+    try:
+        for batch in entry_batches(pages, run):
+            write_batch(batch, run)
+    finally:
+        pages.close()  # Arrête le thread producteur si l'écriture a échoué
+
+    raw_chars = context_stats["raw_chars"]
+    print(f"✂️ Contexte LLM : {context_stats['context_chars']} caractères pour {context_stats['pages']} pages "
+          f"(au lieu de {raw_chars} avec les 5000 premiers caractères)")
+    print_structured_summary(expected_headers)
+    print_incremental_summary()
+    print_refresh_summary()
+    print_triage_summary()
+    print_fetch_summary()
+    if CONTENT_BACKEND == "hedged":
+        print_hedge_summary(hedge_log_start)
+    print_cleaning_summary()
+    print_deadline_summary()
+    print_link_summary()
+    print_pipeline_summary()
+
+    # Enregistrer les URLs du run pour les benchmarks (python fetch_utils.py bench <fichier>)
+    if FETCH_CORPUS_FILE and fetched_urls:
+        record_corpus_urls(fetched_urls, FETCH_CORPUS_FILE)
+
+    # Si aucun contenu trouvé, arrêter
+    if not total_urls and not refresh["update_parts"] and not refresh["row_updates"]:
+        print("❌ Aucun contenu trouvé. Vérifiez vos clés API.")
+        exit(1)
+
+    # Pages modifiées d'aides déjà enregistrées (découverte et rafraîchissement) : seuls les champs
+    # concernés sont réécrits, en une seule requête. Lignes complètes lues à la demande, pour ces seules aides
+    changed_pages = run["changed_pages"]
+    full_rows = get_sheet_rows([row_number for _, (row_number, _), _ in changed_pages]) if changed_pages else {}
+    for url, (row_number, entry), change in changed_pages:
+        update_parts.append(build_update_context(url, full_rows.get(row_number, entry), change, expected_headers))
+    row_updates = dict(refresh["row_updates"])
+    page_updates = {}
+    if update_parts:
+        page_updates = run_update_task(research_agent, update_parts, expected_headers, existing_index)
+        for row_number, fields in (page_updates or {}).items():
+            row_updates.setdefault(row_number, {}).update(fields)
+    written = update_sheet_rows(row_updates)
+    # Nouvelles versions des pages modifiées enregistrées seulement une fois la mise à jour écrite
+    pending_changes = list(refresh["changes"].values()) + [change for _, _, change in changed_pages]
+    commit_page_changes(pending_changes, page_updates, written)
+    
+    # Pages extraites et analysées : positives si elles ont produit une aide ou correspondent à une aide
+    # connue, négatives sinon (atteint seulement une fois toutes les pages passées dans le pipeline)
+    train_triage_model(fetched_results, run["sent_links"] + run["produced_pages"])
+    run_succeeded = True
         
 except Exception as e:
     print(f"\n❌ Erreur lors de l'exécution : {e}")
     import traceback
     traceback.print_exc()
 
+# Archivage des aides expirées ou anciennes (ARCHIVE_ENABLED=1) : l'onglet principal garde une taille
+# bornée. Jamais après un run en échec, et en simulation si SHEET_DRY_RUN=1
+if ARCHIVE_ENABLED and run_succeeded:
+    archive_rows()
+
 #print("\n✅ Script terminé")
 
 # Remplacer le dernier "print("\n✅ Script terminé")" par :
@@ -331,9 +658,10 @@ try:
     from tools.smtp_email_tool import smtp_email_sender
 
     # Préparer le message
-    if entries:
-        subject = f"✅ Funding Script - {len(entries)} nouvelles aides"
-        message = f"Script terminé avec succès. {len(entries)} nouvelles aides ajoutées au Google Sheet."
+    sent_count = len({canonical_url(link) for link in run["sent_links"] if link})
+    if sent_count:
+        subject = f"✅ Funding Script - {sent_count} nouvelles aides"
+        message = f"Script terminé avec succès. {sent_count} nouvelles aides ajoutées au Google Sheet."
     else:
         subject = "⚠️ Funding Script - Aucune nouvelle aide"
         message = "Script terminé mais aucune nouvelle aide trouvée."
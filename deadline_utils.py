@@ -0,0 +1,100 @@
+import os
+from datetime import date
+
+from dotenv import load_dotenv
+
+from cleaning_utils import find_dates, format_date
+from structured_utils import header_field, DEADLINE_TEXT_RE
+
+load_dotenv()
+
+# Dates limites : normalisation ISO et filtrage des appels expirés avant l'analyse
+EXPIRED_POLICY = os.getenv("EXPIRED_POLICY", "drop").lower()  # drop | tag
+EXPIRED_STATUS = "Expirée"
+# Clé interne portant la date limite ISO (ne correspond à aucune colonne du sheet, même normalisée)
+DEADLINE_KEY = "_deadline_iso"
+
+_deadline_stats = {"parsed": 0, "from_page": 0, "expired": 0, "unknown": 0}
+
+
+def parse_deadline(text, today=None):
+    """Date limite d'un texte : la prochaine date à venir, sinon la plus récente (date ou None)"""
+    today = today or date.today()
+    ends = [end_date for _, _, _, end_date in find_dates(text or "")]
+    if not ends:
+        return None
+    upcoming = [d for d in ends if d >= today]
+    return min(upcoming) if upcoming else max(ends)
+
+
+def deadline_from_page(text, today=None):
+    """Date limite trouvée dans le texte d'une page (« date limite », « clôture », « avant le »...)"""
+    dates = [match.group(1) for match in DEADLINE_TEXT_RE.finditer(text or "")]
+    return parse_deadline(" ; ".join(dates), today) if dates else None
+
+
+def _deadline_header(headers):
+    """Colonne Deadline du sheet (ou None)"""
+    return next((header for header in headers if header_field(header) == "deadline"), None)
+
+
+def annotate_deadlines(entries, headers, page_texts=None, url_key=None, today=None):
+    """Ajoute la date limite ISO à chaque entrée (champ Deadline, sinon texte de la page source)
+    et complète la colonne Deadline quand elle est vide"""
+    deadline_header = _deadline_header(headers)
+    pages = {url_key(url) if url_key else url: text for url, text in (page_texts or {}).items()}
+    for entry in entries:
+        value = entry.get(deadline_header, "") if deadline_header else ""
+        deadline = parse_deadline(value, today)
+        if deadline is None:
+            link = next((v for k, v in entry.items() if header_field(k) == "url" and v), "")
+            text = pages.get(url_key(link) if url_key and link else link)
+            deadline = deadline_from_page(text, today)
+            if deadline is not None:
+                _deadline_stats["from_page"] += 1
+                if deadline_header and value in ("", "Non spécifié"):
+                    entry[deadline_header] = format_date(deadline)
+        entry[DEADLINE_KEY] = deadline.isoformat() if deadline else ""
+    return entries
+
+
+def _tag_expired(entry, headers):
+    """Marque une entrée expirée dans la colonne Statut (ou Commentaires à défaut)"""
+    status_header = next((h for h in headers if "statut" in h.lower() or "status" in h.lower()), None)
+    if status_header:
+        entry[status_header] = EXPIRED_STATUS
+        return
+    comment_header = next((h for h in headers if "comment" in h.lower()), None)
+    if comment_header:
+        entry[comment_header] = f"{EXPIRED_STATUS}. {entry.get(comment_header, '')}".strip(" .") + "."
+
+
+def filter_expired(entries, headers, today=None, policy=None):
+    """Sépare les entrées à venir des appels expirés (supprimés ou marqués selon EXPIRED_POLICY)
+    et retourne (actives, expirées)"""
+    today = (today or date.today()).isoformat()
+    policy = (policy or EXPIRED_POLICY).lower()
+    active, expired = [], []
+    for entry in entries:
+        deadline = entry.get(DEADLINE_KEY, "")
+        _deadline_stats["parsed" if deadline else "unknown"] += 1
+        if deadline and deadline < today:
+            expired.append(entry)
+        else:
+            active.append(entry)
+    _deadline_stats["expired"] += len(expired)
+    for entry in expired:
+        name = next((v for k, v in entry.items() if header_field(k) == "name" and v), "")
+        print(f"  ⌛ Expirée ({entry[DEADLINE_KEY]}) : {name}")
+        if policy == "tag":
+            _tag_expired(entry, headers)
+    return active, expired
+
+
+def print_deadline_summary():
+    """Affiche le bilan des dates limites analysées"""
+    stats = _deadline_stats
+    total = stats["parsed"] + stats["unknown"]
+    if total:
+        print(f"📅 Dates limites : {stats['parsed']}/{total} reconnue(s) ({stats['from_page']} depuis la page), "
+              f"{stats['expired']} appel(s) expiré(s) ({EXPIRED_POLICY})")
@@ -0,0 +1,670 @@
+import os
+import re
+import sys
+import json
+import time
+import threading
+from collections import deque
+from urllib.parse import urlsplit, urlunsplit, urljoin, parse_qsl, urlencode
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+import lxml.etree
+import lxml.html
+import html2text
+from dotenv import load_dotenv
+
+from store_utils import ensure_schema, ensure_columns, db_execute, db_query
+from structured_utils import extract_structured_data
+from site_extractors import extract_site_fields, get_site_extractor
+
+load_dotenv()
+
+# Configuration
+CONTENT_API_URL = "https://cockpit.verifybot.app/api-get-content.php"
+CONTENT_API_KEY = os.getenv("VERIFYBOT_CONTENT_API_KEY")
+# "remote" (API verifybot), "local" (extracteur local), "auto" (remote puis local en secours)
+# ou "hedged" (remote, doublé par le local si la réponse tarde)
+CONTENT_BACKEND = os.getenv("CONTENT_BACKEND", "auto" if not CONTENT_API_KEY else "remote")
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "10"))
+FETCH_POOL_SIZE = int(os.getenv("FETCH_POOL_SIZE", "8"))
+USER_AGENT = "Mozilla/5.0 (compatible; FilmFundingAgent/1.0; +https://github.com/idfabrik/look-for-film-funding-agent)"
+
+# Éléments sans contenu utile pour l'analyse (navigation, scripts, pieds de page...)
+BOILERPLATE_XPATH = (
+    "//script | //style | //noscript | //template | //iframe | //svg | //form | //button"
+    " | //nav | //aside"
+    " | //header[not(ancestor::article) and not(ancestor::main)]"
+    " | //footer[not(ancestor::article) and not(ancestor::main)]"
+    " | //*[@role='navigation' or @role='banner' or @role='contentinfo']"
+    " | //*[contains(@id, 'cookie') or contains(@class, 'cookie')]"
+)
+MIN_MAIN_TEXT_CHARS = 200
+
+# Téléchargement en streaming : rejet sur les en-têtes puis lecture plafonnée
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+MAX_HTML_BYTES = int(os.getenv("MAX_HTML_BYTES", str(2 * 1024 * 1024)))
+MAX_DECLARED_BYTES = int(os.getenv("MAX_DECLARED_BYTES", str(20 * 1024 * 1024)))
+LOCAL_TEXT_BUDGET_CHARS = int(os.getenv("LOCAL_TEXT_BUDGET_CHARS", "30000"))
+STREAM_CHUNK_SIZE = 16 * 1024
+BINARY_SIGNATURES = (b"%PDF", b"PK\x03\x04", b"\x89PNG", b"\xff\xd8\xff", b"GIF8")
+TEXT_BLOCK_TAGS = {"p", "li", "td", "th", "dd", "dt", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre"}
+
+# Requêtes couvertes : seuil de déclenchement adaptatif basé sur le p90 récent de l'API distante
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "100"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "3"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.5"))
+HEDGE_MAX_DELAY = float(os.getenv("HEDGE_MAX_DELAY", "8"))
+HEDGE_MIN_LOCAL_WIN_RATE = 0.25
+
+# Cache des pages extraites localement, revalidé par requêtes conditionnelles (ETag / Last-Modified)
+PAGE_CACHE_TTL_HOURS = float(os.getenv("PAGE_CACHE_TTL_HOURS", "24"))
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "xtor")
+
+PAGE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_cache (
+    url TEXT PRIMARY KEY,
+    final_url TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    text TEXT,
+    content_bytes INTEGER DEFAULT 0,
+    fetched_at REAL,
+    expires_at REAL
+);
+"""
+
+HEDGE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hedge_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    fetched_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    threshold REAL,
+    hedged INTEGER NOT NULL,
+    winner TEXT,
+    remote_latency REAL,
+    remote_done INTEGER NOT NULL,
+    local_latency REAL,
+    total_latency REAL
+);
+"""
+
+_session = None
+_session_lock = threading.Lock()
+_fetch_stats = {"200": 0, "304": 0, "cache": 0, "bytes_downloaded": 0, "bytes_saved": 0}
+_fetch_stats_lock = threading.Lock()
+
+
+def get_http_session():
+    """Retourne une session HTTP partagée avec un pool de connexions"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=FETCH_POOL_SIZE, pool_maxsize=FETCH_POOL_SIZE, max_retries=1)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({
+                "User-Agent": USER_AGENT,
+                "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.5",
+                "Accept-Language": "fr-FR,fr;q=0.9,en;q=0.8"
+            })
+            _session = session
+        return _session
+
+
+def canonical_url(url):
+    """Normalise une URL (casse, fragment, paramètres de suivi, slash final) pour servir de clé"""
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "https"
+    netloc = parts.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def _count_fetch(key, amount=1):
+    """Incrémente un compteur du bilan de téléchargement"""
+    with _fetch_stats_lock:
+        _fetch_stats[key] += amount
+
+
+def _declared_charset(content_type):
+    """Extrait le charset déclaré dans l'en-tête Content-Type (ou None)"""
+    for part in (content_type or "").split(";")[1:]:
+        name, _, value = part.strip().partition("=")
+        if name.lower() == "charset" and value:
+            return value.strip('"\' ')
+    return None
+
+
+def _html_to_text(html):
+    """Convertit un fragment HTML en texte brut lisible"""
+    converter = html2text.HTML2Text()
+    converter.ignore_links = True
+    converter.ignore_images = True
+    converter.ignore_emphasis = True
+    converter.body_width = 0
+    text = converter.handle(html)
+    lines = [line.rstrip() for line in text.splitlines()]
+    cleaned = []
+    for line in lines:
+        if not line and (not cleaned or not cleaned[-1]):
+            continue
+        cleaned.append(line)
+    return "\n".join(cleaned).strip()
+
+
+def page_links(root, base_url):
+    """Liens d'une page : liste de (URL absolue, texte de l'ancre)"""
+    links = []
+    for anchor in root.xpath("//a[@href]"):
+        text = re.sub(r"\s+", " ", anchor.text_content()).strip()
+        links.append((urljoin(base_url, anchor.get("href").strip()), text))
+    return links
+
+
+def extract_main_text(root):
+    """Supprime le boilerplate d'un document lxml et retourne le texte principal"""
+    if root is None:
+        return ""
+    for element in root.xpath(BOILERPLATE_XPATH):
+        parent = element.getparent()
+        if parent is not None:
+            element.drop_tree()
+    # Privilégier la zone de contenu principale si elle est assez fournie
+    candidates = root.xpath("//main | //article | //*[@role='main']")
+    node = None
+    for candidate in candidates:
+        if len(candidate.text_content().strip()) >= MIN_MAIN_TEXT_CHARS:
+            node = candidate
+            break
+    if node is None:
+        bodies = root.xpath("//body")
+        node = bodies[0] if bodies else root
+    return _html_to_text(lxml.html.tostring(node, encoding="unicode"))
+
+
+def _reject_by_headers(response):
+    """Retourne la raison du rejet d'une réponse d'après ses en-têtes (ou None)"""
+    content_type = response.headers.get("Content-Type", "")
+    mime = content_type.split(";")[0].strip().lower()
+    if mime and mime not in HTML_CONTENT_TYPES:
+        return f"type de contenu {mime}"
+    declared = response.headers.get("Content-Length", "")
+    if declared.isdigit() and int(declared) > MAX_DECLARED_BYTES:
+        return f"taille annoncée {int(declared) // 1024} Ko"
+    return None
+
+
+def fetch_html(url, cancel_event=None, headers=None):
+    """Télécharge une page HTML en streaming (taille plafonnée) et la parse au fil de l'eau avec lxml"""
+    session = get_http_session()
+    with session.get(url, timeout=FETCH_TIMEOUT, stream=True, headers=headers) as response:
+        if response.status_code == 304:
+            return {"url": url, "final_url": response.url, "status": 304, "root": None, "bytes": 0}
+        if response.status_code != 200:
+            print(f"  ❌ Erreur HTTP {response.status_code} (local)")
+            return None
+        reason = _reject_by_headers(response)
+        if reason:
+            print(f"  ⚠️ Page ignorée ({reason}) : {url}")
+            return None
+
+        charset = _declared_charset(response.headers.get("Content-Type", ""))
+        parser = lxml.etree.HTMLPullParser(events=("end",), encoding=charset, base_url=response.url)
+        parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+        received = 0
+        text_chars = 0
+        stopped = None
+        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            if not received and chunk.lstrip().startswith(BINARY_SIGNATURES):
+                print(f"  ⚠️ Page ignorée (contenu binaire) : {url}")
+                return None
+            received += len(chunk)
+            parser.feed(chunk)
+            for _, element in parser.read_events():
+                if element.tag in TEXT_BLOCK_TAGS:
+                    text_chars += len(element.text_content())
+            # Arrêter la lecture dès que le budget d'octets ou de texte utile est atteint
+            if received >= MAX_HTML_BYTES:
+                stopped = f"{received // 1024} Ko lus"
+                break
+            if text_chars >= LOCAL_TEXT_BUDGET_CHARS:
+                stopped = f"{text_chars} caractères de texte"
+                break
+        final_url = response.url
+        status = response.status_code
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+    if not received:
+        return None
+    try:
+        root = parser.close()
+    except lxml.etree.LxmlError:
+        return None
+    if stopped:
+        print(f"  ✂️ Lecture interrompue ({stopped})")
+    return {
+        "url": url,
+        "final_url": final_url,
+        "status": status,
+        "root": root,
+        "bytes": received,
+        "truncated": bool(stopped),
+        "etag": etag,
+        "last_modified": last_modified
+    }
+
+
+def _ensure_page_cache_schema():
+    """Crée la table du cache de pages (et les colonnes ajoutées depuis)"""
+    ensure_schema(PAGE_CACHE_SCHEMA)
+    ensure_columns("page_cache", {"structured": "TEXT"})
+
+
+def _get_cached_page(key):
+    """Retourne l'entrée du cache de pages pour une URL canonique (ou None)"""
+    _ensure_page_cache_schema()
+    rows = db_query("SELECT * FROM page_cache WHERE url = ?", (key,))
+    return rows[0] if rows else None
+
+
+def _store_cached_page(key, page):
+    """Enregistre une page extraite et ses validateurs HTTP dans le cache"""
+    _ensure_page_cache_schema()
+    now = time.time()
+    db_execute(
+        "INSERT OR REPLACE INTO page_cache"
+        " (url, final_url, etag, last_modified, text, structured, content_bytes, fetched_at, expires_at)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (key, page["final_url"], page.get("etag"), page.get("last_modified"), page["text"],
+         json.dumps(page.get("structured") or {}, ensure_ascii=False),
+         page["bytes"], now, now + PAGE_CACHE_TTL_HOURS * 3600)
+    )
+
+
+def _cached_result(url, cached, status):
+    """Construit le résultat d'une page servie depuis le cache"""
+    return {
+        "url": url,
+        "final_url": cached["final_url"],
+        "status": status,
+        "root": None,
+        "bytes": 0,
+        "text": cached["text"],
+        "structured": json.loads(cached["structured"]) if cached["structured"] else {},
+        "from_cache": True,
+        "extractor": "local"
+    }
+
+
+def fetch_page_local(url, cancel_event=None, use_cache=True, revalidate=False):
+    """Télécharge et extrait le texte d'une page sans passer par l'API distante
+    (`revalidate` : requête conditionnelle même si l'entrée du cache est encore valide)"""
+    key = canonical_url(url)
+    cached = _get_cached_page(key) if use_cache else None
+    if cached and cached["text"] and cached["expires_at"] > time.time() and not revalidate:
+        _count_fetch("cache")
+        return _cached_result(url, cached, "cache")
+
+    # Revalidation conditionnelle si la page a déjà été téléchargée
+    headers = {}
+    if cached and cached["text"]:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+    try:
+        page = fetch_html(url, cancel_event, headers=headers or None)
+    except Exception as e:
+        print(f"  ❌ Exception (local) : {e}")
+        return None
+    if not page or (cancel_event is not None and cancel_event.is_set()):
+        return None
+
+    if page["status"] == 304:
+        if not cached:
+            return None
+        # Page inchangée : on prolonge la validité sans télécharger ni ré-extraire
+        db_execute("UPDATE page_cache SET expires_at = ? WHERE url = ?",
+                   (time.time() + PAGE_CACHE_TTL_HOURS * 3600, key))
+        _count_fetch("304")
+        _count_fetch("bytes_saved", cached["content_bytes"] or 0)
+        print("  ♻️ Page inchangée (304)")
+        return _cached_result(url, cached, 304)
+
+    return finish_local_page(page, use_cache)
+
+
+def finish_local_page(page, use_cache=True):
+    """Extrait texte et données structurées d'une page téléchargée par fetch_html et l'enregistre dans le
+    cache : une page lue par un autre module (exploration) n'a pas à être re-téléchargée"""
+    # Données structurées (JSON-LD, meta, mailto) et liens (menus compris) lus avant la suppression du boilerplate
+    page["links"] = page_links(page["root"], page["final_url"])
+    page["structured"] = extract_structured_data(page["root"], page["final_url"])
+    site_fields = extract_site_fields(page["root"], page["final_url"])
+    if site_fields:
+        page["structured"]["site"] = site_fields
+    page["text"] = extract_main_text(page["root"])
+    page["extractor"] = "local"
+    _count_fetch("200")
+    _count_fetch("bytes_downloaded", page["bytes"])
+    if use_cache and page["text"]:
+        _store_cached_page(canonical_url(page["url"]), page)
+    return page
+
+
+def print_fetch_summary():
+    """Affiche le bilan des téléchargements locaux (200 / 304 / cache et octets économisés)"""
+    with _fetch_stats_lock:
+        stats = dict(_fetch_stats)
+    if not stats["200"] and not stats["304"] and not stats["cache"]:
+        return
+    print(f"\n🌐 Téléchargements locaux : {stats['200']} × 200, {stats['304']} × 304, "
+          f"{stats['cache']} servie(s) par le cache, "
+          f"{stats['bytes_downloaded'] // 1024} Ko téléchargés, {stats['bytes_saved'] // 1024} Ko économisés")
+
+
+def get_page_local(target_url, cancel_event=None):
+    """Extrait une page web avec l'extracteur local (dict avec texte, arbre lxml et données structurées)"""
+    print(f"  🧩 Extraction locale : {target_url}")
+    page = fetch_page_local(target_url, cancel_event)
+    if page and page["text"]:
+        print(f"  ✅ Contenu extrait (local) : {len(page['text'])} caractères")
+        return page
+    return None
+
+
+def get_page_content_local(target_url, cancel_event=None):
+    """Extrait le contenu d'une page web avec l'extracteur local"""
+    page = get_page_local(target_url, cancel_event)
+    return page["text"] if page else None
+
+
+def get_page_remote(target_url):
+    """Extrait une page web via l'API verifybot (texte seul, sans arbre HTML)"""
+    content = get_page_content_remote(target_url)
+    if not content:
+        return None
+    return {"url": target_url, "final_url": target_url, "status": 200, "root": None, "text": content, "structured": {},
+            "extractor": "remote"}
+
+
+def get_page_content_remote(target_url):
+    """Extrait le contenu d'une page web via l'API verifybot"""
+    params = {
+        "url": target_url,
+        "key": CONTENT_API_KEY
+    }
+
+    # Log de l'URL pour debug
+    print(f"  📡 Appel API : {CONTENT_API_URL}?url={target_url}&key={'*' * 10 if CONTENT_API_KEY else 'NO_KEY'}")
+
+    try:
+        response = get_http_session().get(CONTENT_API_URL, params=params, timeout=FETCH_TIMEOUT)
+        data = response.json()
+
+        if response.status_code != 200:
+            print(f"  ❌ Erreur HTTP {response.status_code}")
+            return None
+
+        content = data.get("content", "")
+        if content:
+            print(f"  ✅ Contenu extrait : {len(content)} caractères")
+        else:
+            print(f"  ⚠️ Réponse vide ou erreur : {data.get('error', 'Aucun contenu')}")
+
+        return content if content else None
+    except Exception as e:
+        print(f"  ❌ Exception : {e}")
+        return None
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=FETCH_POOL_SIZE * 2, thread_name_prefix="hedge")
+_hedge_samples = None
+_hedge_lock = threading.Lock()
+
+
+def _load_hedge_samples():
+    """Charge les dernières décisions enregistrées (latences distantes, gagnants)"""
+    global _hedge_samples
+    with _hedge_lock:
+        if _hedge_samples is None:
+            ensure_schema(HEDGE_SCHEMA)
+            rows = db_query(
+                "SELECT remote_latency, hedged, winner FROM hedge_log ORDER BY id DESC LIMIT ?",
+                (HEDGE_WINDOW,)
+            )
+            _hedge_samples = deque(
+                ((row["remote_latency"], bool(row["hedged"]), row["winner"]) for row in reversed(rows)),
+                maxlen=HEDGE_WINDOW
+            )
+        return _hedge_samples
+
+
+def get_hedge_threshold():
+    """Délai avant de lancer l'extraction locale, adapté au p90 récent de l'API distante"""
+    samples = list(_load_hedge_samples())
+    latencies = [latency for latency, _, _ in samples if latency is not None]
+    if len(latencies) < 10:
+        return HEDGE_DEFAULT_DELAY
+    hedges = [winner for _, hedged, winner in samples if hedged]
+    local_win_rate = hedges.count("local") / len(hedges) if hedges else 1.0
+    # Si le local gagne rarement, doubler la requête coûte plus qu'il ne rapporte : on se cale sur le p95
+    pct = 90 if local_win_rate >= HEDGE_MIN_LOCAL_WIN_RATE else 95
+    return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, percentile(latencies, pct)))
+
+
+def _timed_call(fetch, *args):
+    """Exécute une extraction et retourne (durée, contenu)"""
+    start = time.perf_counter()
+    content = fetch(*args)
+    return time.perf_counter() - start, content
+
+
+def _record_hedge(url, threshold, hedged, winner, remote_latency, remote_done, local_latency, total_latency):
+    """Enregistre la décision prise pour une URL"""
+    samples = _load_hedge_samples()
+    with _hedge_lock:
+        samples.append((remote_latency, hedged, winner))
+    db_execute(
+        "INSERT INTO hedge_log (url, threshold, hedged, winner, remote_latency, remote_done, local_latency, total_latency)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (url, threshold, int(hedged), winner, remote_latency, int(remote_done), local_latency, total_latency)
+    )
+
+
+def get_page_hedged(target_url):
+    """Interroge l'API distante et lance l'extracteur local en parallèle si elle tarde"""
+    if not CONTENT_API_KEY:
+        return get_page_local(target_url)
+    threshold = get_hedge_threshold()
+    start = time.perf_counter()
+    remote = _hedge_executor.submit(_timed_call, get_page_remote, target_url)
+    done, _ = wait([remote], timeout=threshold)
+    if done:
+        remote_latency, page = remote.result()
+        if page:
+            _record_hedge(target_url, threshold, False, "remote", remote_latency, True, None, remote_latency)
+            return page
+        # Réponse rapide mais vide : repli direct sur le local
+        local_latency, page = _timed_call(get_page_local, target_url)
+        _record_hedge(target_url, threshold, False, "local" if page else None, remote_latency, True,
+                      local_latency, time.perf_counter() - start)
+        return page
+
+    print(f"  ⏱️ API distante > {threshold:.1f}s, extraction locale en parallèle")
+    cancel_event = threading.Event()
+    local = _hedge_executor.submit(_timed_call, get_page_local, target_url, cancel_event)
+    names = {remote: "remote", local: "local"}
+    latencies = {}
+    winner, page = None, None
+    pending = {remote, local}
+    while pending and winner is None:
+        done, pending = wait(pending, timeout=FETCH_TIMEOUT * 2, return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            elapsed, result = future.result()
+            latencies[names[future]] = elapsed
+            if result and winner is None:
+                winner, page = names[future], result
+
+    # Annuler le perdant : le local s'arrête à la prochaine vérification, le distant est abandonné
+    cancel_event.set()
+    remote.cancel()
+    remote_done = "remote" in latencies
+    # Latence distante censurée (borne basse) si l'appel n'a pas abouti avant la fin
+    remote_latency = latencies.get("remote", time.perf_counter() - start)
+    _record_hedge(target_url, threshold, True, winner, remote_latency, remote_done,
+                  latencies.get("local"), time.perf_counter() - start)
+    if winner:
+        print(f"  🏁 Gagnant : {winner}")
+    return page
+
+
+def get_page_content_hedged(target_url):
+    """Extrait le contenu d'une page en couvrant l'API distante par l'extracteur local"""
+    page = get_page_hedged(target_url)
+    return page["text"] if page else None
+
+
+def print_hedge_summary(since_id=0):
+    """Affiche le bilan des requêtes couvertes (taux de doublement, victoires, p99)"""
+    ensure_schema(HEDGE_SCHEMA)
+    rows = db_query("SELECT hedged, winner, total_latency FROM hedge_log WHERE id > ?", (since_id,))
+    if not rows:
+        return
+    hedged = [row for row in rows if row["hedged"]]
+    local_wins = sum(1 for row in hedged if row["winner"] == "local")
+    remote_wins = sum(1 for row in hedged if row["winner"] == "remote")
+    totals = [row["total_latency"] for row in rows if row["total_latency"] is not None]
+    print(f"\n⏱️ Requêtes couvertes : {len(hedged)}/{len(rows)} doublées "
+          f"(local gagnant {local_wins}, distant gagnant {remote_wins}), "
+          f"p50 {percentile(totals, 50):.2f}s, p99 {percentile(totals, 99):.2f}s, "
+          f"prochain seuil {get_hedge_threshold():.2f}s")
+
+
+def get_last_hedge_id():
+    """Retourne l'identifiant de la dernière décision enregistrée"""
+    ensure_schema(HEDGE_SCHEMA)
+    rows = db_query("SELECT MAX(id) AS last_id FROM hedge_log")
+    return rows[0]["last_id"] or 0
+
+
+def get_page(target_url, backend=None):
+    """Extrait une page avec le backend choisi (remote, local, auto ou hedged) et retourne un dict
+    (url, final_url, text, root, structured) ou None"""
+    backend = (backend or CONTENT_BACKEND).lower()
+    # Les domaines ayant un extracteur dédié ont besoin de l'arbre HTML : extraction locale
+    if get_site_extractor(target_url):
+        backend = "local"
+    if backend == "local":
+        return get_page_local(target_url)
+    if backend == "hedged":
+        return get_page_hedged(target_url)
+    if backend == "auto":
+        page = get_page_remote(target_url) if CONTENT_API_KEY else None
+        if not page:
+            print("  🔁 Repli sur l'extracteur local")
+            page = get_page_local(target_url)
+        return page
+    return get_page_remote(target_url)
+
+
+def get_page_content(target_url, backend=None):
+    """Extrait le contenu d'une page avec le backend choisi (remote, local, auto ou hedged)"""
+    page = get_page(target_url, backend)
+    return page["text"] if page else None
+
+
+def percentile(values, pct):
+    """Calcule un percentile (interpolation linéaire) sur une liste de valeurs"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def load_corpus(corpus_file):
+    """Charge un corpus d'URLs enregistré (une URL par ligne, # pour commenter)"""
+    with open(corpus_file, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def record_corpus_urls(urls, corpus_file):
+    """Ajoute les URLs d'un run au corpus enregistré (sans doublons)"""
+    known = set(load_corpus(corpus_file)) if os.path.exists(corpus_file) else set()
+    new_urls = [url for url in dict.fromkeys(urls) if url not in known]
+    if new_urls:
+        with open(corpus_file, "a", encoding="utf-8") as f:
+            f.writelines(f"{url}\n" for url in new_urls)
+        print(f"📝 {len(new_urls)} URL(s) ajoutée(s) au corpus {corpus_file}")
+
+
+def benchmark_backends(corpus_file, backends=("remote", "local")):
+    """Compare le débit et la latence des backends d'extraction sur un corpus enregistré"""
+    urls = load_corpus(corpus_file)
+    print(f"📚 Corpus : {len(urls)} URLs ({corpus_file})")
+    fetchers = {
+        "remote": get_page_content_remote,
+        "local": get_page_content_local,
+        "hedged": get_page_content_hedged
+    }
+    results = {}
+    for backend in backends:
+        latencies = []
+        sizes = []
+
+        def timed_fetch(url, fetch=fetchers[backend]):
+            start = time.perf_counter()
+            content = fetch(url)
+            return time.perf_counter() - start, content
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=FETCH_POOL_SIZE) as executor:
+            for elapsed, content in executor.map(timed_fetch, urls):
+                latencies.append(elapsed)
+                if content:
+                    sizes.append(len(content))
+        wall = time.perf_counter() - start
+        results[backend] = {
+            "succes": len(sizes),
+            "pages_par_s": len(urls) / wall if wall else 0.0,
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "caracteres_moyens": sum(sizes) / len(sizes) if sizes else 0
+        }
+
+    print("\n📊 Résultats du benchmark :")
+    for backend, stats in results.items():
+        print(f"  {backend:>6} : {stats['succes']}/{len(urls)} pages, {stats['pages_par_s']:.2f} pages/s, "
+              f"p50 {stats['p50']:.2f}s, p90 {stats['p90']:.2f}s, p99 {stats['p99']:.2f}s, "
+              f"{stats['caracteres_moyens']:.0f} caractères/page")
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "bench":
+        print("Usage : python fetch_utils.py bench <fichier_urls.txt> [remote,local,hedged]")
+        sys.exit(1)
+    selected = tuple(sys.argv[3].split(",")) if len(sys.argv) > 3 else ("remote", "local")
+    benchmark_backends(sys.argv[2], selected)
@@ -0,0 +1,181 @@
+import re
+import sys
+import time
+import unicodedata
+from collections.abc import MutableMapping
+
+# Entrées d'aides compactes : colonnes positionnelles d'un schéma partagé (en-têtes du sheet)
+# au lieu d'un dict par entrée
+
+
+def _alias(key):
+    """Forme normalisée d'un nom de colonne (minuscules, sans accents ni ponctuation)"""
+    key = unicodedata.normalize("NFKD", str(key)).encode("ascii", "ignore").decode().lower()
+    return re.sub(r"[^a-z0-9]", "", key)
+
+
+class EntrySchema:
+    """Colonnes d'une entrée, dans l'ordre du sheet (en-têtes internés, positions et alias résolus une fois)"""
+    __slots__ = ("headers", "index", "aliases", "resolved")
+
+    def __init__(self, headers):
+        self.headers = tuple(sys.intern(str(h)) for h in headers)
+        self.index = {h: i for i, h in enumerate(self.headers)}
+        self.aliases = {}
+        for i, h in enumerate(self.headers):
+            self.aliases.setdefault(_alias(h), i)
+        self.resolved = {}  # Clé quelconque -> position (ou None), mémorisée après la première recherche
+
+    def position(self, key):
+        """Position de la colonne correspondant à `key` : nom exact, sinon même nom à la casse et aux accents près"""
+        position = self.index.get(key)
+        if position is not None:
+            return position
+        if key not in self.resolved:
+            self.resolved[key] = self.aliases.get(_alias(key))
+        return self.resolved[key]
+
+
+_schemas = {}
+
+
+def schema_for(headers):
+    """Schéma partagé par toutes les entrées ayant ces en-têtes"""
+    key = tuple(headers)
+    if key not in _schemas:
+        _schemas[key] = EntrySchema(key)
+    return _schemas[key]
+
+
+class FundingEntry(MutableMapping):
+    """Entrée d'aide à colonnes positionnelles, utilisable comme un dict (clés = en-têtes du sheet).
+    Les clés hors schéma (champs internes comme la date limite ISO) sont gardées à part"""
+    __slots__ = ("schema", "cells", "extra")
+
+    def __init__(self, schema, data=None):
+        self.schema = schema if isinstance(schema, EntrySchema) else schema_for(schema)
+        self.cells = [None] * len(self.schema.headers)  # None : colonne absente
+        self.extra = None
+        if data:
+            self.update(data)
+
+    @classmethod
+    def from_row(cls, schema, values):
+        """Entrée construite directement depuis des valeurs dans l'ordre des colonnes (ligne du sheet)"""
+        entry = cls(schema)
+        width = len(entry.cells)
+        entry.cells[:len(values)] = list(values[:width])
+        return entry
+
+    def __getitem__(self, key):
+        position = self.schema.index.get(key)
+        if position is not None:
+            value = self.cells[position]
+            if value is not None:
+                return value
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        position = self.schema.index.get(key)
+        if position is not None:
+            self.cells[position] = value
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        position = self.schema.index.get(key)
+        if position is not None and self.cells[position] is not None:
+            self.cells[position] = None
+        elif self.extra and key in self.extra:
+            del self.extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for header, value in zip(self.schema.headers, self.cells):
+            if value is not None:
+                yield header
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(value is not None for value in self.cells) + (len(self.extra) if self.extra else 0)
+
+    def __repr__(self):
+        return f"FundingEntry({dict(self)!r})"
+
+    def copy(self):
+        """Copie de l'entrée (même schéma)"""
+        entry = FundingEntry(self.schema)
+        entry.cells = list(self.cells)
+        entry.extra = dict(self.extra) if self.extra else None
+        return entry
+
+    def lookup(self, key, default=""):
+        """Valeur d'une colonne nommée approximativement (casse, accents, ponctuation)"""
+        position = self.schema.position(key)
+        if position is not None and self.cells[position] is not None:
+            return self.cells[position]
+        return self.extra.get(key, default) if self.extra else default
+
+    def to_row(self, schema=None):
+        """Valeurs dans l'ordre des colonnes de `schema` (celui de l'entrée par défaut), "" si absentes ;
+        sans aucune recherche de clé quand le schéma est celui de l'entrée"""
+        if schema is None or schema is self.schema:
+            return ["" if value is None else value for value in self.cells]
+        return [self.lookup(header) for header in schema.headers]
+
+
+def _bench(count=10000):
+    """Mémoire et temps pour `count` entrées : dicts (parsing + recherche de colonnes actuelle) vs FundingEntry"""
+    import tracemalloc
+    from sheets_utils import normalize_key
+
+    headers = ["Nom", "Organisme", "Pays", "Deadline", "Lien", "Résumé", "Email de contact",
+               "Conditions d'éligibilité", "Statut", "Commentaires", "Date Ajout"]
+    raw = [[f"{header} {i}" for header in headers[:-1]] for i in range(count)]
+
+    def dict_row(entry):
+        # Recherche de colonne de send_to_google_sheet : nom exact, casse, puis clé normalisée
+        row = []
+        for header in headers:
+            if header == "Date Ajout":
+                row.append("")
+                continue
+            value = entry.get(header, "")
+            if not value:
+                value = next((v for k, v in entry.items() if k.lower() == header.lower()), "")
+            if not value:
+                value = next((v for k, v in entry.items() if normalize_key(k) == normalize_key(header)), "")
+            row.append(value)
+        return row
+
+    schema = schema_for(headers)
+    for label, build, serialize in (
+        ("dict", lambda values: {header: value for header, value in zip(headers, values)}, dict_row),
+        ("FundingEntry", lambda values: FundingEntry.from_row(schema, values), FundingEntry.to_row),
+    ):
+        tracemalloc.start()
+        start = time.perf_counter()
+        entries = [build(values) for values in raw]
+        build_seconds = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        start = time.perf_counter()
+        rows = [serialize(entry) for entry in entries]
+        row_seconds = time.perf_counter() - start
+        print(f"📏 {label:<12} : {memory / 1e6:6.1f} Mo, création {build_seconds * 1000:7.1f} ms, "
+              f"lignes du sheet {row_seconds * 1000:7.1f} ms ({len(rows)} entrées)")
+
+
+if __name__ == "__main__":
+    # Usage : python funding_entry.py bench [nombre d'entrées]
+    if sys.argv[1:2] == ["bench"]:
+        _bench(int(sys.argv[2]) if len(sys.argv) > 2 else 10000)
+    else:
+        print("Usage : python funding_entry.py bench [nombre d'entrées]")
+        sys.exit(1)
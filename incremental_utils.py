@@ -0,0 +1,230 @@
+import os
+import re
+import json
+import hashlib
+from difflib import SequenceMatcher
+from datetime import datetime
+
+from crewai import Task, Crew
+from dotenv import load_dotenv
+
+from cleaning_utils import clean_value
+from store_utils import ensure_schema, db_executemany, db_query
+from structured_utils import header_field
+from fetch_utils import canonical_url, fetch_page_local
+
+load_dotenv()
+
+# Ré-extraction incrémentale : seules les sections modifiées d'une page déjà connue repartent au LLM
+INCREMENTAL_ENABLED = os.getenv("INCREMENTAL_ENABLED", "1") == "1"
+SECTION_MAX_CHARS = int(os.getenv("SECTION_MAX_CHARS", "1200"))
+SECTION_CONTEXT = 1  # Sections voisines inchangées jointes à chaque modification (titre, contexte)
+UNCHANGED_VALUES = ("inchangé", "inchange", "non spécifié", "non specifie", "")
+
+HEADING_RE = re.compile(r"^\s*(?:#{1,6}\s|\*\*[^*]+\*\*\s*$)")
+
+SECTIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_sections (
+    url TEXT PRIMARY KEY,
+    text TEXT,
+    fingerprints TEXT,
+    updated_at TEXT
+);
+"""
+
+_incremental_stats = {"unchanged": 0, "changed": 0, "new": 0, "update_chars": 0, "full_chars": 0}
+
+
+def split_sections(text):
+    """Découpe le texte extrait en sections (un titre et ses paragraphes, SECTION_MAX_CHARS au plus)"""
+    sections = []
+    current = []
+    size = 0
+    for block in re.split(r"\n\s*\n", text or ""):
+        block = block.strip()
+        if not block:
+            continue
+        if current and (HEADING_RE.match(block) or size + len(block) > SECTION_MAX_CHARS):
+            sections.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(block)
+        size += len(block)
+    if current:
+        sections.append("\n\n".join(current))
+    return sections
+
+
+def section_fingerprint(section):
+    """Empreinte d'une section (insensible aux espaces et à la casse)"""
+    normalized = re.sub(r"\s+", " ", section).strip().lower()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def changed_sections(old_fingerprints, sections):
+    """Indices des sections nouvelles ou modifiées (diff des empreintes), avec leurs voisines comme contexte"""
+    fingerprints = [section_fingerprint(section) for section in sections]
+    matcher = SequenceMatcher(None, old_fingerprints, fingerprints, autojunk=False)
+    changed = set()
+    for tag, _, _, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "insert"):
+            changed.update(range(j1, j2))
+        elif tag == "delete" and fingerprints:
+            # Section supprimée : la voisine suivante donne le contexte de la suppression
+            changed.add(min(j1, len(fingerprints) - 1))
+    with_context = set(changed)
+    for index in changed:
+        for offset in range(1, SECTION_CONTEXT + 1):
+            if index - offset >= 0:
+                with_context.add(index - offset)
+    return sorted(changed), sorted(with_context)
+
+
+def fingerprint_text(page, fetch_local=True):
+    """Texte servant aux empreintes : toujours celui de l'extracteur local, sinon une page lue tour à tour
+    par l'API distante et par l'extracteur local serait vue comme modifiée à chaque changement de backend.
+    Une page de l'API distante est relue localement (cache, requête conditionnelle) si `fetch_local`,
+    sinon None"""
+    if page.get("extractor") == "local":
+        return page["text"]
+    if not fetch_local:
+        return None
+    local = fetch_page_local(page["url"])
+    return local["text"] if local and local["text"] else None
+
+
+def compare_page_sections(url, text):
+    """Compare le texte d'une page (extracteur local, voir fingerprint_text) à sa version précédente. Retourne un dict status (new, unchanged, changed),
+    sections et indices à renvoyer au LLM. La nouvelle version est enregistrée tout de suite, sauf pour une
+    page modifiée : l'appelant l'enregistre (save_page_sections) une fois la mise à jour écrite dans le
+    sheet, sinon la modification serait perdue si la mise à jour échoue"""
+    ensure_schema(SECTIONS_SCHEMA)
+    key = canonical_url(url)
+    sections = split_sections(text)
+    rows = db_query("SELECT fingerprints FROM page_sections WHERE url = ?", (key,))
+    fingerprints = [section_fingerprint(section) for section in sections]
+    change = {"key": key, "text": text, "fingerprints": fingerprints, "sections": sections,
+              "changed": [], "context": []}
+    if not rows:
+        change["status"] = "new"
+    elif json.loads(rows[0]["fingerprints"]) == fingerprints:
+        change["status"] = "unchanged"
+    else:
+        change["status"] = "changed"
+        change["changed"], change["context"] = changed_sections(json.loads(rows[0]["fingerprints"]), sections)
+        return change
+    save_page_sections([change])
+    return change
+
+
+def save_page_sections(changes):
+    """Enregistre la nouvelle version (texte et empreintes des sections) des pages comparées"""
+    ensure_schema(SECTIONS_SCHEMA)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M")
+    db_executemany(
+        "INSERT OR REPLACE INTO page_sections (url, text, fingerprints, updated_at) VALUES (?, ?, ?, ?)",
+        [(change["key"], change["text"], json.dumps(change["fingerprints"]), now) for change in changes]
+    )
+
+
+def index_existing_entries(existing_entries):
+    """Entrées du sheet indexées par lien canonique (dict -> (n° de ligne, entrée))"""
+    index = {}
+    for position, entry in enumerate(existing_entries):
+        link = next((str(v) for k, v in entry.items() if header_field(k) == "url" and v), "")
+        if link:
+            index[canonical_url(link)] = (position + 2, entry)  # Ligne 1 : en-têtes
+    return index
+
+
+def record_page_change(change, text):
+    """Comptabilise l'état d'une page déjà enregistrée dans le sheet"""
+    _incremental_stats[change["status"]] += 1
+    if change["status"] == "changed":
+        _incremental_stats["update_chars"] += sum(len(change["sections"][i]) for i in change["context"])
+        _incremental_stats["full_chars"] += len(text)
+
+
+def build_update_context(url, entry, change, headers):
+    """Bloc de prompt pour une page modifiée : champs actuels de l'entrée et sections changées seulement"""
+    current = "\n".join(f"{header} : {entry.get(header, '')}" for header in headers if entry.get(header, ""))
+    parts = []
+    for index in change["context"]:
+        marker = "[MODIFIÉ] " if index in change["changed"] else ""
+        parts.append(f"{marker}{change['sections'][index]}")
+    return f"\n---\nLien : {url}\nEntrée actuelle :\n{current}\nSections modifiées :\n" + "\n[...]\n".join(parts)
+
+
+def parse_update_output(result_text, headers):
+    """Lit la réponse de mise à jour (blocs « Lien : ... » suivis des champs modifiés) :
+    dict lien canonique -> {colonne: nouvelle valeur}"""
+    link_header = next((h for h in headers if header_field(h) == "url"), None)
+    updates = {}
+    current = None
+    for line in result_text.splitlines():
+        line = line.strip().lstrip("-*• ").strip()
+        match = re.match(r"([^:]{2,40}?)\s*:\s*(.+)$", line)
+        if not match:
+            continue
+        name, value = match.group(1).strip("* ").strip(), match.group(2).strip()
+        if name.lower() in ("lien", (link_header or "").lower()):
+            current = updates.setdefault(canonical_url(value), {})
+            continue
+        header = next((h for h in headers if h.lower() == name.lower()), None)
+        if current is not None and header and header != link_header and value.lower() not in UNCHANGED_VALUES:
+            current[header] = value
+    return {link: fields for link, fields in updates.items() if fields}
+
+
+def run_update_task(agent, update_parts, headers, existing_index):
+    """Demande à l'agent les seuls champs modifiés des aides dont la page a changé
+    et retourne les mises à jour de cellules (dict n° de ligne -> {colonne: valeur}), None si l'agent
+    a échoué ou n'a rien répondu"""
+    update_task = Task(
+        description=f"""Des aides déjà enregistrées ont été modifiées sur leur site.
+    Pour chacune, compare les sections marquées [MODIFIÉ] à l'entrée actuelle et indique UNIQUEMENT
+    les champs dont la valeur change, au format :
+    Lien : <lien de l'aide>
+    <Champ> : <nouvelle valeur>
+    Champs possibles : {', '.join(headers)}
+    N'indique rien pour une aide dont aucun champ ne change.
+    {''.join(update_parts)}""",
+        expected_output="Pour chaque aide modifiée, son lien suivi des seuls champs mis à jour",
+        agent=agent
+    )
+    update_crew = Crew(agents=[agent], tasks=[update_task], verbose=True)
+    print(f"\n🧬 Mise à jour de {len(update_parts)} aide(s) dont la page a changé...\n")
+    try:
+        result_text = str(update_crew.kickoff())
+    except Exception as e:
+        print(f"❌ ERREUR lors de la mise à jour des aides modifiées : {e}")
+        return None
+    if not result_text.strip():
+        print("⚠️ Réponse vide pour la mise à jour des aides modifiées")
+        return None
+    field_updates = parse_update_output(result_text, headers)
+    row_updates = {}
+    for link, fields in field_updates.items():
+        if link in existing_index:
+            row_number, _ = existing_index[link]
+            row_updates[row_number] = {header: clean_value(header, value) for header, value in fields.items()}
+    return row_updates
+
+
+def commit_page_changes(changes, row_updates, written):
+    """Enregistre les nouvelles versions des pages modifiées une fois leur mise à jour traitée : réponse de
+    l'agent lue (`row_updates` n'est pas None) et cellules écrites s'il y en avait. Sinon les anciennes
+    empreintes restent et la modification est re-proposée au run suivant"""
+    if not changes or row_updates is None or (row_updates and not written):
+        return 0
+    save_page_sections(changes)
+    return len(changes)
+
+
+def print_incremental_summary():
+    """Affiche les pages inchangées ignorées et les tokens économisés sur les pages modifiées"""
+    stats = _incremental_stats
+    if not (stats["unchanged"] or stats["changed"]):
+        return
+    saved = stats["full_chars"] - stats["update_chars"]
+    print(f"\n🧬 Pages déjà connues : {stats['unchanged']} inchangée(s) ignorée(s), {stats['changed']} modifiée(s) "
+          f"({stats['update_chars']} caractères envoyés au lieu de {stats['full_chars']}, ~{saved // 4} tokens évités)")
@@ -0,0 +1,272 @@
+import os
+import sys
+import math
+from datetime import date, timedelta
+
+from dotenv import load_dotenv
+
+from store_utils import ensure_schema, ensure_columns, db_execute, db_executemany, db_query
+from fetch_utils import canonical_url
+from link_utils import source_link
+
+load_dotenv()
+
+# Rendement a priori d'un mot-clé jamais interrogé (nouvelles URLs par requête CSE)
+PRIOR_NEW_URLS_PER_QUERY = 5.0
+
+# Ordonnanceur : nombre de mots-clés par run et poids de l'exploration (UCB1)
+KEYWORDS_PER_RUN = int(os.getenv("KEYWORDS_PER_RUN", "10"))
+KEYWORD_EXPLORATION = float(os.getenv("KEYWORD_EXPLORATION", "0.5"))
+# Poids des nouvelles URLs dans la récompense (les aides ajoutées restent le signal principal)
+NEW_URL_REWARD_WEIGHT = 0.02
+
+# Redondance : deux mots-clés sont fusionnés si leurs résultats se recouvrent au-delà du seuil (Jaccard)
+KEYWORD_OVERLAP_THRESHOLD = float(os.getenv("KEYWORD_OVERLAP_THRESHOLD", "0.6"))
+KEYWORD_OVERLAP_DAYS = int(os.getenv("KEYWORD_OVERLAP_DAYS", "90"))
+KEYWORD_OVERLAP_MIN_URLS = 3
+
+KEYWORD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS keyword_stats (
+    keyword TEXT PRIMARY KEY,
+    queries INTEGER DEFAULT 0,
+    urls_returned INTEGER DEFAULT 0,
+    new_urls INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS seen_urls (
+    url TEXT PRIMARY KEY,
+    first_keyword TEXT,
+    first_seen TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS keyword_runs (
+    run_date TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    queries INTEGER DEFAULT 0,
+    urls_returned INTEGER DEFAULT 0,
+    new_urls INTEGER DEFAULT 0,
+    entries_added INTEGER DEFAULT 0,
+    PRIMARY KEY (run_date, keyword)
+);
+CREATE TABLE IF NOT EXISTS keyword_urls (
+    keyword TEXT NOT NULL,
+    url TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    PRIMARY KEY (keyword, url)
+);
+"""
+
+KEYWORD_STATS_COLUMNS = {
+    "entries_added": "INTEGER DEFAULT 0",
+    "runs": "INTEGER DEFAULT 0",
+    "last_run": "TEXT"
+}
+
+
+def _ensure_keyword_schema():
+    """Crée les tables de statistiques des mots-clés (et les colonnes ajoutées depuis)"""
+    ensure_schema(KEYWORD_SCHEMA)
+    ensure_columns("keyword_stats", KEYWORD_STATS_COLUMNS)
+
+
+def get_keyword_stats(keywords):
+    """Retourne les statistiques enregistrées pour chaque mot-clé (dict mot-clé -> ligne)"""
+    _ensure_keyword_schema()
+    rows = db_query("SELECT * FROM keyword_stats")
+    stats = {row["keyword"]: row for row in rows}
+    return {keyword: stats.get(keyword) for keyword in keywords}
+
+
+def get_keyword_yields(keywords):
+    """Rendement historique lissé de chaque mot-clé : nouvelles URLs par requête CSE"""
+    yields = {}
+    for keyword, row in get_keyword_stats(keywords).items():
+        queries = row["queries"] if row else 0
+        new_urls = row["new_urls"] if row else 0
+        # Lissage bayésien : un mot-clé peu interrogé reste proche du rendement a priori
+        yields[keyword] = (new_urls + PRIOR_NEW_URLS_PER_QUERY) / (queries + 1)
+    return yields
+
+
+def record_keyword_results(keyword, queries, urls):
+    """Enregistre les URLs renvoyées pour un mot-clé et retourne le nombre d'URLs jamais vues"""
+    _ensure_keyword_schema()
+    keys = list(dict.fromkeys(canonical_url(url) for url in urls if url))
+    new_count = 0
+    if keys:
+        placeholders = ",".join("?" * len(keys))
+        known = {row["url"] for row in db_query(f"SELECT url FROM seen_urls WHERE url IN ({placeholders})", keys)}
+        new_keys = [key for key in keys if key not in known]
+        db_executemany("INSERT OR IGNORE INTO seen_urls (url, first_keyword) VALUES (?, ?)",
+                       [(key, keyword) for key in new_keys])
+        new_count = len(new_keys)
+    today = date.today().isoformat()
+    db_executemany("INSERT OR REPLACE INTO keyword_urls (keyword, url, last_seen) VALUES (?, ?, ?)",
+                   [(keyword, key, today) for key in keys])
+    db_execute(
+        "INSERT INTO keyword_stats (keyword, queries, urls_returned, new_urls, runs, last_run) VALUES (?, ?, ?, ?, 1, ?)"
+        " ON CONFLICT(keyword) DO UPDATE SET queries = queries + excluded.queries,"
+        " urls_returned = urls_returned + excluded.urls_returned, new_urls = new_urls + excluded.new_urls,"
+        " runs = runs + 1, last_run = excluded.last_run",
+        (keyword, queries, len(keys), new_count, today)
+    )
+    db_execute(
+        "INSERT INTO keyword_runs (run_date, keyword, queries, urls_returned, new_urls) VALUES (?, ?, ?, ?, ?)"
+        " ON CONFLICT(run_date, keyword) DO UPDATE SET queries = queries + excluded.queries,"
+        " urls_returned = urls_returned + excluded.urls_returned, new_urls = new_urls + excluded.new_urls",
+        (today, keyword, queries, len(keys), new_count)
+    )
+    return new_count
+
+
+def record_keyword_entries(added_entries, url_keywords):
+    """Crédite aux mots-clés d'origine les aides effectivement ajoutées au sheet (d'après le lien
+    du résultat de recherche, même si le Lien a été remplacé par l'URL après redirections)"""
+    _ensure_keyword_schema()
+    credits = {}
+    for entry in added_entries:
+        for keyword in url_keywords.get(canonical_url(source_link(entry)), ()):
+            credits[keyword] = credits.get(keyword, 0) + 1
+    today = date.today().isoformat()
+    for keyword, count in credits.items():
+        db_execute("UPDATE keyword_stats SET entries_added = entries_added + ? WHERE keyword = ?", (count, keyword))
+        db_execute("UPDATE keyword_runs SET entries_added = entries_added + ? WHERE run_date = ? AND keyword = ?",
+                   (count, today, keyword))
+    if credits:
+        print(f"🏷️ Aides créditées aux mots-clés : {credits}")
+    return credits
+
+
+def _keyword_reward(row):
+    """Récompense moyenne par requête CSE : aides ajoutées, plus un bonus pour les nouvelles URLs"""
+    queries = row["queries"] or 0
+    if not queries:
+        return 0.0
+    return ((row["entries_added"] or 0) + NEW_URL_REWARD_WEIGHT * (row["new_urls"] or 0)) / queries
+
+
+def select_keywords(keywords, max_keywords=None):
+    """Choisit les mots-clés du run sous un quota fixe avec une politique UCB1 (exploration/exploitation)"""
+    max_keywords = KEYWORDS_PER_RUN if max_keywords is None else max_keywords
+    if max_keywords <= 0 or len(keywords) <= max_keywords:
+        return list(keywords)
+    stats = get_keyword_stats(keywords)
+    total_runs = sum(row["runs"] or 0 for row in stats.values() if row)
+
+    def score(keyword):
+        row = stats[keyword]
+        if not row or not row["runs"]:
+            return float("inf")  # Jamais interrogé : exploration prioritaire
+        bonus = KEYWORD_EXPLORATION * math.sqrt(2 * math.log(max(total_runs, 1)) / row["runs"])
+        return _keyword_reward(row) + bonus
+
+    # Tri stable : à score égal (nouveaux mots-clés), l'ordre de l'onglet est conservé
+    ordered = sorted(keywords, key=score, reverse=True)
+    selected = ordered[:max_keywords]
+    print(f"🎰 {len(selected)}/{len(keywords)} mots-clés retenus pour ce run")
+    return [keyword for keyword in keywords if keyword in selected]
+
+
+def _keyword_url_sets(keywords=None):
+    """Ensembles d'URLs canoniques renvoyées par chaque mot-clé sur la fenêtre récente"""
+    _ensure_keyword_schema()
+    since = (date.today() - timedelta(days=KEYWORD_OVERLAP_DAYS)).isoformat()
+    url_sets = {}
+    for row in db_query("SELECT keyword, url FROM keyword_urls WHERE last_seen >= ?", (since,)):
+        url_sets.setdefault(row["keyword"], set()).add(row["url"])
+    if keywords is not None:
+        url_sets = {k: v for k, v in url_sets.items() if k in keywords}
+    return url_sets
+
+
+def jaccard(a, b):
+    """Indice de Jaccard entre deux ensembles"""
+    union = len(a | b)
+    return len(a & b) / union if union else 0.0
+
+
+def find_redundant_keywords(keywords=None):
+    """Regroupe les mots-clés dont les résultats se recouvrent (liste de groupes d'au moins 2 mots-clés)"""
+    url_sets = {k: v for k, v in _keyword_url_sets(keywords).items() if len(v) >= KEYWORD_OVERLAP_MIN_URLS}
+    names = sorted(url_sets)
+    parent = {name: name for name in names}
+
+    def find(name):
+        while parent[name] != name:
+            parent[name] = parent[parent[name]]
+            name = parent[name]
+        return name
+
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            if jaccard(url_sets[a], url_sets[b]) >= KEYWORD_OVERLAP_THRESHOLD:
+                parent[find(b)] = find(a)
+
+    groups = {}
+    for name in names:
+        groups.setdefault(find(name), []).append(name)
+    return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+def collapse_redundant_keywords(keywords):
+    """Ne garde qu'un représentant par groupe redondant, en alternant à chaque run (le moins récemment interrogé)"""
+    groups = find_redundant_keywords(keywords)
+    if not groups:
+        return list(keywords)
+    stats = get_keyword_stats(keywords)
+    dropped = set()
+    for group in groups:
+        # Rotation : le membre interrogé le moins récemment représente le groupe
+        representative = min(group, key=lambda k: ((stats[k]["last_run"] or "") if stats[k] else "", keywords.index(k)))
+        dropped.update(k for k in group if k != representative)
+        print(f"🔗 Groupe redondant {group} → {representative}")
+    return [keyword for keyword in keywords if keyword not in dropped]
+
+
+def print_redundancy_report():
+    """Affiche les groupes de mots-clés redondants et le quota CSE économisé par run"""
+    url_sets = _keyword_url_sets()
+    stats = get_keyword_stats(list(url_sets))
+    groups = find_redundant_keywords()
+    if not groups:
+        print("✅ Aucun groupe de mots-clés redondants")
+        return
+    saved_queries = 0.0
+    print(f"🔗 {len(groups)} groupe(s) redondant(s) (Jaccard ≥ {KEYWORD_OVERLAP_THRESHOLD}) :")
+    for group in groups:
+        print(f"\n  Groupe : {', '.join(group)}")
+        for i, a in enumerate(group):
+            for b in group[i + 1:]:
+                print(f"    {a} ↔ {b} : {jaccard(url_sets[a], url_sets[b]):.2f}")
+        # Requêtes moyennes par run des membres non interrogés
+        per_run = [stats[k]["queries"] / stats[k]["runs"] for k in group if stats[k] and stats[k]["runs"]]
+        if per_run:
+            saved_queries += (len(group) - 1) * sum(per_run) / len(per_run)
+    print(f"\n💰 Quota CSE économisé estimé : {saved_queries:.1f} requête(s) par run")
+
+
+def print_keyword_report():
+    """Affiche les statistiques par mot-clé et l'évolution des aides trouvées par requête CSE"""
+    _ensure_keyword_schema()
+    rows = db_query("SELECT * FROM keyword_stats ORDER BY entries_added DESC, new_urls DESC")
+    print("📊 Statistiques par mot-clé :")
+    for row in rows:
+        print(f"  - {row['keyword']} : {row['queries']} requête(s), {row['urls_returned']} URL(s), "
+              f"{row['new_urls']} nouvelle(s), {row['entries_added']} aide(s) ajoutée(s), dernier run {row['last_run']}")
+    history = db_query(
+        "SELECT run_date, SUM(queries) AS queries, SUM(entries_added) AS entries, SUM(new_urls) AS new_urls"
+        " FROM keyword_runs GROUP BY run_date ORDER BY run_date"
+    )
+    print("\n📈 Historique des runs :")
+    for run in history:
+        per_call = run["entries"] / run["queries"] if run["queries"] else 0.0
+        print(f"  {run['run_date']} : {run['queries']} requête(s), {run['new_urls']} nouvelle(s) URL(s), "
+              f"{run['entries']} aide(s), {per_call:.3f} aide(s)/requête")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("report", "clusters"):
+        print("Usage : python keyword_utils.py report|clusters")
+        sys.exit(1)
+    if sys.argv[1] == "clusters":
+        print_redundancy_report()
+    else:
+        print_keyword_report()
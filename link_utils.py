@@ -0,0 +1,214 @@
+import os
+import re
+import sys
+import time
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from store_utils import ensure_schema, db_executemany, db_query
+from structured_utils import header_field
+from fetch_utils import get_http_session, canonical_url, FETCH_TIMEOUT
+
+load_dotenv()
+
+# Vérification locale des liens avant l'écriture dans le sheet
+LINK_CHECK_ENABLED = os.getenv("LINK_CHECK_ENABLED", "1") == "1"
+LINK_CHECK_WORKERS = int(os.getenv("LINK_CHECK_WORKERS", "16"))
+LINK_CACHE_TTL_HOURS = float(os.getenv("LINK_CACHE_TTL_HOURS", "72"))
+LINK_TITLE_BYTES = 32 * 1024  # Début de page lu pour trouver le <title>
+HEAD_FALLBACK_STATUSES = (403, 405, 501)  # Serveurs qui refusent HEAD : on réessaie en GET
+
+BROKEN_STATUS = "Lien cassé"
+GENERIC_STATUS = "Lien générique"
+UNVERIFIED_STATUS = "Lien non vérifié"
+# Lien d'origine (résultat de recherche) d'une entrée dont le Lien a été remplacé par l'URL après redirections
+SOURCE_LINK_KEY = "_source_link"
+HOME_PATHS = {"", "/", "/index.html", "/index.php", "/accueil", "/home", "/fr", "/en", "/fr/accueil"}
+GENERIC_TITLE_RE = re.compile(r"^\s*(?:accueil|home|homepage|bienvenue|welcome)\b|\|\s*(?:accueil|home)\s*$", re.I)
+TITLE_RE = re.compile(rb"<title[^>]*>(.*?)</title>", re.I | re.S)
+
+LINK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS link_checks (
+    url TEXT PRIMARY KEY,
+    final_url TEXT,
+    status INTEGER,
+    generic INTEGER DEFAULT 0,
+    reason TEXT,
+    checked_at REAL
+);
+"""
+
+_link_stats = {"checked": 0, "cached": 0, "broken": 0, "generic": 0, "unverified": 0, "seconds": 0.0}
+
+
+def _path_depth(url):
+    """Nombre de segments non vides du chemin d'une URL"""
+    return len([segment for segment in urlsplit(url).path.split("/") if segment])
+
+
+def _read_title(response):
+    """Titre de la page lu sur les premiers octets de la réponse"""
+    if "html" not in response.headers.get("Content-Type", "").lower():
+        return ""
+    head = b""
+    for chunk in response.iter_content(chunk_size=8192):
+        head += chunk
+        if len(head) >= LINK_TITLE_BYTES or b"</title>" in head.lower():
+            break
+    match = TITLE_RE.search(head)
+    if not match:
+        return ""
+    return re.sub(r"\s+", " ", match.group(1).decode(response.encoding or "utf-8", errors="replace")).strip()
+
+
+def _generic_reason(url, final_url, title):
+    """Raison pour laquelle un lien pointe vers une page générique (ou chaîne vide)"""
+    final_path = urlsplit(final_url).path.rstrip("/").lower()
+    if final_path in HOME_PATHS or not final_path:
+        if _path_depth(url) > 0:
+            return "redirection vers l'accueil"
+        return "page d'accueil"
+    if title and GENERIC_TITLE_RE.search(title):
+        return f"titre générique « {title[:60]} »"
+    return ""
+
+
+def check_link(url):
+    """Vérifie un lien (HEAD, GET partiel si nécessaire) : dict url, final_url, status, generic, reason"""
+    session = get_http_session()
+    result = {"url": url, "final_url": url, "status": 0, "generic": False, "reason": ""}
+    try:
+        response = session.head(url, timeout=FETCH_TIMEOUT, allow_redirects=True)
+        status = response.status_code
+        final_url = response.url
+        title = ""
+        # Page peu profonde ou HEAD refusé : GET partiel pour le statut réel et le titre
+        if status in HEAD_FALLBACK_STATUSES or status >= 500 or _path_depth(final_url) <= 1:
+            with session.get(url, timeout=FETCH_TIMEOUT, allow_redirects=True, stream=True) as response:
+                status = response.status_code
+                final_url = response.url
+                if status < 400:
+                    title = _read_title(response)
+        result.update(status=status, final_url=final_url)
+        if status >= 400:
+            result["reason"] = f"HTTP {status}"
+        else:
+            result["reason"] = _generic_reason(url, final_url, title)
+            result["generic"] = bool(result["reason"])
+    except Exception as e:
+        result["reason"] = type(e).__name__
+    return result
+
+
+def _cached_checks(keys):
+    """Résultats encore valides du cache (dict URL canonique -> résultat)"""
+    ensure_schema(LINK_SCHEMA)
+    if not keys:
+        return {}
+    min_time = time.time() - LINK_CACHE_TTL_HOURS * 3600
+    placeholders = ",".join("?" * len(keys))
+    rows = db_query(f"SELECT * FROM link_checks WHERE url IN ({placeholders}) AND checked_at >= ?",
+                    (*keys, min_time))
+    return {row["url"]: {"url": row["url"], "final_url": row["final_url"], "status": row["status"],
+                         "generic": bool(row["generic"]), "reason": row["reason"]} for row in rows}
+
+
+def check_links(urls):
+    """Vérifie une liste de liens en parallèle (pool borné, cache par URL canonique) :
+    dict URL canonique -> résultat"""
+    start = time.perf_counter()
+    keys = {canonical_url(url): url for url in urls if url and url.startswith(("http://", "https://"))}
+    results = _cached_checks(list(keys))
+    _link_stats["cached"] += len(results)
+    to_check = [url for key, url in keys.items() if key not in results]
+    if to_check:
+        with ThreadPoolExecutor(max_workers=min(LINK_CHECK_WORKERS, len(to_check))) as executor:
+            checked = list(executor.map(check_link, to_check))
+        now = time.time()
+        for url, result in zip(to_check, checked):
+            results[canonical_url(url)] = result
+        # Les erreurs réseau (status 0) ne sont pas mises en cache : elles seront revérifiées
+        db_executemany(
+            "INSERT OR REPLACE INTO link_checks (url, final_url, status, generic, reason, checked_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [(canonical_url(r["url"]), r["final_url"], r["status"], int(r["generic"]), r["reason"], now)
+             for r in checked if r["status"]]
+        )
+    _link_stats["checked"] += len(to_check)
+    _link_stats["seconds"] += time.perf_counter() - start
+    return results
+
+
+def is_broken(result):
+    """Vrai si le lien renvoie une erreur HTTP (un délai dépassé ou une erreur réseau, status 0,
+    est passager : le lien n'est pas vérifié, pas cassé)"""
+    return result["status"] >= 400
+
+
+def source_link(entry, link_header=None):
+    """Lien d'origine d'une entrée (avant redirections), pour créditer mots-clés et modèle de tri"""
+    if entry.get(SOURCE_LINK_KEY):
+        return entry[SOURCE_LINK_KEY]
+    if link_header:
+        return entry.get(link_header, "")
+    return next((str(v) for k, v in entry.items() if header_field(k) == "url" and v), "")
+
+
+def verify_entry_links(entries, headers):
+    """Vérifie les liens des entrées et marque les liens cassés ou génériques (Statut, Commentaires)"""
+    if not LINK_CHECK_ENABLED or not entries:
+        return entries
+    link_header = next((h for h in headers if header_field(h) == "url"), None)
+    status_header = next((h for h in headers if "statut" in h.lower() or "status" in h.lower()), None)
+    comment_header = next((h for h in headers if "comment" in h.lower()), None)
+    if not link_header:
+        return entries
+    results = check_links([entry.get(link_header, "") for entry in entries])
+    for entry in entries:
+        result = results.get(canonical_url(entry.get(link_header, "")))
+        if not result:
+            continue
+        if not result["status"]:
+            # Erreur passagère : signalée en commentaire, sans toucher au statut de l'aide
+            _link_stats["unverified"] += 1
+            print(f"  🔗 {UNVERIFIED_STATUS} ({result['reason']}) : {entry[link_header]}")
+            if comment_header:
+                note = f"{UNVERIFIED_STATUS} : {result['reason']}."
+                entry[comment_header] = f"{note} {entry.get(comment_header, '')}".strip()
+            continue
+        if is_broken(result):
+            label = BROKEN_STATUS
+            _link_stats["broken"] += 1
+        elif result["generic"]:
+            label = GENERIC_STATUS
+            _link_stats["generic"] += 1
+        else:
+            # Lien valide : on enregistre l'URL finale après redirections, en gardant le lien d'origine
+            if canonical_url(result["final_url"]) != canonical_url(entry[link_header]):
+                entry.setdefault(SOURCE_LINK_KEY, entry[link_header])
+                entry[link_header] = result["final_url"]
+            continue
+        print(f"  🔗 {label} ({result['reason']}) : {entry[link_header]}")
+        if status_header and not entry.get(status_header, "").startswith("Expir"):
+            entry[status_header] = label
+        if comment_header:
+            note = f"{label} : {result['reason']}."
+            entry[comment_header] = f"{note} {entry.get(comment_header, '')}".strip()
+    return entries
+
+
+def print_link_summary():
+    """Affiche le bilan de la vérification des liens"""
+    stats = _link_stats
+    if stats["checked"] or stats["cached"]:
+        print(f"🔗 Liens : {stats['checked']} vérifié(s) en {stats['seconds']:.1f} s, {stats['cached']} en cache, "
+              f"{stats['broken']} cassé(s), {stats['generic']} générique(s), {stats['unverified']} non vérifié(s)")
+
+
+if __name__ == "__main__":
+    # Usage : python link_utils.py <url> [<url> ...]
+    for key, result in check_links(sys.argv[1:]).items():
+        state = "❔" if not result["status"] else "❌" if is_broken(result) else ("⚠️" if result["generic"] else "✅")
+        print(f"{state} {result['status']} {key} -> {result['final_url']} {result['reason']}")
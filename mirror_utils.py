@@ -0,0 +1,127 @@
+import sys
+import json
+from datetime import date, datetime, timedelta
+
+from store_utils import ensure_schema, ensure_columns, db_executemany, db_query
+from structured_utils import header_field
+from fetch_utils import canonical_url
+from deadline_utils import DEADLINE_KEY, parse_deadline
+
+# Miroir local des aides écrites dans le sheet, indexé par date limite
+MIRROR_SCHEMA = """
+CREATE TABLE IF NOT EXISTS funding_mirror (
+    key TEXT PRIMARY KEY,
+    name TEXT,
+    link TEXT,
+    organization TEXT,
+    deadline TEXT,
+    data TEXT,
+    added_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_funding_mirror_deadline ON funding_mirror (deadline);
+"""
+# Lignes retirées du sheet principal par l'archivage (onglet d'archive, ou miroir seul)
+MIRROR_COLUMNS = {"archived_at": "TEXT", "archive_tab": "TEXT"}
+
+
+def _ensure_mirror():
+    """Crée la table du miroir et ses colonnes d'archivage si nécessaire"""
+    ensure_schema(MIRROR_SCHEMA)
+    ensure_columns("funding_mirror", MIRROR_COLUMNS)
+
+
+def _field(entry, field):
+    """Valeur de la colonne correspondant à un champ générique"""
+    return next((str(v) for k, v in entry.items() if header_field(k) == field and v), "")
+
+
+def mirror_key(name, link):
+    """Clé d'une aide dans le miroir (nom + lien canonique, comme la déduplication du sheet)"""
+    return f"{name.strip().lower()}|{canonical_url(link) if link else ''}"
+
+
+def mirror_entries(entries, archive_tab=None):
+    """Enregistre (ou met à jour) les entrées dans le miroir local ; avec `archive_tab`, les marque comme
+    archivées (retirées du sheet principal, vers cet onglet ou vers le miroir seul si chaîne vide)"""
+    _ensure_mirror()
+    now = datetime.now().strftime("%Y-%m-%d %H:%M")
+    archived_at = now if archive_tab is not None else None
+    rows = []
+    for entry in entries:
+        name, link = _field(entry, "name"), _field(entry, "url")
+        if not name:
+            continue
+        deadline = entry.get(DEADLINE_KEY)
+        if deadline is None:
+            parsed = parse_deadline(_field(entry, "deadline"))
+            deadline = parsed.isoformat() if parsed else ""
+        data = {k: v for k, v in entry.items() if not k.startswith("_")}
+        rows.append((mirror_key(name, link), name, link, _field(entry, "organization"), deadline or None,
+                     json.dumps(data, ensure_ascii=False), now, archived_at, archive_tab))
+    # Une simple mise à jour du miroir n'efface jamais le marquage d'archivage
+    db_executemany(
+        "INSERT INTO funding_mirror (key, name, link, organization, deadline, data, added_at, archived_at, archive_tab)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        " ON CONFLICT(key) DO UPDATE SET organization = excluded.organization,"
+        " deadline = excluded.deadline, data = excluded.data,"
+        " archived_at = COALESCE(excluded.archived_at, archived_at),"
+        " archive_tab = COALESCE(excluded.archive_tab, archive_tab)",
+        rows
+    )
+    return len(rows)
+
+
+def archived_entries():
+    """Nom, lien et date limite ISO des aides archivées (retirées du sheet principal), pour la déduplication"""
+    _ensure_mirror()
+    return [(row["name"], row["link"], row["deadline"] or "") for row in
+            db_query("SELECT name, link, deadline FROM funding_mirror WHERE archived_at IS NOT NULL")]
+
+
+def mirror_links():
+    """Liens canoniques de toutes les aides du miroir, archivées comprises"""
+    _ensure_mirror()
+    return {canonical_url(row["link"]) for row in
+            db_query("SELECT link FROM funding_mirror WHERE link IS NOT NULL AND link != ''")}
+
+
+def upcoming_deadlines(days=30, today=None):
+    """Aides dont la date limite tombe dans les `days` prochains jours (requête sur l'index)"""
+    _ensure_mirror()
+    today = today or date.today()
+    return db_query(
+        "SELECT name, organization, deadline, link FROM funding_mirror"
+        " WHERE deadline >= ? AND deadline <= ? ORDER BY deadline",
+        (today.isoformat(), (today + timedelta(days=days)).isoformat())
+    )
+
+
+def print_upcoming(days=30):
+    """Affiche les prochaines dates limites"""
+    rows = upcoming_deadlines(days)
+    print(f"📅 {len(rows)} date(s) limite(s) dans les {days} prochains jours")
+    for row in rows:
+        print(f"  - {row['deadline']} | {row['name']} ({row['organization'] or '?'}) {row['link']}")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "upcoming":
+        print_upcoming(int(sys.argv[2]) if len(sys.argv) > 2 else 30)
+    elif command == "sync":
+        # Reconstruit le miroir depuis les lignes existantes du sheet, lues par blocs
+        from sheets_utils import get_client, get_headers, iter_sheet_rows, SPREADSHEET_ID, WORKSHEET_NAME
+        sheet = get_client().open_by_key(SPREADSHEET_ID).worksheet(WORKSHEET_NAME)
+        headers = get_headers(sheet)
+        count = 0
+        chunk = []
+        for _, row in iter_sheet_rows(sheet, headers):
+            chunk.append(dict(zip(headers, row)))
+            if len(chunk) >= 500:
+                count += mirror_entries(chunk)
+                chunk = []
+        count += mirror_entries(chunk)
+        print(f"✅ {count} aide(s) synchronisée(s) dans le miroir local")
+    else:
+        print("Usage : python mirror_utils.py upcoming [jours] | sync")
+        sys.exit(1)
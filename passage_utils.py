@@ -0,0 +1,185 @@
+import os
+import re
+import math
+import unicodedata
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Découpage des pages en passages et sélection des plus pertinents pour le prompt
+PASSAGE_MAX_CHARS = int(os.getenv("PASSAGE_MAX_CHARS", "600"))
+PASSAGE_MIN_CHARS = 80
+PASSAGES_PER_FIELD = int(os.getenv("PASSAGES_PER_FIELD", "2"))
+PAGE_CONTEXT_CHARS = int(os.getenv("PAGE_CONTEXT_CHARS", "2500"))
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+MONTHS = "janvier fevrier mars avril mai juin juillet aout septembre octobre novembre decembre"
+# Requêtes lexicales par champ d'intérêt pour le remplissage du sheet
+FIELD_QUERIES = {
+    "deadline": f"date limite deadline cloture candidature candidatures depot dossier avant session calendrier {MONTHS}",
+    "montant": "montant euros eur aide maximum plafond dotation subvention financement allocation budget",
+    "eligibilite": "eligibilite eligible conditions criteres beneficiaires producteur societe documentaire projet",
+    "contact": "contact email courriel mail telephone adresse charge mission renseignements",
+}
+STOPWORDS = set("""
+le la les un une des du de d l et ou en au aux a par pour sur dans avec sans ce cette ces son sa ses leur leurs
+qui que quoi dont est sont etre ete il elle ils elles on nous vous se ne pas plus the of and to in for on with is are
+""".split())
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def _normalize(text):
+    """Minuscules sans accents pour la recherche lexicale"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    """Tokens normalisés (sans accents ni mots vides, pluriel simple retiré)"""
+    tokens = []
+    for token in TOKEN_RE.findall(_normalize(text)):
+        if token in STOPWORDS or len(token) < 2:
+            continue
+        if len(token) > 3 and token.endswith("s"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _sentences(paragraph):
+    """Phrases d'un paragraphe trop long ; un bloc sans ponctuation (liste à puces, tableau) est coupé
+    aux sauts de ligne, puis entre deux mots, au lieu d'être tronqué"""
+    for sentence in SENTENCE_RE.split(paragraph):
+        if len(sentence) <= PASSAGE_MAX_CHARS:
+            yield re.sub(r"\s+", " ", sentence).strip()
+            continue
+        for line in sentence.splitlines():
+            line = re.sub(r"\s+", " ", line).strip()
+            while len(line) > PASSAGE_MAX_CHARS:
+                cut = line.rfind(" ", 0, PASSAGE_MAX_CHARS)
+                if cut <= 0:
+                    cut = PASSAGE_MAX_CHARS
+                yield line[:cut].strip()
+                line = line[cut:].strip()
+            if line:
+                yield line
+
+
+def split_passages(text):
+    """Découpe un texte en passages d'environ PASSAGE_MAX_CHARS en respectant paragraphes, phrases et lignes"""
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text or "") if p.strip()]
+    pieces = []
+    for paragraph in paragraphs:
+        if len(paragraph) <= PASSAGE_MAX_CHARS:
+            pieces.append(re.sub(r"\s+", " ", paragraph))
+            continue
+        current = ""
+        for sentence in _sentences(paragraph):
+            if current and len(current) + len(sentence) + 1 > PASSAGE_MAX_CHARS:
+                pieces.append(current)
+                current = ""
+            current = f"{current} {sentence}".strip()
+        if current:
+            pieces.append(current)
+
+    # Rattacher les fragments trop courts (titres, listes) au passage suivant
+    passages = []
+    pending = ""
+    for piece in pieces:
+        piece = f"{pending} {piece}" if pending else piece
+        pending = ""
+        if len(piece) < PASSAGE_MIN_CHARS:
+            pending = piece
+            continue
+        passages.append(piece)
+    if pending:
+        if passages and len(passages[-1]) + len(pending) < PASSAGE_MAX_CHARS:
+            passages[-1] = f"{passages[-1]} {pending}"
+        else:
+            passages.append(pending)
+    return passages
+
+
+class PassageIndex:
+    """Index BM25 local des passages de toutes les pages d'un run"""
+
+    def __init__(self):
+        self.passages = []      # (url, position, texte)
+        self.term_freqs = []    # dict token -> fréquence par passage
+        self.lengths = []
+        self.total_length = 0
+        self.doc_freqs = {}
+        self.by_url = {}
+
+    def add_page(self, url, text):
+        """Découpe et indexe une page, retourne le nombre de passages"""
+        passages = split_passages(text)
+        for position, passage in enumerate(passages):
+            tokens = tokenize(passage)
+            freqs = {}
+            for token in tokens:
+                freqs[token] = freqs.get(token, 0) + 1
+            for token in freqs:
+                self.doc_freqs[token] = self.doc_freqs.get(token, 0) + 1
+            self.by_url.setdefault(url, []).append(len(self.passages))
+            self.passages.append((url, position, passage))
+            self.term_freqs.append(freqs)
+            self.lengths.append(len(tokens))
+            self.total_length += len(tokens)
+        return len(passages)
+
+    def release_page(self, url):
+        """Libère le texte et les fréquences des passages d'une page traitée (les statistiques du corpus restent)"""
+        for passage_id in self.by_url.pop(url, []):
+            self.passages[passage_id] = None
+            self.term_freqs[passage_id] = None
+
+    def _score(self, passage_id, query_tokens):
+        """Score BM25 d'un passage pour une requête"""
+        total = len(self.passages)
+        avg_length = (self.total_length / total) if total else 0
+        freqs = self.term_freqs[passage_id]
+        length_norm = 1 - BM25_B + BM25_B * (self.lengths[passage_id] / avg_length if avg_length else 1)
+        score = 0.0
+        for token in query_tokens:
+            tf = freqs.get(token)
+            if not tf:
+                continue
+            df = self.doc_freqs.get(token, 0)
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+        return score
+
+    def top_passages(self, url, query, k=PASSAGES_PER_FIELD):
+        """Les k passages d'une page les plus pertinents pour une requête (identifiants)"""
+        query_tokens = set(tokenize(query))
+        scored = [(self._score(pid, query_tokens), pid) for pid in self.by_url.get(url, [])]
+        scored = [(score, pid) for score, pid in scored if score > 0]
+        scored.sort(reverse=True)
+        return [pid for _, pid in scored[:k]]
+
+    def build_page_context(self, url, max_chars=PAGE_CONTEXT_CHARS):
+        """Contexte compact d'une page : introduction + meilleurs passages par champ, dans l'ordre du texte"""
+        passage_ids = self.by_url.get(url, [])
+        if not passage_ids:
+            return ""
+        selected = [passage_ids[0]]  # Titre / introduction
+        for query in FIELD_QUERIES.values():
+            for pid in self.top_passages(url, query):
+                if pid not in selected:
+                    selected.append(pid)
+        selected.sort(key=lambda pid: self.passages[pid][1])
+        parts = []
+        used = 0
+        for pid in selected:
+            passage = self.passages[pid][2]
+            if used + len(passage) > max_chars:
+                passage = passage[:max(0, max_chars - used)]
+            if not passage:
+                break
+            parts.append(passage)
+            used += len(passage)
+        return "\n[...]\n".join(parts)
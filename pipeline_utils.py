@@ -0,0 +1,152 @@
+import os
+import time
+import queue
+import threading
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+
+from sheets_utils import normalize_key
+from structured_utils import header_field
+
+load_dotenv()
+
+# Pipeline en flux : découverte → pages → lots de contexte → entrées → lots de lignes
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))  # Pages prêtes d'avance au plus (contre-pression)
+PIPELINE_CHUNK_CHARS = int(os.getenv("PIPELINE_CHUNK_CHARS", "50000"))  # Contexte envoyé par appel LLM
+PIPELINE_BATCH_ROWS = int(os.getenv("PIPELINE_BATCH_ROWS", "10"))  # Entrées sans LLM regroupées par écriture
+# Analyse des aides ouvertes dès que PIPELINE_ANALYSIS_ENTRIES attendent ou que la plus ancienne attend
+# depuis PIPELINE_ANALYSIS_SECONDS : les écritures suivent la recherche au lieu d'arriver en fin de run
+PIPELINE_ANALYSIS_ENTRIES = int(os.getenv("PIPELINE_ANALYSIS_ENTRIES", "5"))
+PIPELINE_ANALYSIS_SECONDS = float(os.getenv("PIPELINE_ANALYSIS_SECONDS", "60"))
+
+_DONE = object()
+
+_pipeline_stats = {"start": None, "first_write": None, "chunks": 0, "analyses": 0, "batches": 0, "rows": 0,
+                   "max_chunk_chars": 0, "waits": 0, "exclusions": 0, "exclusions_total": 0}
+
+
+class _Failure:
+    """Exception levée par le producteur, transmise au consommateur"""
+    __slots__ = ("error",)
+
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(iterable, maxsize=PIPELINE_QUEUE_SIZE):
+    """Consomme `iterable` dans un thread producteur avec au plus `maxsize` éléments d'avance :
+    le producteur attend dès que la file est pleine, la mémoire reste bornée par la taille de la file.
+    Si le consommateur s'arrête (exception, close()), le producteur est prévenu et s'arrête aussi"""
+    if _pipeline_stats["start"] is None:
+        _pipeline_stats["start"] = time.perf_counter()
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        """Ajoute un élément à la file en attendant une place, sauf si le consommateur s'est arrêté"""
+        if items.full():
+            _pipeline_stats["waits"] += 1
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    break
+        except Exception as e:
+            put(_Failure(e))
+        finally:
+            if stop.is_set() and hasattr(iterable, "close"):
+                iterable.close()
+            put(_DONE)
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+
+
+def build_exclusions(entries):
+    """Aides déjà connues, préparées une fois pour filtrer la consigne d'exclusion de chaque lot :
+    liste de (nom, nom normalisé, site de son lien)"""
+    exclusions = []
+    for entry in entries:
+        name = next((str(v).strip() for k, v in entry.items() if header_field(k) == "name" and v), "")
+        if not name:
+            continue
+        link = next((str(v) for k, v in entry.items() if header_field(k) == "url" and v), "")
+        host = urlsplit(link).netloc.lower()
+        exclusions.append((name, normalize_key(name), host[4:] if host.startswith("www.") else host))
+    return exclusions
+
+
+def exclusion_text_for(exclusions, urls, text):
+    """Consigne d'exclusion d'un lot : seules les aides déjà connues dont le site est celui d'une page du lot
+    ou dont le nom apparaît dans son contenu (au lieu de toute la liste à chaque appel)"""
+    if not exclusions:
+        return ""
+    hosts = set()
+    for url in urls:
+        host = urlsplit(url).netloc.lower()
+        hosts.add(host[4:] if host.startswith("www.") else host)
+    normalized_text = normalize_key(text)
+    names = [name for name, key, host in exclusions
+             if (host and host in hosts) or (len(key) >= 8 and key in normalized_text)]
+    _pipeline_stats["exclusions"] += len(names)
+    _pipeline_stats["exclusions_total"] += len(exclusions)
+    if not names:
+        return ""
+    return "\nIgnore les aides déjà listées avec les noms suivants :\n" + "\n".join(f"- {name}" for name in names)
+
+
+def cites_known_entry(exclusions, text):
+    """Vrai si le texte d'une page cite le nom d'une aide déjà connue (page d'aide sans nouvelle entrée)"""
+    normalized_text = normalize_key(text)
+    return any(len(key) >= 8 and key in normalized_text for _, key, _ in exclusions)
+
+
+def record_chunk(chars):
+    """Comptabilise un lot de contexte envoyé au LLM"""
+    _pipeline_stats["chunks"] += 1
+    _pipeline_stats["max_chunk_chars"] = max(_pipeline_stats["max_chunk_chars"], chars)
+
+
+def record_analysis():
+    """Comptabilise un appel d'analyse (regroupant les aides de plusieurs lots)"""
+    _pipeline_stats["analyses"] += 1
+
+
+def record_batch(rows):
+    """Comptabilise un lot de lignes écrit dans le sheet (et le délai avant la première écriture)"""
+    _pipeline_stats["batches"] += 1
+    _pipeline_stats["rows"] += rows
+    if _pipeline_stats["first_write"] is None and _pipeline_stats["start"] is not None:
+        _pipeline_stats["first_write"] = time.perf_counter() - _pipeline_stats["start"]
+
+
+def print_pipeline_summary():
+    """Affiche le bilan du pipeline en flux"""
+    stats = _pipeline_stats
+    if stats["start"] is None:
+        return
+    first_write = f"{stats['first_write']:.1f} s" if stats["first_write"] is not None else "aucune"
+    print(f"\n🚰 Pipeline : {stats['chunks']} lot(s) LLM (≤ {stats['max_chunk_chars']} caractères), "
+          f"{stats['analyses']} analyse(s), {stats['batches']} écriture(s), {stats['rows']} entrée(s), "
+          f"première écriture après {first_write} "
+          f"({stats['waits']} attente(s) du producteur, file ≤ {PIPELINE_QUEUE_SIZE} pages)")
+    if stats["exclusions_total"]:
+        print(f"  - Exclusions envoyées : {stats['exclusions']} nom(s) au lieu de {stats['exclusions_total']}")
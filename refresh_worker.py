@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from store_utils import ensure_schema, db_executemany, db_query
+from structured_utils import header_field
+from fetch_utils import fetch_page_local, FETCH_POOL_SIZE
+from deadline_utils import parse_deadline, EXPIRED_STATUS
+from link_utils import check_link, is_broken, BROKEN_STATUS
+from incremental_utils import compare_page_sections, index_existing_entries, build_update_context
+
+load_dotenv()
+
+# Rafraîchissement des lignes existantes : revalidation conditionnelle des liens déjà enregistrés
+REFRESH_CAPACITY = int(os.getenv("REFRESH_CAPACITY", "10"))  # Liens revalidés par run (0 = désactivé)
+REFRESH_MIN_AGE_HOURS = float(os.getenv("REFRESH_MIN_AGE_HOURS", "24"))  # Délai minimal entre deux vérifications
+
+REFRESH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS refresh_log (
+    url TEXT PRIMARY KEY,
+    last_checked REAL,
+    last_result TEXT
+);
+"""
+
+_refresh_stats = {"candidates": 0, "checked": 0, "unchanged": 0, "changed": 0, "broken": 0, "expired": 0,
+                  "seconds": 0.0}
+
+
+def _status_header(headers):
+    """Colonne Statut du sheet (ou None)"""
+    return next((h for h in headers if "statut" in h.lower() or "status" in h.lower()), None)
+
+
+def plan_refresh(existing_index, headers, capacity=REFRESH_CAPACITY, today=None):
+    """Lignes à revalider par ordre de priorité : date limite la plus proche, puis vérification la plus
+    ancienne. Retourne (lignes à revalider, lignes expirées à marquer sans téléchargement)"""
+    ensure_schema(REFRESH_SCHEMA)
+    today = today or date.today()
+    last_checked = {row["url"]: row["last_checked"] for row in db_query("SELECT url, last_checked FROM refresh_log")}
+    min_checked = time.time() - REFRESH_MIN_AGE_HOURS * 3600
+    deadline_header = next((h for h in headers if header_field(h) == "deadline"), None)
+    status_header = _status_header(headers)
+    candidates, expired = [], []
+    for key, (row_number, entry) in existing_index.items():
+        deadline = parse_deadline(str(entry.get(deadline_header, "")), today) if deadline_header else None
+        if deadline and deadline < today:
+            if status_header and entry.get(status_header) != EXPIRED_STATUS:
+                expired.append((row_number, entry))
+            continue
+        checked = last_checked.get(key, 0)
+        if checked > min_checked:
+            continue
+        # Sans date limite connue : après les aides datées
+        candidates.append(((deadline or date.max).toordinal(), checked, row_number, key, entry))
+    candidates.sort()
+    _refresh_stats["candidates"] += len(candidates)
+    return [(row_number, key, entry) for _, _, row_number, key, entry in candidates[:capacity]], expired
+
+
+def _revalidate(item):
+    """Revalide un lien (requête conditionnelle) et compare ses sections à la version précédente"""
+    row_number, key, entry = item
+    link = next((str(v) for k, v in entry.items() if header_field(k) == "url" and v), "")
+    page = fetch_page_local(link, revalidate=True)
+    if not page:
+        result = check_link(link)
+        return row_number, key, entry, ("broken" if is_broken(result) else "error"), None, None
+    # Page inchangée (304 ou cache) : comparée quand même au texte connu, au cas où la modification
+    # vue au run précédent n'a pas pu être écrite dans le sheet (empreintes non enregistrées)
+    change = compare_page_sections(link, page["text"])
+    return row_number, key, entry, change["status"], page, change
+
+
+def refresh_existing_rows(existing_entries, headers, capacity=REFRESH_CAPACITY, load_rows=None):
+    """Revalide les liens des lignes existantes dans la limite de `capacity` et prépare les mises à jour.
+    Retourne un dict row_updates (statuts : expirée, lien cassé), update_parts (sections modifiées à
+    soumettre au LLM), changes (n° de ligne -> modification, à enregistrer une fois la mise à jour écrite)
+    et urls (liens revalidés, à ne pas re-télécharger pendant la découverte).
+    `load_rows` : lecture complète à la demande des lignes modifiées quand les entrées n'ont que les colonnes clés"""
+    refresh = {"row_updates": {}, "update_parts": [], "changes": {}, "urls": set()}
+    if capacity <= 0 or not existing_entries:
+        return refresh
+    start = time.perf_counter()
+    existing_index = index_existing_entries(existing_entries)
+    status_header = _status_header(headers)
+    rows, expired = plan_refresh(existing_index, headers, capacity)
+
+    # Appels expirés : statut mis à jour sans aucun téléchargement (rien à marquer sans colonne de statut)
+    if status_header:
+        for row_number, entry in expired:
+            refresh["row_updates"][row_number] = {status_header: EXPIRED_STATUS}
+        _refresh_stats["expired"] += len(expired)
+
+    print(f"\n🔄 Rafraîchissement : {len(rows)} lien(s) à revalider (capacité {capacity})")
+    with ThreadPoolExecutor(max_workers=max(1, min(FETCH_POOL_SIZE, len(rows)))) as executor:
+        results = list(executor.map(_revalidate, rows))
+
+    now = time.time()
+    changed_rows = [row_number for row_number, _, _, status, _, _ in results if status == "changed"]
+    full_rows = load_rows(changed_rows) if load_rows and changed_rows else {}
+    for row_number, key, entry, status, page, change in results:
+        refresh["urls"].add(key)
+        if status in _refresh_stats:
+            _refresh_stats[status] += 1
+        if status == "broken" and status_header:
+            refresh["row_updates"][row_number] = {status_header: BROKEN_STATUS}
+        elif status == "changed":
+            link = next((str(v) for k, v in entry.items() if header_field(k) == "url" and v), key)
+            entry = full_rows.get(row_number, entry)
+            refresh["update_parts"].append(build_update_context(link, entry, change, headers))
+            refresh["changes"][row_number] = change
+    _refresh_stats["checked"] += len(results)
+    db_executemany(
+        "INSERT OR REPLACE INTO refresh_log (url, last_checked, last_result) VALUES (?, ?, ?)",
+        [(key, now, status) for _, key, _, status, _, _ in results]
+    )
+    _refresh_stats["seconds"] += time.perf_counter() - start
+    return refresh
+
+
+def print_refresh_summary():
+    """Affiche le bilan du rafraîchissement"""
+    stats = _refresh_stats
+    if not (stats["checked"] or stats["expired"]):
+        return
+    print(f"🔄 Rafraîchissement : {stats['checked']}/{stats['candidates']} lien(s) revalidé(s) "
+          f"en {stats['seconds']:.1f} s : {stats['unchanged']} inchangé(s), {stats['changed']} modifié(s), "
+          f"{stats['broken']} cassé(s), {stats['expired']} expiré(s) marqué(s)")
+
+
+if __name__ == "__main__":
+    # Usage : python refresh_worker.py [capacité]  (mode autonome, sans recherche de nouvelles aides)
+    from crewai import Agent
+    from langchain_openai import ChatOpenAI
+    from sheets_utils import get_existing_entries, get_sheet_columns, get_sheet_rows, update_sheet_rows
+    from incremental_utils import run_update_task, commit_page_changes
+
+    capacity = int(sys.argv[1]) if len(sys.argv) > 1 else REFRESH_CAPACITY
+    existing = get_existing_entries(full=False)
+    headers = get_sheet_columns()
+    refresh = refresh_existing_rows(existing, headers, capacity, load_rows=get_sheet_rows)
+    row_updates = dict(refresh["row_updates"])
+    page_updates = {}
+    if refresh["update_parts"]:
+        agent = Agent(
+            role="Chercheur d'aides au documentaire",
+            goal="Mettre à jour les informations des aides dont la page a changé.",
+            backstory="Expert en financement culturel pour documentaires internationaux.",
+            verbose=True,
+            llm=ChatOpenAI(model="gpt-4-turbo")
+        )
+        page_updates = run_update_task(agent, refresh["update_parts"], headers, index_existing_entries(existing))
+        for row_number, fields in (page_updates or {}).items():
+            row_updates.setdefault(row_number, {}).update(fields)
+    written = update_sheet_rows(row_updates)
+    commit_page_changes(list(refresh["changes"].values()), page_updates, written)
+    print_refresh_summary()
+    print(f"✅ Rafraîchissement terminé ({datetime.now().strftime('%Y-%m-%d %H:%M')})")
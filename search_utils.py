@@ -0,0 +1,144 @@
+import os
+import math
+import threading
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from dotenv import load_dotenv
+
+from store_utils import ensure_schema, db_execute, db_query
+from keyword_utils import get_keyword_yields
+
+load_dotenv()
+
+# API Google Search params
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+GOOGLE_CX = os.getenv("GOOGLE_CSE_ID")
+CSE_URL = "https://www.googleapis.com/customsearch/v1"
+CSE_PAGE_SIZE = 10
+CSE_MAX_RESULTS = 100  # L'API ne renvoie pas de résultats au-delà du rang 100
+
+# Budget de résultats par mot-clé et quota quotidien de requêtes CSE (persisté entre les runs)
+SEARCH_MAX_RESULTS_PER_KEYWORD = int(os.getenv("SEARCH_MAX_RESULTS_PER_KEYWORD", "30"))
+SEARCH_DAILY_QUOTA = int(os.getenv("SEARCH_DAILY_QUOTA", "100"))
+SEARCH_RUN_QUOTA = int(os.getenv("SEARCH_RUN_QUOTA", "0"))  # 0 = pas de plafond par run
+
+QUOTA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_quota (
+    day TEXT PRIMARY KEY,
+    used INTEGER DEFAULT 0
+);
+"""
+
+_quota_lock = threading.Lock()
+
+
+def get_remaining_quota():
+    """Nombre de requêtes CSE encore disponibles aujourd'hui"""
+    ensure_schema(QUOTA_SCHEMA)
+    rows = db_query("SELECT used FROM search_quota WHERE day = ?", (date.today().isoformat(),))
+    used = rows[0]["used"] if rows else 0
+    return max(0, SEARCH_DAILY_QUOTA - used)
+
+
+def reserve_quota(requested):
+    """Réserve jusqu'à `requested` requêtes sur le quota du jour et retourne le nombre accordé"""
+    with _quota_lock:
+        granted = min(requested, get_remaining_quota())
+        if granted > 0:
+            db_execute(
+                "INSERT INTO search_quota (day, used) VALUES (?, ?)"
+                " ON CONFLICT(day) DO UPDATE SET used = used + excluded.used",
+                (date.today().isoformat(), granted)
+            )
+        return granted
+
+
+def plan_search_budget(keywords):
+    """Répartit le quota du run entre les mots-clés selon leur rendement historique (dict mot-clé -> pages)"""
+    available = get_remaining_quota()
+    if SEARCH_RUN_QUOTA > 0:
+        available = min(available, SEARCH_RUN_QUOTA)
+    max_pages = max(1, math.ceil(min(SEARCH_MAX_RESULTS_PER_KEYWORD, CSE_MAX_RESULTS) / CSE_PAGE_SIZE))
+    yields = get_keyword_yields(keywords)
+    ranked = sorted(keywords, key=lambda k: yields[k], reverse=True)
+
+    # Une page pour chaque mot-clé tant que le quota le permet, en commençant par les plus rentables
+    plan = {keyword: 0 for keyword in keywords}
+    for keyword in ranked[:available]:
+        plan[keyword] = 1
+    extra = available - sum(plan.values())
+
+    # Pages supplémentaires : au mot-clé dont le rendement par page déjà allouée est le plus élevé
+    while extra > 0:
+        candidates = [k for k in ranked if 0 < plan[k] < max_pages]
+        if not candidates:
+            break
+        best = max(candidates, key=lambda k: yields[k] / plan[k])
+        plan[best] += 1
+        extra -= 1
+
+    skipped = [k for k in keywords if not plan[k]]
+    print(f"📊 Quota CSE : {available} requête(s) disponible(s) pour ce run, {sum(plan.values())} planifiée(s)")
+    if skipped:
+        print(f"⚠️ Quota insuffisant, mots-clés reportés : {skipped}")
+    return plan
+
+
+def _fetch_results_page(query, start):
+    """Récupère une page de résultats CSE à partir du rang `start`"""
+    params = {
+        "key": GOOGLE_API_KEY,
+        "cx": GOOGLE_CX,
+        "q": query,
+        "start": start,
+        "num": CSE_PAGE_SIZE
+    }
+    try:
+        res = requests.get(CSE_URL, params=params, timeout=10)
+        results = res.json()
+        if "error" in results:
+            print(f"❌ Erreur recherche Google (start={start}) : {results['error'].get('message')}")
+        return results.get("items", [])
+    except Exception as e:
+        print(f"❌ Erreur recherche Google (start={start}) : {e}")
+        return []
+
+
+def google_search_results(query, pages=1, exclude_sites=()):
+    """Effectue une recherche Google paginée (pages récupérées en parallèle) et retourne les résultats
+    (link, title, snippet, displayLink) ; `exclude_sites` : domaines écartés via -site:"""
+    if exclude_sites:
+        query = f"{query} " + " ".join(f"-site:{site}" for site in exclude_sites)
+    pages = reserve_quota(min(pages, CSE_MAX_RESULTS // CSE_PAGE_SIZE))
+    if not pages:
+        print(f"⚠️ Quota CSE épuisé, recherche ignorée : {query}")
+        return []
+    starts = [1 + i * CSE_PAGE_SIZE for i in range(pages)]
+    with ThreadPoolExecutor(max_workers=pages) as executor:
+        result_pages = list(executor.map(lambda start: _fetch_results_page(query, start), starts))
+
+    results = []
+    seen = set()
+    for items in result_pages:
+        for item in items:
+            link = item.get("link")
+            if link and link not in seen:
+                seen.add(link)
+                results.append({
+                    "link": link,
+                    "title": item.get("title", ""),
+                    "snippet": item.get("snippet", ""),
+                    "displayLink": item.get("displayLink", "")
+                })
+    results = results[:SEARCH_MAX_RESULTS_PER_KEYWORD]
+    print(f"\n🔍 Recherche : {query} ({pages} page(s))")
+    for result in results:
+        print(f"  - {result['link']}")
+    return results
+
+
+def google_search_urls(query, pages=1):
+    """Effectue une recherche Google paginée et retourne les URLs"""
+    return [result["link"] for result in google_search_results(query, pages)]
@@ -1,21 +1,80 @@
 import gspread
 from google.oauth2.service_account import Credentials
+import os
 import re
+import json
+import time
 from datetime import datetime
 
+from store_utils import ensure_schema, db_execute, db_query
+from funding_entry import FundingEntry, schema_for
+
 # Configuration
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 CREDENTIALS_FILE = 'credentials.json'
 SPREADSHEET_ID = '1tPTgSOLZxXQkBs0e5r_RuAmE6GODI1qgq_g7RFTELSE'
 WORKSHEET_NAME = 'Film Funding'
+# Mode upsert : une aide déjà présente est complétée cellule par cellule au lieu d'être ignorée
+SHEET_UPSERT = os.getenv("SHEET_UPSERT", "0") == "1"
+# Simulation : affiche les ajouts et les cellules modifiées sans rien écrire
+SHEET_DRY_RUN = os.getenv("SHEET_DRY_RUN", "0") == "1"
+# Valeurs qui ne remplacent jamais une cellule déjà remplie
+EMPTY_VALUES = ("", "non spécifié", "non specifie", "non précisé", "n/a")
+# Colonnes lues pour les entrées existantes (les colonnes de texte long ne sont lues qu'à la demande)
+KEY_COLUMN_HINTS = ("nom", "lien", "url", "deadline", "date limite", "statut", "status")
+KEYWORDS_WORKSHEET = "MotsClés"
+# Lecture par blocs des grands onglets : une requête par bloc de lignes, mémoire constante
+SHEET_CHUNK_ROWS = int(os.getenv("SHEET_CHUNK_ROWS", "2000"))
+
+# Disposition des colonnes mémorisée d'un run à l'autre : au démarrage, les colonnes clés sont lues
+# dans la même requête que les en-têtes
+LAYOUT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheet_layout (
+    worksheet TEXT PRIMARY KEY,
+    headers TEXT,
+    updated_at TEXT
+);
+"""
+
+_client = None
+_headers = {}  # Onglet -> en-têtes lus pendant le run
+
+
+def get_client():
+    """Client gspread partagé (authentifié une seule fois par processus)"""
+    global _client
+    if _client is None:
+        creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
+        _client = gspread.authorize(creds)
+    return _client
+
+
+def get_headers(sheet):
+    """En-têtes d'un onglet (lus une fois par run puis gardés en mémoire)"""
+    if sheet.title not in _headers:
+        _headers[sheet.title] = sheet.row_values(1)
+    return _headers[sheet.title]
+
+
+def _stored_layout(worksheet):
+    """En-têtes de l'onglet mémorisés au run précédent"""
+    ensure_schema(LAYOUT_SCHEMA)
+    rows = db_query("SELECT headers FROM sheet_layout WHERE worksheet = ?", (worksheet,))
+    return json.loads(rows[0]["headers"]) if rows else []
+
+
+def _store_layout(worksheet, headers):
+    """Mémorise les en-têtes de l'onglet pour le prochain démarrage"""
+    ensure_schema(LAYOUT_SCHEMA)
+    db_execute("INSERT OR REPLACE INTO sheet_layout (worksheet, headers, updated_at) VALUES (?, ?, ?)",
+               (worksheet, json.dumps(headers, ensure_ascii=False), datetime.now().strftime("%Y-%m-%d %H:%M")))
 
 
 def test_google_sheets_connection():
     """Teste la connexion à Google Sheets"""
     try:
         print("🔧 Test de connexion à Google Sheets...")
-        creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
-        client = gspread.authorize(creds)
+        client = get_client()
         spreadsheet = client.open_by_key(SPREADSHEET_ID)
         print(f"✅ Spreadsheet ouvert : {spreadsheet.title}")
         sheet = spreadsheet.worksheet(WORKSHEET_NAME)
@@ -52,14 +111,10 @@ def normalize_key(text):
 
 def get_sheet_columns():
     """Récupère les colonnes actuelles du Google Sheet"""
-    creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
-    client = gspread.authorize(creds)
+    client = get_client()
     try:
         sheet = client.open_by_key(SPREADSHEET_ID).worksheet(WORKSHEET_NAME)
-        all_values = sheet.get_all_values()
-        if not all_values:
-            return []
-        headers = [h.strip() for h in all_values[0] if h.strip()]
+        headers = [h.strip() for h in get_headers(sheet) if h.strip()]
         print(f"📋 Colonnes détectées dans le sheet : {headers}")
         return headers
     except Exception as e:
@@ -67,9 +122,10 @@ def get_sheet_columns():
         return []
 
 
-def generate_crew_prompt():
-    """Génère dynamiquement le prompt pour les agents CrewAI basé sur les colonnes du sheet"""
-    headers = get_sheet_columns()
+def generate_crew_prompt(headers=None):
+    """Génère dynamiquement le prompt pour les agents CrewAI basé sur les colonnes du sheet
+    (`headers` : colonnes déjà lues au démarrage, sinon lues ici)"""
+    headers = get_sheet_columns() if headers is None else headers
     if not headers:
         default_headers = ["Nom", "Organisme", "Pays", "Deadline", "Lien", "Résumé", "Email de contact", "Conditions d'éligibilité"]
         prompt = "Extrais les informations suivantes pour chaque aide :\n"
@@ -143,11 +199,20 @@ def validate_url(url):
     return url
 
 
+def get_entry_link(entry):
+    """Retourne la valeur du champ lien/URL d'une entrée (ou une chaîne vide)"""
+    for key, value in entry.items():
+        if ('lien' in key.lower() or 'url' in key.lower()) and value:
+            return str(value).strip()
+    return ""
+
+
 def parse_crew_output(result_text, expected_headers):
     """Parse le résultat des agents de manière flexible"""
     entries = []
     result_text = result_text.strip()
-    current_entry = {}
+    schema = schema_for(expected_headers)
+    current_entry = FundingEntry(schema)
     lines = result_text.split('\n')
     
     for line in lines:
@@ -156,7 +221,7 @@ def parse_crew_output(result_text, expected_headers):
                for h in expected_headers if 'nom' in h.lower()):
             if current_entry and any(v for v in current_entry.values() if v):
                 entries.append(current_entry)
-                current_entry = {}
+                current_entry = FundingEntry(schema)
         
         for header in expected_headers:
             patterns = [
@@ -180,7 +245,7 @@ def parse_crew_output(result_text, expected_headers):
         for block in blocks:
             if not block.strip():
                 continue
-            entry = {}
+            entry = FundingEntry(schema)
             for header in expected_headers:
                 patterns = [
                     f"{re.escape(header)}\\s*:\\s*([^\n]+?)(?=(?:{'|'.join([re.escape(h) for h in expected_headers])})\\s*:|$)",
@@ -200,36 +265,153 @@ def parse_crew_output(result_text, expected_headers):
     return entries
 
 
-def send_to_google_sheet(new_entries):
-    """Envoie les entrées en s'adaptant complètement aux colonnes du sheet"""
+def _link_key(link):
+    """Clé de comparaison d'un lien (sans schéma, www, slash final ni fragment)"""
+    link = link.strip().lower().split("#")[0]
+    link = re.sub(r'^https?://(www\.)?', '', link)
+    return link.rstrip('/')
+
+
+def _name_match(candidates, link):
+    """Ligne existante de même nom pouvant recevoir l'upsert : sans lien, ou sur le même site que `link`.
+    Un titre générique (« Aide à l'écriture ») ne doit pas fusionner les aides de deux financeurs"""
+    host = _link_key(link).split("/")[0]
+    return next((row_number for row_number, row_host in candidates if not row_host or row_host == host), None)
+
+
+def coalesce_ranges(cells):
+    """Regroupe des cellules modifiées (dict (ligne, colonne) -> valeur, base 1) en plages A1 rectangulaires :
+    colonnes contiguës d'une même ligne, puis lignes consécutives couvrant les mêmes colonnes"""
+    runs = []  # (ligne, première colonne, valeurs)
+    for row, col in sorted(cells):
+        if runs and runs[-1][0] == row and runs[-1][1] + len(runs[-1][2]) == col:
+            runs[-1][2].append(cells[(row, col)])
+        else:
+            runs.append((row, col, [cells[(row, col)]]))
+    blocks = []  # (première ligne, première colonne, lignes de valeurs)
+    for row, col, values in sorted(runs, key=lambda run: (run[1], len(run[2]), run[0])):
+        last = blocks[-1] if blocks else None
+        if last and last[1] == col and len(last[2][0]) == len(values) and last[0] + len(last[2]) == row:
+            last[2].append(values)
+        else:
+            blocks.append((row, col, [values]))
+    data = []
+    for row, col, values in blocks:
+        start = gspread.utils.rowcol_to_a1(row, col)
+        end = gspread.utils.rowcol_to_a1(row + len(values) - 1, col + len(values[0]) - 1)
+        data.append({"range": start if start == end else f"{start}:{end}", "values": values})
+    return data
+
+
+def diff_row(existing_row, new_row, headers, protected=('Date Ajout',)):
+    """Cellules à modifier pour fusionner une nouvelle ligne dans une ligne existante
+    (dict index de colonne -> (ancienne valeur, nouvelle valeur))"""
+    changes = {}
+    for idx, header in enumerate(headers):
+        if header in protected:
+            continue
+        new_value = str(new_row[idx]).strip() if idx < len(new_row) else ""
+        old_value = str(existing_row[idx]).strip() if idx < len(existing_row) else ""
+        if new_value.lower() in EMPTY_VALUES or new_value == old_value:
+            continue
+        changes[idx] = (old_value, new_value)
+    return changes
+
+
+def _column_letter(idx):
+    """Lettre de colonne A1 d'un index de colonne (base 0)"""
+    return re.sub(r'\d', '', gspread.utils.rowcol_to_a1(1, idx + 1))
+
+
+def key_columns(headers):
+    """Colonnes suffisantes pour le dédoublonnage, l'exclusion et le rafraîchissement (nom, lien, date limite, statut)"""
+    return [h for h in headers if any(hint in h.lower() for hint in KEY_COLUMN_HINTS)]
+
+
+def read_columns(sheet, headers, columns):
+    """Lit uniquement les colonnes demandées (sans l'en-tête) en un seul batch_get : entrées réduites à
+    ces colonnes, dans l'ordre des lignes du sheet (entrée i = ligne i + 2)"""
+    columns = [h for h in columns if h in headers]
+    if not columns:
+        return []
+    ranges = [f"{letter}2:{letter}" for letter in (_column_letter(headers.index(h)) for h in columns)]
+    values = [value_range[0] if value_range else [] for value_range in
+              sheet.batch_get(ranges, major_dimension="COLUMNS")]
+    return _columns_to_records(columns, values)
+
+
+def _columns_to_records(columns, values):
+    """Assemble des colonnes lues séparément en entrées (les colonnes plus courtes sont complétées)"""
+    count = max((len(column) for column in values), default=0)
+    return [{h: (column[i] if i < len(column) else "") for h, column in zip(columns, values)} for i in range(count)]
+
+
+def read_rows(sheet, headers, row_numbers):
+    """Lit en entier les seules lignes demandées, en un seul batch_get (dict n° de ligne -> valeurs)"""
+    row_numbers = sorted(set(row_numbers))
+    if not row_numbers or not headers:
+        return {}
+    last = _column_letter(len(headers) - 1)
+    value_ranges = sheet.batch_get([f"A{n}:{last}{n}" for n in row_numbers])
+    return {n: (value_range[0] if value_range else []) for n, value_range in zip(row_numbers, value_ranges)}
+
+
+def iter_sheet_rows(sheet, headers=None, chunk_size=SHEET_CHUNK_ROWS, start_row=2):
+    """Parcourt l'onglet par blocs de `chunk_size` lignes (A2:Z2001, puis le bloc suivant...) et produit
+    (n° de ligne, tuple de valeurs) pour chaque ligne non vide, sans jamais charger tout l'onglet"""
+    headers = get_headers(sheet) if headers is None else headers
+    if not headers:
+        return
+    width = len(headers)
+    last = _column_letter(width - 1)
+    for first in range(start_row, sheet.row_count + 1, chunk_size):
+        end = min(first + chunk_size - 1, sheet.row_count)
+        for offset, row in enumerate(sheet.get(f"A{first}:{last}{end}")):
+            if any(row):
+                yield first + offset, tuple(row) + ("",) * (width - len(row))
+
+
+def _is_new_edition(entry, archived_deadline):
+    """Vrai si l'entrée a une date limite postérieure à celle de l'aide archivée (nouvelle session de l'appel)"""
+    from deadline_utils import parse_deadline  # Import local : deadline_utils dépend de ce module
+    value = next((str(v) for k, v in entry.items() if 'deadline' in k.lower() or 'date limite' in k.lower()), "")
+    deadline = parse_deadline(value)
+    return bool(deadline and archived_deadline and deadline.isoformat() > archived_deadline)
+
+
+def send_to_google_sheet(new_entries, upsert=None, dry_run=None):
+    """Envoie les entrées en s'adaptant complètement aux colonnes du sheet et retourne celles ajoutées.
+    En mode upsert, une aide déjà présente (même lien, sinon même nom) est complétée : seules les cellules
+    modifiées sont envoyées, en une requête. En simulation, rien n'est écrit et le diff est affiché"""
+    upsert = SHEET_UPSERT if upsert is None else upsert
+    dry_run = SHEET_DRY_RUN if dry_run is None else dry_run
     if not new_entries:
         print("⚠️ Aucune entrée à envoyer")
-        return
+        return []
         
     print(f"\n📋 DEBUG - Entrées reçues : {len(new_entries)}")
     
-    creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
-    client = gspread.authorize(creds)
+    client = get_client()
     
     try:
         sheet = client.open_by_key(SPREADSHEET_ID).worksheet(WORKSHEET_NAME)
         print(f"✅ Connecté à la feuille '{WORKSHEET_NAME}'")
     except Exception as e:
         print(f"❌ ERREUR de connexion : {e}")
-        return
+        return []
 
-    all_values = sheet.get_all_values()
+    # Seuls l'en-tête puis les colonnes Nom et Lien sont lus ; les lignes complètes ne le sont qu'en upsert
+    headers = get_headers(sheet)
     
-    if not all_values:
-        if new_entries:
-            headers = list(new_entries[0].keys())
-            if 'Date Ajout' not in headers:
-                headers.append('Date Ajout')
+    if not headers:
+        headers = list(new_entries[0].keys())
+        if 'Date Ajout' not in headers:
+            headers.append('Date Ajout')
+        if not dry_run:
             sheet.append_row(headers)
-            all_values = [headers]
-            print(f"📝 En-têtes créés : {headers}")
+            _headers[sheet.title] = headers
+        print(f"📝 En-têtes créés : {headers}")
     
-    headers = all_values[0]
     column_index = {header: idx for idx, header in enumerate(headers)}
     
     nom_idx = None
@@ -241,29 +423,50 @@ def send_to_google_sheet(new_entries):
             lien_idx = idx
     
     existing_keys = set()
-    if nom_idx is not None and lien_idx is not None and len(all_values) > 1:
-        for row in all_values[1:]:
-            if len(row) > max(nom_idx, lien_idx):
-                nom = row[nom_idx].strip() if nom_idx < len(row) else ""
-                lien = row[lien_idx].strip() if lien_idx < len(row) else ""
-                if nom and lien:
-                    existing_keys.add((nom, lien))
+    # Upsert : n° de ligne des aides existantes par lien, puis par nom normalisé (avec le site de leur lien)
+    rows_by_link = {}
+    rows_by_name = {}
+    if nom_idx is not None and lien_idx is not None:
+        nom_header, lien_header = headers[nom_idx], headers[lien_idx]
+        for row_number, row in enumerate(read_columns(sheet, headers, [nom_header, lien_header]), start=2):
+            nom = str(row[nom_header]).strip()
+            lien = str(row[lien_header]).strip()
+            if nom and lien:
+                existing_keys.add((nom, _link_key(lien)))
+            if lien:
+                rows_by_link.setdefault(_link_key(lien), row_number)
+            if nom:
+                rows_by_name.setdefault(normalize_key(nom), []).append((row_number, _link_key(lien).split("/")[0]))
+    # Aides archivées (hors de l'onglet principal) : vues par la déduplication via le miroir local
+    from mirror_utils import archived_entries  # Import local : mirror_utils dépend indirectement de ce module
+    archived_keys = {(normalize_key(name), _link_key(link)): deadline for name, link, deadline in archived_entries()}
+    # Lien d'origine d'une entrée dont le Lien a été remplacé par l'URL après redirections : les lignes
+    # écrites avant la vérification des liens portent ce lien-là, les deux sont comparés
+    from link_utils import SOURCE_LINK_KEY  # Import local, comme mirror_utils
     
     added_count = 0
     skipped_count = 0
+    updated_count = 0
+    added_entries = []
+    changed_cells = {}  # (ligne, colonne) -> nouvelle valeur
+    upserts = []  # (n° de ligne existante, nouvelle ligne, nom)
+    new_rows = []  # (nouvelle ligne, entrée, nom), ajoutées ensemble en fin de lot
     date_ajout = datetime.now().strftime("%Y-%m-%d %H:%M")
     
+    schema = schema_for(headers)
     for entry in new_entries:
         row = [""] * len(headers)
         nom = ""
         lien = ""
+        # Entrée compacte : valeurs déjà dans l'ordre des colonnes, sans recherche de clé
+        cells = entry.to_row(schema) if isinstance(entry, FundingEntry) else None
         
         for header, idx in column_index.items():
             if header == 'Date Ajout':
                 row[idx] = date_ajout
             else:
-                value = entry.get(header, "")
-                if not value:
+                value = cells[idx] if cells is not None else entry.get(header, "")
+                if not value and cells is None:
                     for key in entry.keys():
                         if key.lower() == header.lower():
                             value = entry[key]
@@ -291,20 +494,112 @@ def send_to_google_sheet(new_entries):
                     lien = str(value)
         
         if nom and lien:
-            key = (nom.strip(), lien.strip())
-            if key not in existing_keys:
-                try:
-                    sheet.append_row(row)
-                    print(f"✅ Ajouté : {nom}")
+            link_keys = [_link_key(lien)]
+            source = str(entry.get(SOURCE_LINK_KEY) or "")
+            if source and _link_key(source) != link_keys[0]:
+                link_keys.append(_link_key(source))
+            keys = [(nom.strip(), link_key) for link_key in link_keys]
+            archived_deadline = next((archived_keys[(normalize_key(nom), link_key)] for link_key in link_keys
+                                      if (normalize_key(nom), link_key) in archived_keys), None)
+            existing_row = (next((rows_by_link[link_key] for link_key in link_keys if link_key in rows_by_link), None)
+                            or _name_match(rows_by_name.get(normalize_key(nom), ()), lien))
+            if upsert and existing_row:
+                upserts.append((existing_row, row, nom))
+            elif archived_deadline is not None and not _is_new_edition(entry, archived_deadline):
+                print(f"⏭️ Doublon archivé : {nom}")
+                skipped_count += 1
+            elif not any(key in existing_keys for key in keys):
+                existing_keys.update(keys)
+                if dry_run:
+                    print(f"  ➕ Nouvelle ligne : {nom}")
                     added_count += 1
-                    existing_keys.add(key)
-                except Exception as e:
-                    print(f"❌ ERREUR lors de l'ajout : {e}")
+                    continue
+                new_rows.append((row, entry, nom))
             else:
                 print(f"⏭️ Doublon ignoré : {nom}")
                 skipped_count += 1
     
-    print(f"\n📊 Résumé : {added_count} nouvelle(s) entrée(s), {skipped_count} doublon(s)")
+    # Nouvelles lignes du lot ajoutées en une seule requête
+    if new_rows:
+        try:
+            sheet.append_rows([row for row, _, _ in new_rows])
+            for _, entry, nom in new_rows:
+                print(f"✅ Ajouté : {nom}")
+                added_entries.append(entry)
+            added_count += len(new_rows)
+        except Exception as e:
+            print(f"❌ ERREUR lors de l'ajout : {e}")
+    
+    # Upsert : lecture complète des seules lignes concernées, puis diff cellule par cellule
+    existing_rows = read_rows(sheet, headers, [row_number for row_number, _, _ in upserts]) if upserts else {}
+    for existing_row, row, nom in upserts:
+        changes = diff_row(existing_rows.get(existing_row, []), row, headers)
+        # Même lien à l'écriture près (schéma, www, slash final) : on garde celui du sheet
+        if lien_idx in changes and _link_key(changes[lien_idx][0]) == _link_key(changes[lien_idx][1]):
+            del changes[lien_idx]
+        if changes:
+            updated_count += 1
+            for idx, (old_value, new_value) in changes.items():
+                changed_cells[(existing_row, idx + 1)] = new_value
+                if dry_run:
+                    print(f"  ✏️ Ligne {existing_row} : {headers[idx]} '{old_value[:60]}' → '{new_value[:60]}'")
+        else:
+            print(f"⏭️ Doublon inchangé : {nom}")
+            skipped_count += 1
+    
+    if changed_cells:
+        data = coalesce_ranges(changed_cells)
+        if dry_run:
+            print(f"🧪 Simulation : {len(changed_cells)} cellule(s) à modifier en {len(data)} plage(s), rien n'est écrit")
+        else:
+            try:
+                sheet.batch_update(data)
+                print(f"✏️ {len(changed_cells)} cellule(s) mise(s) à jour sur {updated_count} ligne(s) "
+                      f"({len(data)} plage(s), 1 requête)")
+            except Exception as e:
+                print(f"❌ ERREUR lors de la mise à jour : {e}")
+    
+    print(f"\n📊 Résumé : {added_count} nouvelle(s) entrée(s), {updated_count} mise(s) à jour, "
+          f"{skipped_count} doublon(s)" + (" (simulation)" if dry_run else ""))
+    return added_entries
+
+
+def update_sheet_rows(row_updates, dry_run=None):
+    """Met à jour des cellules de lignes existantes en une seule requête (dict n° de ligne -> {colonne: valeur}).
+    En simulation, les cellules sont affichées sans rien écrire. Retourne le nombre de cellules écrites"""
+    dry_run = SHEET_DRY_RUN if dry_run is None else dry_run
+    if not row_updates:
+        return 0
+    client = get_client()
+    try:
+        sheet = client.open_by_key(SPREADSHEET_ID).worksheet(WORKSHEET_NAME)
+        headers = get_headers(sheet)
+    except Exception as e:
+        print(f"❌ ERREUR de connexion : {e}")
+        return 0
+    column_index = {header: idx for idx, header in enumerate(headers)}
+    cells = {}
+    for row_number, fields in row_updates.items():
+        for header, value in fields.items():
+            if header in column_index:
+                cells[(row_number, column_index[header] + 1)] = value
+            else:
+                print(f"⚠️ Colonne inconnue ignorée (ligne {row_number}) : {header}")
+    if not cells:
+        return 0
+    data = coalesce_ranges(cells)
+    if dry_run:
+        for (row_number, col), value in sorted(cells.items()):
+            print(f"  ✏️ Ligne {row_number} : {headers[col - 1]} → '{str(value)[:60]}'")
+        print(f"🧪 Simulation : {len(cells)} cellule(s) à modifier en {len(data)} plage(s), rien n'est écrit")
+        return 0
+    try:
+        sheet.batch_update(data)
+        print(f"✏️ {len(cells)} cellule(s) mise(s) à jour sur {len(row_updates)} ligne(s)")
+        return len(cells)
+    except Exception as e:
+        print(f"❌ ERREUR lors de la mise à jour : {e}")
+        return 0
 
 
 def analyze_unmapped_fields(sample_entry, existing_headers):
@@ -321,29 +616,96 @@ def analyze_unmapped_fields(sample_entry, existing_headers):
             print(f"   - {field}")
 
 
-def get_existing_entries():
-    """Récupère toutes les entrées existantes avec tous leurs champs"""
-    creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
-    client = gspread.authorize(creds)
+def get_existing_entries(full=True):
+    """Récupère les entrées existantes : tous leurs champs, ou avec full=False les seules colonnes clés
+    (nom, lien, date limite, statut) lues en une requête sans les colonnes de texte long"""
+    client = get_client()
     try:
         sheet = client.open_by_key(SPREADSHEET_ID).worksheet(WORKSHEET_NAME)
-        records = sheet.get_all_records()
-        print(f"📋 {len(records)} entrées existantes trouvées")
+        headers = get_headers(sheet)
+        if full:
+            # Lecture par blocs ; les lignes vides restent en place (entrée i = ligne i + 2)
+            records = []
+            for row_number, row in iter_sheet_rows(sheet, headers):
+                records.extend({h: "" for h in headers} for _ in range(row_number - 2 - len(records)))
+                records.append(dict(zip(headers, row)))
+            print(f"📋 {len(records)} entrées existantes trouvées")
+            return records
+        columns = key_columns(headers)
+        records = read_columns(sheet, headers, columns)
+        print(f"📋 {len(records)} entrées existantes trouvées (colonnes lues : {', '.join(columns)})")
         return records
     except Exception as e:
         print(f"❌ ERREUR : {e}")
         return []
 
 
+def get_sheet_rows(row_numbers):
+    """Entrées complètes de lignes déjà connues, lues à la demande (dict n° de ligne -> entrée)"""
+    if not row_numbers:
+        return {}
+    client = get_client()
+    try:
+        sheet = client.open_by_key(SPREADSHEET_ID).worksheet(WORKSHEET_NAME)
+        headers = get_headers(sheet)
+        rows = read_rows(sheet, headers, row_numbers)
+    except Exception as e:
+        print(f"❌ ERREUR : {e}")
+        return {}
+    return {n: {h: (row[i] if i < len(row) else "") for i, h in enumerate(headers)} for n, row in rows.items()}
+
+
+def load_startup_context():
+    """Lit en une seule requête values_batch_get tout le contexte de démarrage : en-têtes, colonnes clés des
+    aides existantes (disposition mémorisée au run précédent) et mots-clés de l'onglet MotsClés.
+    Retourne un dict headers, columns, existing, keywords (None si le sheet est inaccessible)"""
+    start = time.perf_counter()
+    try:
+        client = get_client()
+        stored = _stored_layout(WORKSHEET_NAME)
+        sheet_range = f"'{WORKSHEET_NAME}'!"
+        key_ranges = [f"{sheet_range}{_column_letter(stored.index(h))}2:{_column_letter(stored.index(h))}"
+                      for h in key_columns(stored)]
+        ranges = [f"{sheet_range}1:1", *key_ranges, f"'{KEYWORDS_WORKSHEET}'!A:A"]
+        response = client.http_client.values_batch_get(SPREADSHEET_ID, ranges, params={"majorDimension": "COLUMNS"})
+        values = [value_range.get("values", []) for value_range in response.get("valueRanges", [])]
+        requests_count = 1
+        headers = [column[0] if column else "" for column in values[0]]
+        columns = key_columns(headers)
+        key_values = [column[0] if column else [] for column in values[1:-1]]
+        if headers != stored:
+            # Colonnes déplacées, ajoutées ou premier run : relecture des colonnes clés à leur nouvelle place
+            sheet = client.open_by_key(SPREADSHEET_ID).worksheet(WORKSHEET_NAME)
+            existing = read_columns(sheet, headers, columns)
+            _store_layout(WORKSHEET_NAME, headers)
+            requests_count += 3  # Métadonnées du classeur, de l'onglet et batch_get des colonnes
+        else:
+            existing = _columns_to_records(columns, key_values)
+        _headers[WORKSHEET_NAME] = headers
+        keywords = [k for k in (values[-1][0] if values[-1] else []) if k.strip()]
+    except FileNotFoundError:
+        print("❌ Fichier credentials.json introuvable")
+        return None
+    except Exception as e:
+        # Onglet MotsClés absent, plage refusée... : lectures séparées
+        print(f"⚠️ Lecture groupée impossible ({e}), lectures séparées")
+        if not test_google_sheets_connection():
+            return None
+        return {"headers": get_sheet_columns(), "existing": get_existing_entries(full=False),
+                "keywords": get_keywords_from_sheet()}
+    print(f"⚡ Démarrage Sheets : {len(existing)} entrée(s), {len(keywords)} mot(s)-clé(s), "
+          f"colonnes lues : {', '.join(columns)} ({requests_count} requête(s), {time.perf_counter() - start:.2f} s)")
+    return {"headers": [h.strip() for h in headers if h.strip()], "existing": existing, "keywords": keywords}
+
+
 def log_keywords_to_sheet(keywords):
     """Ajoute des mots-clés dans l'onglet MotsClés"""
-    creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
-    client = gspread.authorize(creds)
+    client = get_client()
     try:
-        sheet = client.open_by_key(SPREADSHEET_ID).worksheet("MotsClés")
+        sheet = client.open_by_key(SPREADSHEET_ID).worksheet(KEYWORDS_WORKSHEET)
     except gspread.WorksheetNotFound:
         spreadsheet = client.open_by_key(SPREADSHEET_ID)
-        sheet = spreadsheet.add_worksheet(title="MotsClés", rows=100, cols=2)
+        sheet = spreadsheet.add_worksheet(title=KEYWORDS_WORKSHEET, rows=100, cols=2)
         print("📝 Feuille 'MotsClés' créée")
     for keyword in keywords:
         try:
@@ -355,10 +717,9 @@ def log_keywords_to_sheet(keywords):
 
 def get_keywords_from_sheet():
     """Récupère les mots-clés depuis l'onglet MotsClés"""
-    creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
-    client = gspread.authorize(creds)
+    client = get_client()
     try:
-        sheet = client.open_by_key(SPREADSHEET_ID).worksheet("MotsClés")
+        sheet = client.open_by_key(SPREADSHEET_ID).worksheet(KEYWORDS_WORKSHEET)
         keywords = [k for k in sheet.col_values(1) if k.strip()]
         print(f"📋 {len(keywords)} mots-clés chargés")
         return keywords
@@ -368,3 +729,56 @@ def get_keywords_from_sheet():
     except Exception as e:
         print(f"❌ ERREUR : {e}")
         return []
+
+
+if __name__ == "__main__":
+    # Usage : python sheets_utils.py bench    (lecture complète vs colonnes clés)
+    #         python sheets_utils.py stream   (get_all_values vs lecture par blocs, pic mémoire)
+    #         python sheets_utils.py startup  (lectures séparées vs requête groupée au démarrage)
+    import sys
+    if sys.argv[1:] == ["bench"]:
+        sheet = get_client().open_by_key(SPREADSHEET_ID).worksheet(WORKSHEET_NAME)
+        start = time.perf_counter()
+        all_values = sheet.get_all_values()
+        full_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        headers = get_headers(sheet)
+        records = read_columns(sheet, headers, key_columns(headers))
+        key_seconds = time.perf_counter() - start
+        full_size = len(json.dumps(all_values, ensure_ascii=False))
+        key_size = len(json.dumps(records, ensure_ascii=False))
+        print(f"📏 Lecture complète : {len(all_values) - 1} ligne(s), {full_size} caractères en {full_seconds:.2f} s")
+        print(f"📏 Colonnes clés ({', '.join(key_columns(headers))}) : {len(records)} ligne(s), "
+              f"{key_size} caractères en {key_seconds:.2f} s")
+    elif sys.argv[1:] == ["stream"]:
+        import tracemalloc
+        sheet = get_client().open_by_key(SPREADSHEET_ID).worksheet(WORKSHEET_NAME)
+        link_idx = next((i for i, h in enumerate(get_headers(sheet)) if 'lien' in h.lower() or 'url' in h.lower()), 0)
+        tracemalloc.start()
+        start = time.perf_counter()
+        links = {_link_key(row[link_idx]) for row in sheet.get_all_values()[1:] if len(row) > link_idx}
+        full_seconds = time.perf_counter() - start
+        full_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        links = {_link_key(row[link_idx]) for _, row in iter_sheet_rows(sheet)}
+        stream_seconds = time.perf_counter() - start
+        stream_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"📏 get_all_values : {full_seconds:.2f} s, pic mémoire {full_peak / 1e6:.1f} Mo")
+        print(f"📏 Lecture par blocs de {SHEET_CHUNK_ROWS} lignes : {stream_seconds:.2f} s, "
+              f"pic mémoire {stream_peak / 1e6:.1f} Mo ({len(links)} lien(s) indexé(s))")
+    elif sys.argv[1:] == ["startup"]:
+        start = time.perf_counter()
+        test_google_sheets_connection()
+        generate_crew_prompt()
+        get_existing_entries(full=False)
+        get_keywords_from_sheet()
+        separate_seconds = time.perf_counter() - start
+        _client = None
+        _headers.clear()
+        start = time.perf_counter()
+        load_startup_context()
+        batched_seconds = time.perf_counter() - start
+        print(f"⏱️ Démarrage Sheets : {separate_seconds:.2f} s en lectures séparées, "
+              f"{batched_seconds:.2f} s en requête groupée")
@@ -0,0 +1,207 @@
+import os
+import re
+import sys
+import json
+import time
+import glob
+from urllib.parse import urlsplit
+
+import lxml.etree
+import lxml.html
+
+from structured_utils import FUNDING_RE, REQUIRED_FIELDS
+
+# Extracteurs dédiés aux sites de financeurs récurrents : sélecteurs XPath précompilés par champ
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "site_extractors")
+
+SITE_EXTRACTORS = {}
+
+
+def register_site_extractor(domain, selectors, constants=None):
+    """Enregistre un extracteur pour un domaine : champ -> liste d'expressions XPath (essayées dans l'ordre)"""
+    SITE_EXTRACTORS[domain.lower()] = {
+        "domain": domain.lower(),
+        "selectors": {field: [lxml.etree.XPath(expr) for expr in exprs] for field, exprs in selectors.items()},
+        "constants": constants or {}
+    }
+
+
+def get_site_extractor(url):
+    """Extracteur enregistré pour le domaine d'une URL (ou ses domaines parents), sinon None"""
+    host = urlsplit(url).netloc.lower().split(":")[0]
+    if host.startswith("www."):
+        host = host[4:]
+    parts = host.split(".")
+    for i in range(len(parts) - 1):
+        extractor = SITE_EXTRACTORS.get(".".join(parts[i:]))
+        if extractor:
+            return extractor
+    return None
+
+
+def _selector_text(results):
+    """Texte normalisé du résultat d'une expression XPath (éléments, attributs ou nœuds texte)"""
+    if not isinstance(results, list):
+        results = [results]
+    texts = []
+    for result in results:
+        text = result.text_content() if hasattr(result, "text_content") else str(result)
+        text = re.sub(r"\s+", " ", text).strip()
+        if text:
+            texts.append(text)
+    return " ".join(texts)
+
+
+def extract_site_fields(root, url):
+    """Applique l'extracteur du domaine à une page parsée (dict champ -> valeur, vide si non enregistré)"""
+    extractor = get_site_extractor(url)
+    if extractor is None or root is None:
+        return {}
+    fields = dict(extractor["constants"])
+    for field, selectors in extractor["selectors"].items():
+        for selector in selectors:
+            value = _selector_text(selector(root))
+            if field == "email":
+                value = value.split()[0].replace("mailto:", "").split("?")[0] if value else ""
+            if value:
+                fields[field] = value
+                break
+    fields.setdefault("url", url)
+    return fields
+
+
+def is_site_entry_complete(fields):
+    """Vrai si l'extracteur a trouvé assez d'informations pour se passer de l'agent de recherche :
+    champs indispensables résolus (la date limite ne vient que de sélecteurs propres au site) et page
+    décrivant bien une aide, comme pour le balisage structuré. Accueil, actualités et mentions légales
+    du domaine passent donc par l'agent"""
+    if not all(fields.get(field) for field in REQUIRED_FIELDS):
+        return False
+    return bool(FUNDING_RE.search(fields["name"]) or FUNDING_RE.search(fields.get("description", "")))
+
+
+# --- Sites enregistrés -------------------------------------------------------
+
+register_site_extractor("cnc.fr", {
+    "name": ["//main//h1", "//h1"],
+    "description": ["//div[contains(@class, 'chapo')]", "//main//p[1]"],
+    "deadline": [
+        "//*[self::h2 or self::h3][contains(., 'Date limite') or contains(., 'Calendrier')]/following-sibling::*[1]",
+        "//*[contains(@class, 'date-limite')]",
+    ],
+    "amount": ["//*[self::h2 or self::h3][contains(., 'Montant')]/following-sibling::*[1]"],
+    "conditions": ["//*[self::h2 or self::h3][contains(., 'ligibilit') or contains(., 'Conditions')]/following-sibling::*[1]"],
+    "email": ["//a[starts-with(@href, 'mailto:')]/@href"],
+}, constants={"organization": "CNC", "country": "France"})
+
+register_site_extractor("scam.fr", {
+    "name": ["//h1[contains(@class, 'title')]", "//h1"],
+    "description": ["//div[contains(@class, 'intro')]", "//article//p[1]"],
+    "deadline": ["//*[contains(@class, 'deadline')]", "//strong[contains(., 'Date limite')]/.."],
+    "amount": ["//*[contains(@class, 'montant')]"],
+    "conditions": ["//*[self::h2 or self::h3][contains(., 'Qui peut') or contains(., 'ligibilit')]/following-sibling::*[1]"],
+    "email": ["//a[starts-with(@href, 'mailto:')]/@href"],
+}, constants={"organization": "SCAM", "country": "France"})
+
+register_site_extractor("iledefrance.fr", {
+    "name": ["//h1"],
+    "description": ["//div[contains(@class, 'aide-chapo')]", "//div[contains(@class, 'field--name-field-chapo')]"],
+    "deadline": ["//*[contains(@class, 'aide-dates')]", "//*[contains(@class, 'field--name-field-date-limite')]"],
+    "amount": ["//*[self::h2 or self::h3][contains(., 'Montant')]/following-sibling::*[1]"],
+    "conditions": ["//*[self::h2 or self::h3][contains(., 'Pour qui') or contains(., 'ligibilit')]/following-sibling::*[1]"],
+    "email": ["//a[starts-with(@href, 'mailto:')]/@href"],
+}, constants={"organization": "Région Île-de-France", "country": "France"})
+
+register_site_extractor("procirep.fr", {
+    "name": ["//h1"],
+    "description": ["//div[contains(@class, 'entry-content')]/p[1]"],
+    # Libellés de date limite seulement (pas « Date de publication » ni « Mise à jour »)
+    "deadline": ["//*[self::h2 or self::h3 or self::strong][starts-with(normalize-space(.), 'Date limite')"
+                 " or starts-with(normalize-space(.), 'Date de clôture')"
+                 " or starts-with(normalize-space(.), 'Dates des commissions')]/following-sibling::*[1]"],
+    "conditions": ["//*[self::h2 or self::h3][contains(., 'Conditions') or contains(., 'ligibilit')]/following-sibling::*[1]"],
+    "email": ["//a[starts-with(@href, 'mailto:')]/@href"],
+}, constants={"organization": "Procirep - Angoa", "country": "France"})
+
+register_site_extractor("pictanovo.com", {
+    "name": ["//h1"],
+    "description": ["//div[contains(@class, 'entry-content')]/p[1]", "//main//p[1]"],
+    "deadline": ["//*[self::h2 or self::h3 or self::strong][contains(., 'Date limite') or contains(., 'Dépôt')]/following-sibling::*[1]"],
+    "amount": ["//*[self::h2 or self::h3][contains(., 'Montant')]/following-sibling::*[1]"],
+    "conditions": ["//*[self::h2 or self::h3][contains(., 'Conditions') or contains(., 'ligibilit')]/following-sibling::*[1]"],
+    "email": ["//a[starts-with(@href, 'mailto:')]/@href"],
+}, constants={"organization": "Pictanovo (Région Hauts-de-France)", "country": "France"})
+
+
+# --- Harnais de fixtures et benchmark ---------------------------------------
+
+def _load_fixtures():
+    """Charge les fixtures (page HTML enregistrée + champs attendus)"""
+    fixtures = []
+    for expected_file in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.json"))):
+        with open(expected_file, encoding="utf-8") as f:
+            spec = json.load(f)
+        with open(expected_file[:-len(".json")] + ".html", "rb") as f:
+            spec["html"] = f.read()
+        spec["name"] = os.path.basename(expected_file)[:-len(".json")]
+        fixtures.append(spec)
+    return fixtures
+
+
+def _parse_fixture(spec):
+    """Parse le HTML d'une fixture"""
+    return lxml.html.document_fromstring(spec["html"], base_url=spec["url"])
+
+
+def check_fixtures():
+    """Vérifie chaque extracteur sur ses fixtures, retourne le nombre d'échecs"""
+    failures = 0
+    for spec in _load_fixtures():
+        fields = extract_site_fields(_parse_fixture(spec), spec["url"])
+        errors = [f"{field} : attendu {expected!r}, obtenu {fields.get(field)!r}"
+                  for field, expected in spec["expected"].items() if fields.get(field) != expected]
+        # Pages qui ne doivent pas (ou doivent) se passer de l'agent de recherche
+        if "complete" in spec and is_site_entry_complete(fields) != spec["complete"]:
+            errors.append(f"complète : attendu {spec['complete']}, obtenu {not spec['complete']}")
+        if errors:
+            failures += 1
+            print(f"❌ {spec['name']}")
+            for error in errors:
+                print(f"   - {error}")
+        else:
+            print(f"✅ {spec['name']} ({len(spec['expected'])} champs)")
+    return failures
+
+
+def benchmark_extractors(iterations=50, with_llm=False):
+    """Compare la latence des extracteurs dédiés à celle du chemin LLM sur les fixtures"""
+    llm = None
+    if with_llm:
+        from langchain_openai import ChatOpenAI
+        llm = ChatOpenAI(model="gpt-4-turbo")
+    for spec in _load_fixtures():
+        start = time.perf_counter()
+        for _ in range(iterations):
+            extract_site_fields(_parse_fixture(spec), spec["url"])
+        local_ms = (time.perf_counter() - start) * 1000 / iterations
+        root = _parse_fixture(spec)
+        text = re.sub(r"\s+", " ", root.text_content())
+        line = f"  {spec['name']} : extracteur {local_ms:.2f} ms"
+        if llm is not None:
+            start = time.perf_counter()
+            llm.invoke("Extrais Nom, Organisme, Deadline, Montant, Conditions et Email de cette page :\n" + text[:5000])
+            line += f", LLM {(time.perf_counter() - start) * 1000:.0f} ms"
+        else:
+            line += f", LLM ~{min(len(text), 5000) // 4} tokens de prompt évités"
+        print(line)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "check":
+        sys.exit(1 if check_fixtures() else 0)
+    elif command == "bench":
+        benchmark_extractors(with_llm="--llm" in sys.argv)
+    else:
+        print("Usage : python site_extractors.py check | bench [--llm]")
+        sys.exit(1)
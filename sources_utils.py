@@ -0,0 +1,278 @@
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import lxml.etree
+from dotenv import load_dotenv
+
+from store_utils import ensure_schema, db_executemany, db_query
+from fetch_utils import get_http_session, canonical_url, FETCH_TIMEOUT
+
+load_dotenv()
+
+# Découverte incrémentale des pages des financeurs connus (sitemaps, flux RSS/Atom) sans quota CSE
+SOURCES_FILE = os.getenv("FUNDER_SOURCES_FILE", "funder_sources.json")
+SOURCES_ENABLED = os.getenv("SOURCES_ENABLED", "1") == "1"
+SOURCES_MAX_NEW_PAGES = int(os.getenv("SOURCES_MAX_NEW_PAGES", "20"))  # Par source et par run
+SOURCES_MAX_SITEMAPS = int(os.getenv("SOURCES_MAX_SITEMAPS", "50"))  # Sous-sitemaps lus par index
+# Exclure les domaines connus des requêtes CSE (-site:) puisqu'ils sont suivis par leurs sitemaps et flux
+SOURCES_EXCLUDE_FROM_SEARCH = os.getenv("SOURCES_EXCLUDE_FROM_SEARCH", "0") == "1"
+
+SOURCES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS source_pages (
+    url TEXT PRIMARY KEY,
+    source TEXT,
+    version TEXT,
+    first_seen TEXT,
+    last_seen TEXT
+);
+"""
+
+_pending_sources = {}  # Source -> pages retenues pas encore traitées et versions de ses sous-sitemaps
+_pending_lock = threading.Lock()
+_source_stats = {"sources": 0, "listed": 0, "unchanged": 0, "new": 0, "changed": 0, "deferred": 0,
+                 "sitemaps_skipped": 0, "seconds": 0.0}
+
+
+def load_sources(sources_file=SOURCES_FILE):
+    """Charge le registre des financeurs connus (nom, domaine, sitemaps, flux, filtre d'URL)"""
+    try:
+        with open(sources_file, encoding="utf-8") as f:
+            sources = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Registre des sources illisible ({sources_file}) : {e}")
+        return []
+    for source in sources:
+        source["include_re"] = re.compile(source["include"], re.I) if source.get("include") else None
+    return sources
+
+
+def get_source_domains(sources=None):
+    """Domaines des financeurs suivis par sitemap/flux"""
+    return [source["domain"] for source in (sources if sources is not None else load_sources())]
+
+
+def _local_name(element):
+    """Nom de balise sans espace de noms"""
+    return lxml.etree.QName(element).localname if isinstance(element.tag, str) else ""
+
+
+def _child_text(element, *names):
+    """Texte du premier enfant portant l'un des noms (sans tenir compte de l'espace de noms)"""
+    for child in element:
+        if _local_name(child) in names and child.text and child.text.strip():
+            return child.text.strip()
+    return ""
+
+
+def _iterparse_url(url, tags):
+    """Télécharge un document XML en streaming et produit ses éléments `tags` au fil du parsing"""
+    with get_http_session().get(url, timeout=FETCH_TIMEOUT, stream=True) as response:
+        if response.status_code != 200:
+            print(f"  ❌ Erreur HTTP {response.status_code} : {url}")
+            return
+        response.raw.decode_content = True
+        stream = response.raw
+        if url.endswith(".gz") or response.headers.get("Content-Type", "").endswith("gzip"):
+            stream = gzip.GzipFile(fileobj=stream)
+        for _, element in lxml.etree.iterparse(stream, events=("end",), recover=True, huge_tree=True):
+            if _local_name(element) in tags:
+                yield element
+                # Libérer la mémoire des éléments déjà traités
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+
+
+def _stored_versions(urls):
+    """Versions (lastmod, GUID) enregistrées au dernier passage (dict URL canonique -> version)"""
+    versions = {}
+    urls = list(urls)
+    for i in range(0, len(urls), 500):
+        chunk = urls[i:i + 500]
+        rows = db_query(f"SELECT url, version FROM source_pages WHERE url IN ({','.join('?' * len(chunk))})", chunk)
+        versions.update({row["url"]: row["version"] for row in rows})
+    return versions
+
+
+def iter_sitemap(url, sitemap_versions, depth=0):
+    """Parcourt un sitemap (ou un index de sitemaps) et produit (url, lastmod, titre) ; les sous-sitemaps
+    dont le lastmod n'a pas changé depuis le dernier passage ne sont pas relus (versions lues ajoutées
+    à `sitemap_versions`)"""
+    children = []
+    for element in _iterparse_url(url, ("url", "sitemap")):
+        loc = _child_text(element, "loc")
+        if not loc:
+            continue
+        if _local_name(element) == "sitemap":
+            children.append((loc, _child_text(element, "lastmod")))
+        else:
+            yield loc, _child_text(element, "lastmod"), ""
+    if depth > 0 or not children:
+        return
+    stored = _stored_versions(f"sitemap:{loc}" for loc, _ in children)
+    for loc, lastmod in children[:SOURCES_MAX_SITEMAPS]:
+        if lastmod and stored.get(f"sitemap:{loc}") == lastmod:
+            _source_stats["sitemaps_skipped"] += 1
+            continue
+        yield from iter_sitemap(loc, sitemap_versions, depth + 1)
+        sitemap_versions.append((f"sitemap:{loc}", lastmod))
+
+
+def iter_feed(url):
+    """Parcourt un flux RSS ou Atom et produit (lien, GUID + date de mise à jour, titre)"""
+    for element in _iterparse_url(url, ("item", "entry")):
+        link = _child_text(element, "link")
+        if not link:
+            # Atom : <link rel="alternate" href="..."/>
+            for child in element:
+                if _local_name(child) == "link" and child.get("rel", "alternate") == "alternate" and child.get("href"):
+                    link = child.get("href")
+                    break
+        if not link:
+            continue
+        guid = _child_text(element, "guid", "id") or link
+        updated = _child_text(element, "updated", "pubDate", "published", "date")
+        yield link, f"{guid}|{updated}", _child_text(element, "title")
+
+
+def _record_versions(rows, source_name):
+    """Enregistre les versions vues (clé, version)"""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M")
+    db_executemany(
+        "INSERT INTO source_pages (url, source, version, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)"
+        " ON CONFLICT(url) DO UPDATE SET version = excluded.version, last_seen = excluded.last_seen",
+        [(key, source_name, version, now, now) for key, version in rows]
+    )
+
+
+def _version_key(kind, key):
+    """Clé de la version d'une page selon le type de source : un lastmod de sitemap et un GUID|date de flux
+    ne se comparent pas entre eux (une page listée par les deux ne doit pas paraître modifiée)"""
+    return key if kind == "sitemap" else f"{kind}:{key}"
+
+
+def _stored_version(stored, kind, key):
+    """Version enregistrée d'une page pour un type de source (les versions de flux des runs précédents,
+    « guid|date », étaient enregistrées sous la clé de la page)"""
+    version = stored.get(_version_key(kind, key))
+    legacy = stored.get(key) or ""
+    if kind == "feed" and version is None and "|" in legacy:
+        return legacy
+    if kind == "sitemap" and "|" in legacy:
+        return None
+    return version
+
+
+def discover_source(source):
+    """Pages nouvelles ou modifiées d'une source depuis le dernier passage (les plus récentes d'abord,
+    au plus SOURCES_MAX_NEW_PAGES ; le reste sera proposé aux runs suivants). Les versions ne sont
+    enregistrées qu'une fois la page traitée (record_source_page) : un échec la repropose au run suivant"""
+    ensure_schema(SOURCES_SCHEMA)
+    listed = {}  # URL canonique -> (url, titre, {type de source: version})
+    sitemap_versions = []
+    try:
+        for sitemap in source.get("sitemaps", []):
+            for url, version, title in iter_sitemap(sitemap, sitemap_versions):
+                listed.setdefault(canonical_url(url), (url, title, {}))[2].setdefault("sitemap", version)
+        for feed in source.get("feeds", []):
+            for url, version, title in iter_feed(feed):
+                item = listed.setdefault(canonical_url(url), (url, title, {}))
+                item[2]["feed"] = version
+    except Exception as e:
+        print(f"⚠️ Source {source['name']} illisible : {e}")
+    if source["include_re"]:
+        listed = {key: item for key, item in listed.items() if source["include_re"].search(item[0])}
+
+    stored = _stored_versions(version_key for key in listed for version_key in (key, _version_key("feed", key)))
+    candidates = []
+    for key, (url, title, versions) in listed.items():
+        stored_versions = {kind: _stored_version(stored, kind, key) for kind in versions}
+        order = versions.get("sitemap") or versions.get("feed", "").split("|")[-1]
+        rows = [(_version_key(kind, key), version) for kind, version in versions.items()]
+        if key not in stored and _version_key("feed", key) not in stored:
+            candidates.append((order, key, url, title, "new", rows))
+        elif any(version and stored_versions[kind] is not None and version != stored_versions[kind]
+                 for kind, version in versions.items()):
+            candidates.append((order, key, url, title, "changed", rows))
+        else:
+            _source_stats["unchanged"] += 1
+            # Type de source vu pour la première fois pour une page connue : sa version est simplement notée
+            new_rows = [row for row, kind in zip(rows, versions) if stored_versions[kind] is None]
+            if new_rows:
+                _record_versions(new_rows, source["name"])
+    candidates.sort(key=lambda candidate: candidate[:2], reverse=True)  # lastmod ISO : les plus récentes d'abord
+    selected = candidates[:SOURCES_MAX_NEW_PAGES]
+    _source_stats["listed"] += len(listed)
+    _source_stats["deferred"] += len(candidates) - len(selected)
+    for _, _, _, _, kind, _ in selected:
+        _source_stats[kind] += 1
+    # Les sous-sitemaps ne sont marqués comme lus que si aucune de leurs pages n'a été reportée,
+    # et seulement une fois toutes les pages retenues traitées
+    if len(selected) < len(candidates):
+        sitemap_versions = []
+    if selected:
+        with _pending_lock:
+            _pending_sources[source["name"]] = {"pages": {key for _, key, _, _, _, _ in selected},
+                                                "sitemaps": sitemap_versions}
+    elif sitemap_versions:
+        _record_versions(sitemap_versions, source["name"])
+    return [{"link": url, "title": title, "snippet": "", "source": source["name"], "versions": rows}
+            for _, _, url, title, _, rows in selected]
+
+
+def record_source_page(result):
+    """Enregistre les versions d'une page de source une fois traitée (page extraite ou déjà suivie par le
+    rafraîchissement) ; les sous-sitemaps de la source sont marqués comme lus après sa dernière page"""
+    if not result.get("versions"):
+        return
+    _record_versions(result["versions"], result["source"])
+    with _pending_lock:
+        pending = _pending_sources.get(result["source"])
+        if pending is None:
+            return
+        pending["pages"].discard(canonical_url(result["link"]))
+        if pending["pages"]:
+            return
+        del _pending_sources[result["source"]]
+    _record_versions(pending["sitemaps"], result["source"])
+
+
+def discover_source_pages(sources=None):
+    """Pages nouvelles ou modifiées de tous les financeurs connus (sources lues en parallèle)"""
+    if not SOURCES_ENABLED:
+        return []
+    start = time.perf_counter()
+    sources = sources if sources is not None else load_sources()
+    if not sources:
+        return []
+    _source_stats["sources"] += len(sources)
+    with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+        results = [result for found in executor.map(discover_source, sources) for result in found]
+    _source_stats["seconds"] += time.perf_counter() - start
+    for result in results:
+        print(f"  📰 {result['source']} : {result['link']}")
+    return results
+
+
+def print_sources_summary():
+    """Affiche le bilan de la découverte par sitemaps et flux"""
+    stats = _source_stats
+    if not stats["sources"]:
+        return
+    print(f"\n📰 Sources connues : {stats['sources']} financeur(s), {stats['listed']} page(s) listée(s) "
+          f"en {stats['seconds']:.1f} s, sans requête CSE")
+    print(f"  - Nouvelles : {stats['new']}, modifiées : {stats['changed']}, inchangées : {stats['unchanged']}, "
+          f"reportées : {stats['deferred']}, sous-sitemaps inchangés : {stats['sitemaps_skipped']}")
+
+
+if __name__ == "__main__":
+    # Usage : python sources_utils.py [fichier_sources.json]
+    found = discover_source_pages(load_sources(sys.argv[1]) if len(sys.argv) > 1 else None)
+    print_sources_summary()
@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Base SQLite locale partagée entre les runs (statistiques, caches, miroir...)
+DB_FILE = os.getenv("FUNDING_DB_FILE", "funding_state.db")
+
+_connection = None
+_lock = threading.RLock()
+_schemas = set()
+
+
+def get_db():
+    """Retourne la connexion SQLite partagée (créée au premier appel)"""
+    global _connection
+    with _lock:
+        if _connection is None:
+            _connection = sqlite3.connect(DB_FILE, check_same_thread=False)
+            _connection.row_factory = sqlite3.Row
+            _connection.execute("PRAGMA journal_mode=WAL")
+        return _connection
+
+
+def ensure_schema(schema_sql):
+    """Crée les tables d'un module si nécessaire (une seule fois par processus)"""
+    with _lock:
+        if schema_sql in _schemas:
+            return
+        db = get_db()
+        db.executescript(schema_sql)
+        db.commit()
+        _schemas.add(schema_sql)
+
+
+def db_execute(sql, params=()):
+    """Exécute une requête d'écriture et valide la transaction"""
+    with _lock:
+        db = get_db()
+        cursor = db.execute(sql, params)
+        db.commit()
+        return cursor
+
+
+def db_executemany(sql, rows):
+    """Exécute une requête d'écriture sur plusieurs lignes en une transaction"""
+    with _lock:
+        db = get_db()
+        cursor = db.executemany(sql, rows)
+        db.commit()
+        return cursor
+
+
+def db_query(sql, params=()):
+    """Exécute une requête de lecture et retourne toutes les lignes"""
+    with _lock:
+        return get_db().execute(sql, params).fetchall()
+
+
+def ensure_columns(table, columns):
+    """Ajoute les colonnes manquantes à une table existante (dict nom -> définition SQL)"""
+    with _lock:
+        db = get_db()
+        existing = {row["name"] for row in db.execute(f"PRAGMA table_info({table})")}
+        for name, definition in columns.items():
+            if name not in existing:
+                db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+        db.commit()
@@ -0,0 +1,267 @@
+import re
+import json
+import unicodedata
+from urllib.parse import urlsplit
+
+# Extraction déterministe (JSON-LD, OpenGraph, <time>, mailto, regex) avant l'appel aux agents
+JSONLD_PREFERRED_TYPES = ("Grant", "MonetaryGrant", "FundingScheme", "Event", "Article", "NewsArticle", "WebPage")
+JSONLD_DEADLINE_KEYS = ("applicationDeadline", "deadline", "endDate", "validThrough", "expires")
+JSONLD_ORGANIZATION_KEYS = ("funder", "organizer", "provider", "sponsor", "publisher", "author")
+# Champs indispensables pour créer une entrée sans passer par les agents
+REQUIRED_FIELDS = ("name", "url", "deadline", "organization")
+# Valeurs des agents considérées comme absentes (complétées par les champs déterministes)
+PLACEHOLDER_VALUES = ("", "non spécifié", "non specifie", "non précisé", "n/a")
+
+DEADLINE_WORDS_RE = re.compile(r"date limite|cl[ôo]ture|deadline|avant le|jusqu'au|d[ée]p[ôo]t", re.I)
+FUNDING_RE = re.compile(r"\b(?:aides?|fonds|appels?|bourses?|subventions?|soutiens?|prix|r[ée]sidences?|grants?|funds?|funding|calls?)\b", re.I)
+EMAIL_RE = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+DATE_TEXT = (r"\d{1,2}(?:er)?\s+(?:janvier|f[ée]vrier|mars|avril|mai|juin|juillet|ao[ûu]t|septembre|octobre|novembre|d[ée]cembre)\s+\d{4}"
+             r"|\d{1,2}/\d{1,2}/\d{4}|\d{4}-\d{2}-\d{2}")
+DEADLINE_TEXT_RE = re.compile(r"(?:date limite|cl[ôo]ture|deadline|avant le|jusqu'au)[^\n]{0,60}?(" + DATE_TEXT + r")", re.I)
+AMOUNT_TEXT_RE = re.compile(
+    r"(?:montant|jusqu'(?:à|a)|plafond|maximum|dotation|d'un montant de)[^\n]{0,40}?"
+    r"(\d{1,3}(?:[\s .]\d{3})+|\d+)\s?(k€|€|euros?|EUR)", re.I
+)
+
+_coverage = {"pages": 0, "bypassed": 0, "context_chars": 0, "avoided_chars": 0, "fields": {}}
+
+
+def _first(*values):
+    """Première valeur non vide"""
+    for value in values:
+        if isinstance(value, str) and value.strip():
+            return re.sub(r"\s+", " ", value).strip()
+    return ""
+
+
+def _jsonld_text(value):
+    """Valeur textuelle d'un champ JSON-LD (chaîne, objet nommé ou liste)"""
+    if isinstance(value, list):
+        return _first(*(_jsonld_text(v) for v in value))
+    if isinstance(value, dict):
+        return _first(value.get("name"))
+    if isinstance(value, (int, float)):
+        return str(value)
+    return value if isinstance(value, str) else ""
+
+
+def _iter_jsonld(data):
+    """Parcourt récursivement les objets JSON-LD (listes et @graph)"""
+    if isinstance(data, list):
+        for item in data:
+            yield from _iter_jsonld(item)
+    elif isinstance(data, dict):
+        if "@graph" in data:
+            yield from _iter_jsonld(data["@graph"])
+        yield data
+
+
+def _jsonld_types(obj):
+    """Types schema.org d'un objet JSON-LD"""
+    types = obj.get("@type", [])
+    return types if isinstance(types, list) else [types]
+
+
+def _primary_jsonld(root):
+    """Objet JSON-LD principal de la page (type de financement ou d'événement en priorité)"""
+    objects = []
+    for script in root.xpath("//script[@type='application/ld+json']"):
+        try:
+            objects.extend(_iter_jsonld(json.loads(script.text or "")))
+        except ValueError:
+            continue
+    for preferred in JSONLD_PREFERRED_TYPES:
+        for obj in objects:
+            if preferred in _jsonld_types(obj):
+                return obj
+    return {}
+
+
+def _jsonld_amount(obj):
+    """Montant d'une aide schema.org (MonetaryGrant.amount / MonetaryAmount)"""
+    amount = obj.get("amount")
+    if isinstance(amount, dict):
+        value = amount.get("value") or amount.get("maxValue")
+        if value:
+            return f"{value} {amount.get('currency', '')}".strip()
+    return _jsonld_text(amount)
+
+
+def _meta(root, *names):
+    """Contenu de la première balise meta trouvée (property ou name)"""
+    for name in names:
+        values = root.xpath(f"//meta[@property='{name}' or @name='{name}']/@content")
+        if values and values[0].strip():
+            return values[0].strip()
+    return ""
+
+
+def _split_title(title):
+    """Sépare « Titre | Site » en (titre, site)"""
+    for separator in (" | ", " - ", " – ", " — "):
+        if separator in title:
+            head, _, tail = title.rpartition(separator)
+            return head.strip(), tail.strip()
+    return title, ""
+
+
+def extract_structured_data(root, url):
+    """Extrait les champs disponibles dans le balisage structuré d'une page (dict champ -> valeur)"""
+    if root is None:
+        return {}
+    obj = _primary_jsonld(root)
+    title, site = _split_title(_first(*root.xpath("//title/text()")))
+    h1 = _first(*(h.text_content() for h in root.xpath("//h1")[:1]))
+
+    # <time datetime> dont le contexte évoque une date limite
+    deadline_times = []
+    for element in root.xpath("//time[@datetime]"):
+        parent = element.getparent()
+        context = (parent.text_content() if parent is not None else element.text_content())[:200]
+        if DEADLINE_WORDS_RE.search(context):
+            deadline_times.append(element.get("datetime"))
+
+    contact = obj.get("contactPoint") if isinstance(obj.get("contactPoint"), dict) else {}
+    mailtos = [href[len("mailto:"):].split("?")[0] for href in root.xpath("//a[starts-with(@href, 'mailto:')]/@href")]
+    canonical = root.xpath("//link[@rel='canonical']/@href")
+
+    data = {
+        "name": _first(_jsonld_text(obj.get("name")), _jsonld_text(obj.get("headline")), h1,
+                       _meta(root, "og:title"), title),
+        "organization": _first(*(_jsonld_text(obj.get(key)) for key in JSONLD_ORGANIZATION_KEYS),
+                               _meta(root, "og:site_name"), site),
+        "deadline": _first(*(_jsonld_text(obj.get(key)) for key in JSONLD_DEADLINE_KEYS), *deadline_times),
+        "url": _first(_jsonld_text(obj.get("url")), canonical[0] if canonical else "", _meta(root, "og:url"), url),
+        "description": _first(_jsonld_text(obj.get("description")), _meta(root, "og:description", "description")),
+        "email": _first(_jsonld_text(obj.get("email")), _jsonld_text(contact.get("email")), *mailtos),
+        "amount": _jsonld_amount(obj),
+    }
+    return {field: value for field, value in data.items() if value}
+
+
+def extract_text_fields(text):
+    """Champs repérables par expressions régulières dans le texte de la page"""
+    data = {}
+    if not text:
+        return data
+    match = DEADLINE_TEXT_RE.search(text)
+    if match:
+        data["deadline"] = match.group(1)
+    match = AMOUNT_TEXT_RE.search(text)
+    if match:
+        data["amount"] = f"{match.group(1)} {match.group(2)}"
+    match = EMAIL_RE.search(text)
+    if match:
+        data["email"] = match.group(0)
+    return data
+
+
+def _normalize_header(header):
+    """En-tête en minuscules sans accents"""
+    text = unicodedata.normalize("NFKD", header.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def header_field(header):
+    """Champ structuré correspondant à une colonne du sheet (ou None)"""
+    h = _normalize_header(header)
+    if "mail" in h:
+        return "email"
+    if "lien" in h or "url" in h or "site" in h:
+        return "url"
+    if "organisme" in h or "organisation" in h or "financeur" in h:
+        return "organization"
+    if "deadline" in h or "date limite" in h or "echeance" in h or "cloture" in h:
+        return "deadline"
+    if "montant" in h or "dotation" in h:
+        return "amount"
+    if "resume" in h or "description" in h:
+        return "description"
+    if "condition" in h or "eligib" in h:
+        return "conditions"
+    if "pays" in h:
+        return "country"
+    if "nom" in h:
+        return "name"
+    return None
+
+
+def map_structured_fields(structured, text, url, headers):
+    """Remplit les colonnes du sheet résolues de façon déterministe (dict en-tête -> valeur)"""
+    data = dict(extract_text_fields(text))
+    structured = dict(structured or {})
+    site_fields = structured.pop("site", {})
+    data.update(structured)  # Le balisage structuré prime sur les expressions régulières
+    data.update(site_fields)  # Et l'extracteur dédié du domaine prime sur tout le reste
+    data.setdefault("url", url)
+    if urlsplit(data["url"]).netloc.lower().endswith(".fr"):
+        data.setdefault("country", "France")
+    fields = {}
+    for header in headers:
+        field = header_field(header)
+        if field and data.get(field):
+            fields[header] = data[field]
+    return fields
+
+
+def is_structured_entry_complete(fields, headers):
+    """Vrai si les champs indispensables sont résolus et que la page décrit bien une aide"""
+    resolved = {header_field(header) for header in fields}
+    if not all(field in resolved for field in REQUIRED_FIELDS):
+        return False
+    name = next((value for header, value in fields.items() if header_field(header) == "name"), "")
+    return bool(FUNDING_RE.search(name))
+
+
+def format_known_fields(fields):
+    """Ligne de prompt listant les champs déjà extraits (que les agents n'ont pas à rechercher)"""
+    if not fields:
+        return ""
+    known = "; ".join(f"{header} = {value[:120]}" for header, value in fields.items())
+    return f"Champs déjà extraits (ne pas rechercher) : {known}\n"
+
+
+def _is_placeholder(value):
+    """Vrai si la valeur trouvée par les agents est vide ou un simple « Non spécifié »"""
+    return str(value or "").strip().lower() in PLACEHOLDER_VALUES
+
+
+def merge_structured_fields(entries, structured_fields, url_key):
+    """Complète les entrées des agents avec les champs déterministes de la page correspondante :
+    seules les colonnes vides ou « Non spécifié » sont remplies, les valeurs des agents priment
+    (une page de liste décrit plusieurs aides, son titre ne doit pas devenir le nom de chacune)"""
+    by_url = {url_key(url): fields for url, fields in structured_fields.items()}
+    for entry in entries:
+        link = next((v for k, v in entry.items() if header_field(k) == "url" and v), "")
+        fields = by_url.get(url_key(link)) if link else None
+        if not fields:
+            continue
+        for header, value in fields.items():
+            if _is_placeholder(entry.get(header)):
+                entry[header] = value
+    return entries
+
+
+def record_structured_page(fields, headers, context_chars, bypassed):
+    """Comptabilise la couverture par champ et les caractères de contexte évités"""
+    _coverage["pages"] += 1
+    _coverage["context_chars"] += context_chars
+    if bypassed:
+        _coverage["bypassed"] += 1
+        _coverage["avoided_chars"] += context_chars
+    for header in fields:
+        _coverage["fields"][header] = _coverage["fields"].get(header, 0) + 1
+
+
+def print_structured_summary(headers):
+    """Affiche la couverture par champ et la part des tokens LLM évités"""
+    pages = _coverage["pages"]
+    if not pages:
+        return
+    print(f"\n🧱 Extraction structurée : {_coverage['bypassed']}/{pages} page(s) résolue(s) sans LLM")
+    for header in headers:
+        count = _coverage["fields"].get(header, 0)
+        print(f"  - {header} : {count}/{pages} ({100 * count / pages:.0f}%)")
+    total = _coverage["context_chars"]
+    avoided = 100 * _coverage["avoided_chars"] / total if total else 0
+    print(f"  ⚡ Tokens LLM évités : ~{_coverage['avoided_chars'] // 4} ({avoided:.0f}% du contexte)")
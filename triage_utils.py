@@ -0,0 +1,225 @@
+import os
+import re
+import math
+import threading
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+
+from store_utils import ensure_schema, ensure_columns, db_execute, db_executemany, db_query
+from fetch_utils import canonical_url
+from structured_utils import header_field
+
+load_dotenv()
+
+# Tri des résultats de recherche avant téléchargement (titre, extrait, domaine)
+TRIAGE_ENABLED = os.getenv("TRIAGE_ENABLED", "1") == "1"
+TRIAGE_MIN_SCORE = float(os.getenv("TRIAGE_MIN_SCORE", "0.5"))
+TRIAGE_MODEL_WEIGHT = float(os.getenv("TRIAGE_MODEL_WEIGHT", "0.5"))
+TRIAGE_MIN_TRAINING_DOCS = 30
+# Estimation des tokens économisés par page non téléchargée (~4 caractères par token)
+TRIAGE_PAGE_CHARS = 5000
+
+POSITIVE_PATTERNS = [
+    (re.compile(r"appels? (?:à|a) (?:projets?|candidatures?)", re.I), 1.5),
+    (re.compile(r"\b(?:aides?|subventions?|bourses?|fonds|financements?|soutiens?)\b", re.I), 1.0),
+    (re.compile(r"\b(?:date limite|cl[ôo]ture|deadline|candidatures?|dossiers?)\b", re.I), 0.7),
+    (re.compile(r"\b(?:grants?|fund(?:ing)?|call for (?:projects|applications|entries|proposals))\b", re.I), 1.0),
+    (re.compile(r"\b(?:documentaires?|documentary|post-?production|coproduction|co-production|cin[ée]ma|film)\b", re.I), 0.5),
+]
+NEGATIVE_PATTERNS = [
+    (re.compile(r"\b(?:offres? d'emploi|recrut\w*|job|jobs|emploi|stage|cdd|cdi|hiring|vacancy)\b", re.I), -2.0),
+    (re.compile(r"\b(?:actualités?|news|communiqué|revue de presse|blog|interview|critique|bande-annonce|trailer)\b", re.I), -1.0),
+    (re.compile(r"\b(?:billetterie|tickets?|streaming|regarder|replay|vod)\b", re.I), -1.0),
+]
+BLOCKED_DOMAINS = ("facebook.com", "instagram.com", "twitter.com", "x.com", "linkedin.com",
+                   "youtube.com", "tiktok.com", "allocine.fr", "imdb.com", "wikipedia.org")
+TOKEN_RE = re.compile(r"[a-zàâäéèêëîïôöùûüç0-9]{3,}", re.I)
+# Page du lot de recherche dont une entrée est issue (son lien peut pointer vers une sous-page ou un PDF)
+SOURCE_PAGE_KEY = "_source_page"
+
+TRIAGE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS triage_tokens (
+    token TEXT PRIMARY KEY,
+    pos INTEGER DEFAULT 0,
+    neg INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS triage_labels (
+    url TEXT PRIMARY KEY,
+    label INTEGER NOT NULL
+);
+"""
+# Tokens appris pour chaque page : un changement d'étiquette retire leurs anciens comptes
+TRIAGE_LABEL_COLUMNS = {"tokens": "TEXT"}
+
+_model = None
+_model_lock = threading.Lock()
+_triage_stats = {"kept": 0, "skipped": 0}
+
+
+def _ensure_triage_schema():
+    """Crée les tables du modèle de tri et la colonne des tokens par page si nécessaire"""
+    ensure_schema(TRIAGE_SCHEMA)
+    ensure_columns("triage_labels", TRIAGE_LABEL_COLUMNS)
+
+
+def _tokens(text):
+    """Découpe un texte en tokens lexicaux (minuscules, sans doublons)"""
+    return set(token.lower() for token in TOKEN_RE.findall(text or ""))
+
+
+def _load_model():
+    """Charge le modèle lexical (naive Bayes) appris sur les runs précédents"""
+    global _model
+    with _model_lock:
+        if _model is None:
+            _ensure_triage_schema()
+            counts = db_query("SELECT SUM(label) AS pos, COUNT(*) AS total FROM triage_labels")[0]
+            pos_docs = counts["pos"] or 0
+            neg_docs = (counts["total"] or 0) - pos_docs
+            tokens = {row["token"]: (row["pos"], row["neg"]) for row in db_query("SELECT * FROM triage_tokens")}
+            _model = {"pos_docs": pos_docs, "neg_docs": neg_docs, "tokens": tokens}
+        return _model
+
+
+def _model_log_odds(tokens):
+    """Log-rapport de vraisemblance (pertinent / non pertinent) des tokens d'un résultat"""
+    model = _load_model()
+    pos_docs, neg_docs = model["pos_docs"], model["neg_docs"]
+    if pos_docs + neg_docs < TRIAGE_MIN_TRAINING_DOCS or not pos_docs or not neg_docs:
+        return 0.0
+    score = math.log(pos_docs / neg_docs)
+    for token in tokens:
+        pos, neg = model["tokens"].get(token, (0, 0))
+        if pos or neg:
+            score += math.log((pos + 1) / (pos_docs + 2)) - math.log((neg + 1) / (neg_docs + 2))
+    return max(-3.0, min(3.0, score))
+
+
+def score_search_result(result):
+    """Score de pertinence d'un résultat de recherche d'après ses règles lexicales et le modèle appris"""
+    link = result.get("link", "")
+    parts = urlsplit(link)
+    host = parts.netloc.lower()
+    if any(host == domain or host.endswith("." + domain) for domain in BLOCKED_DOMAINS):
+        return -5.0
+    text = f"{result.get('title', '')} {result.get('snippet', '')} {parts.path.replace('-', ' ').replace('/', ' ')}"
+    score = 0.0
+    for pattern, weight in POSITIVE_PATTERNS + NEGATIVE_PATTERNS:
+        if pattern.search(text):
+            score += weight
+    # Page d'accueil : rarement la page de l'appel lui-même
+    if parts.path in ("", "/") and not parts.query:
+        score -= 1.0
+    return score + TRIAGE_MODEL_WEIGHT * _model_log_odds(_tokens(text))
+
+
+def triage_search_results(results):
+    """Sépare les résultats à télécharger de ceux écartés d'après leur titre et leur extrait"""
+    if not TRIAGE_ENABLED:
+        return list(results), []
+    kept, skipped = [], []
+    for result in results:
+        score = score_search_result(result)
+        result["triage_score"] = score
+        (kept if score >= TRIAGE_MIN_SCORE else skipped).append(result)
+    for result in skipped:
+        print(f"  🚫 Écarté ({result['triage_score']:.1f}) : {result['link']}")
+    _triage_stats["kept"] += len(kept)
+    _triage_stats["skipped"] += len(skipped)
+    return kept, skipped
+
+
+def print_triage_summary():
+    """Affiche le nombre de téléchargements et de tokens économisés par le tri"""
+    if not TRIAGE_ENABLED:
+        return
+    skipped = _triage_stats["skipped"]
+    total = skipped + _triage_stats["kept"]
+    print(f"\n🚦 Tri des résultats : {skipped}/{total} page(s) non téléchargée(s), "
+          f"~{skipped * TRIAGE_PAGE_CHARS // 4} tokens LLM économisés")
+
+
+def attribute_source_pages(entries, texts):
+    """Rattache chaque entrée à la page qui l'a produite (clé _source_page), même si son lien pointe
+    ailleurs : page de son lien, sinon seule page du lot sur le même site, sinon page citant son nom"""
+    pages = {canonical_url(url): url for url in texts}
+    for entry in entries:
+        if entry.get(SOURCE_PAGE_KEY):
+            continue
+        link = next((str(v) for k, v in entry.items() if header_field(k) == "url" and v), "")
+        name = next((str(v).strip().lower() for k, v in entry.items() if header_field(k) == "name" and v), "")
+        page = pages.get(canonical_url(link)) if link else None
+        if not page and link:
+            host = urlsplit(link).netloc.lower()
+            same_site = [url for url in texts if urlsplit(url).netloc.lower() == host]
+            page = same_site[0] if len(same_site) == 1 else None
+        if not page and len(name) >= 8:
+            page = next((url for url, text in texts.items() if name in text.lower()), None)
+        if page:
+            entry[SOURCE_PAGE_KEY] = page
+    return entries
+
+
+def _result_tokens(result):
+    """Tokens d'un résultat de recherche (titre, extrait, chemin de l'URL)"""
+    path = urlsplit(result["link"]).path.replace("-", " ").replace("/", " ")
+    return _tokens(f"{result.get('title', '')} {result.get('snippet', '')} {path}")
+
+
+def train_triage_model(analysed_results, relevant_urls):
+    """Met à jour le modèle lexical avec les pages extraites et analysées pendant le run : positives si elles
+    ont produit une aide (`relevant_urls` : pages sources et liens des entrées) ou si elles correspondent
+    à une aide déjà connue (result["known"] : ligne du sheet, miroir, aide connue citée), négatives sinon.
+    L'étiquette d'une page déjà apprise est mise à jour et ses anciens comptes de tokens corrigés"""
+    global _model
+    _ensure_triage_schema()
+    relevant = {canonical_url(url) for url in relevant_urls if url}
+    pages = {}
+    for result in analysed_results:
+        key = canonical_url(result["link"])
+        label = 1 if key in relevant or result.get("known") else 0
+        previous = pages.get(key)
+        pages[key] = (max(label, previous[0]) if previous else label, _result_tokens(result))
+    if not pages:
+        return
+    stored = {row["url"]: (row["label"], row["tokens"]) for row in db_query("SELECT url, label, tokens FROM triage_labels")}
+    labels = []
+    token_counts = {}
+
+    def count(tokens, label, delta):
+        """Ajoute (delta=1) ou retire (delta=-1) les tokens d'une page aux comptes de son étiquette"""
+        for token in tokens:
+            pos, neg = token_counts.get(token, (0, 0))
+            token_counts[token] = (pos + delta * label, neg + delta * (1 - label))
+
+    changed = 0
+    for key, (label, tokens) in pages.items():
+        if key in stored:
+            old_label, old_tokens = stored[key]
+            if old_label == label:
+                continue
+            # Étiquette corrigée : les tokens appris sous l'ancienne étiquette lui sont retirés
+            count(set(old_tokens.split()) if old_tokens else tokens, old_label, -1)
+            changed += 1
+        count(tokens, label, 1)
+        labels.append((key, label, " ".join(sorted(tokens))))
+    if not labels:
+        return
+    db_executemany(
+        "INSERT INTO triage_labels (url, label, tokens) VALUES (?, ?, ?)"
+        " ON CONFLICT(url) DO UPDATE SET label = excluded.label, tokens = excluded.tokens",
+        labels
+    )
+    db_executemany(
+        "INSERT INTO triage_tokens (token, pos, neg) VALUES (?, ?, ?)"
+        " ON CONFLICT(token) DO UPDATE SET pos = pos + excluded.pos, neg = neg + excluded.neg",
+        [(token, pos, neg) for token, (pos, neg) in token_counts.items() if pos or neg]
+    )
+    # Pages apprises avant l'enregistrement de leurs tokens : la correction peut passer sous zéro
+    db_execute("UPDATE triage_tokens SET pos = MAX(0, pos), neg = MAX(0, neg) WHERE pos < 0 OR neg < 0")
+    with _model_lock:
+        _model = None
+    positives = sum(label for _, label, _ in labels)
+    print(f"🧠 Modèle de tri mis à jour : {positives} positif(s), {len(labels) - positives} négatif(s), "
+          f"dont {changed} étiquette(s) corrigée(s)")